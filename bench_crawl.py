@@ -0,0 +1,279 @@
+"""
+Benchmark end-to-end các crawler trên server NOIP giả lập (mock_noip_server.py)
+Chạy Crawler (tìm kiếm + click), DesignCrawler và TrademarkCrawler qua cùng một bộ
+số đơn, đo số record/giây, độ trễ mỗi record p50/p95/p99 và peak RSS
+(process Python + Chrome/chromedriver nếu có psutil). Mọi thay đổi hiệu năng đo được
+offline, không cần đụng site thật.
+Ví dụ:
+    python bench_crawl.py --records 50
+    python bench_crawl.py --crawlers designs trademarks --latency 0.2 --server-500 0.05 --challenge 0.02
+    python bench_crawl.py --crawlers designs --no-http --page-profile light --json bench.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from image_downloader import close_image_downloader
+from log_config import record_context, setup_logging
+from metrics import get_metrics
+from mock_noip_server import FAULTS, MockNoipServer
+from parse_pool import ParsePool, resolve_row
+from profiling import DEFAULT_EVERY as DEFAULT_PROFILE_EVERY, SCOPES as PROFILE_SCOPES
+from profiling import HotPathProfiler, install_profiler, parse_scopes, record_finished, section as profile_section
+from record_store import RecordStore
+from webdriver_profiler import get_run_profile
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Loại crawler -> (module, class, method xử lý một số đơn, mẫu số đơn)
+CRAWLERS = {
+    "search": ("crawler", "Crawler", "process_search", "3-2019-{:05d}"),
+    "designs": ("crawler_trademarks", "DesignCrawler", "process_design", "3-2019-{:05d}"),
+    "trademarks": ("crawler_nhan_hieu", "TrademarkCrawler", "process_trademark", "4-2025-{:05d}"),
+}
+
+
+class PeakRssSampler:
+    """
+    Peak RSS trong lúc chạy (byte)
+    Có psutil: lấy mẫu process Python + mọi process con (Chrome, chromedriver, parse pool)
+    Không có: ru_maxrss của process Python (chỉ Linux/macOS)
+    """
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_bytes = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def sample(self):
+        if psutil is None:
+            import resource
+
+            scale = 1 if sys.platform == "darwin" else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        return total
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, self.sample())
+
+    def __enter__(self):
+        self.peak_bytes = self.sample()
+        self.thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak_bytes = max(self.peak_bytes, self.sample())
+
+
+def percentiles(values):
+    """(p50, p95, p99) - cần ít nhất 2 giá trị"""
+    if not values:
+        return (None, None, None)
+    if len(values) == 1:
+        return (values[0],) * 3
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def make_crawler(kind, args, base_url, work_dir, parse_pool):
+    module_name, class_name, process_name, _ = CRAWLERS[kind]
+    crawler_class = getattr(__import__(module_name), class_name)
+    options = dict(
+        profile_dir=Path(work_dir) / f"chrome_{kind}",
+        store=RecordStore(Path(work_dir) / f"{kind}.sqlite"),
+        page_profile=args.page_profile,
+        load_images=args.load_images,
+        headless=True if args.headless else None,
+        parse_pool=parse_pool,
+        base_url=base_url,
+        network_timing=args.network_timing,
+    )
+    if kind != "search":
+        options["use_http"] = not args.no_http
+        options["http_only"] = args.http_only
+    crawler = crawler_class(args.driver_path, "", **options)
+    return crawler, getattr(crawler, process_name)
+
+
+def bench_crawler(kind, args, base_url, work_dir, parse_pool):
+    filing_numbers = [CRAWLERS[kind][3].format(i) for i in range(1, args.records + 1)]
+    latencies = []
+    succeeded = 0
+    # --network-timing: thời gian từng request theo số đơn (crawler.last_network)
+    network = {}
+    # Histogram từng pha riêng cho crawler này
+    get_metrics().reset()
+    get_run_profile().reset()
+    profiler = None
+    if args.profile or args.profile_memory:
+        profiler = HotPathProfiler(Path(args.profile_dir) / kind, args.profile, args.profile_every, args.profile_memory)
+        install_profiler(profiler.start())
+    with PeakRssSampler() as rss:
+        crawler, process = make_crawler(kind, args, base_url, work_dir, parse_pool)
+        try:
+            start_time = time.perf_counter()
+            for filing_number in filing_numbers:
+                record_start = time.perf_counter()
+                try:
+                    with record_context(filing_number), profile_section("record"):
+                        row_data = resolve_row(process(filing_number, save=False))
+                except Exception as e:
+                    print(f"  ❌ {filing_number}: {type(e).__name__} - {e}")
+                    row_data = None
+                record_finished()
+                if getattr(crawler, "last_network", None) is not None:
+                    network[filing_number] = crawler.last_network
+                latencies.append(time.perf_counter() - record_start)
+                succeeded += bool(row_data)
+            wall_seconds = time.perf_counter() - start_time
+        finally:
+            crawler.close()
+            close_image_downloader()
+            crawler.store.close()
+            if profiler:
+                profiler.close()
+                install_profiler(None)
+
+    p50, p95, p99 = percentiles(latencies)
+    return {
+        "crawler": kind,
+        "records": len(filing_numbers),
+        "succeeded": succeeded,
+        "wall_seconds": wall_seconds,
+        "records_per_sec": succeeded / wall_seconds if wall_seconds else 0.0,
+        "p50_seconds": p50,
+        "p95_seconds": p95,
+        "p99_seconds": p99,
+        "peak_rss_mb": rss.peak_bytes / (1024 * 1024),
+        "phases": get_metrics().to_dict()["phases"],
+        "phase_summary": get_metrics().summary_lines(),
+        "webdriver": get_run_profile().to_dict(),
+        "webdriver_summary": get_run_profile().summary_lines(),
+        "network": network,
+    }
+
+
+def print_results(results):
+    print()
+    print(f"{'crawler':<11} {'ok':>9} {'rec/s':>8} {'p50 (s)':>9} {'p95 (s)':>9} {'p99 (s)':>9} {'peak RSS':>11}")
+    for r in results:
+        print(
+            f"{r['crawler']:<11} {r['succeeded']:>4}/{r['records']:<4} {r['records_per_sec']:8.2f} "
+            f"{r['p50_seconds']:9.3f} {r['p95_seconds']:9.3f} {r['p99_seconds']:9.3f} "
+            f"{r['peak_rss_mb']:8.0f} MB"
+        )
+    if psutil is None:
+        print("(không có psutil: peak RSS chỉ tính process Python)")
+    for r in results:
+        print()
+        print(f"Thời gian từng pha - {r['crawler']}:")
+        for line in r["phase_summary"]:
+            print(f"  {line}")
+        for line in r["webdriver_summary"]:
+            print(f"  {line}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark crawler trên server NOIP giả lập")
+    parser.add_argument("--crawlers", nargs="+", choices=list(CRAWLERS), default=list(CRAWLERS))
+    parser.add_argument("--records", type=int, default=20, help="Số đơn mỗi crawler")
+    parser.add_argument("--driver-path", default="chromedriver-win64/chromedriver.exe")
+    parser.add_argument("--page-profile", choices=["full", "light"], default="full")
+    parser.add_argument("--load-images", action="store_true", help="Profile light: vẫn tải ảnh trong trình duyệt")
+    parser.add_argument("--headless", action="store_true", help="Chạy Chrome headless")
+    parser.add_argument("--no-http", action="store_true", help="DesignCrawler/TrademarkCrawler: chỉ dùng Selenium")
+    parser.add_argument(
+        "--http-only",
+        action="store_true",
+        help="DesignCrawler/TrademarkCrawler: không mở Chrome, trang cần Selenium được tính là lỗi",
+    )
+    parser.add_argument("--network-timing", action="store_true", help="Đo thời gian mạng của Chrome qua CDP")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Số process parse (0: parse trong thread)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Độ trễ mỗi request của mock (giây)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Độ trễ ngẫu nhiên thêm tối đa (giây)")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="Độ trễ của trang tải chậm (giây)")
+    for fault in FAULTS:
+        parser.add_argument(
+            f"--{fault.replace('_', '-')}", type=float, default=0.0, help=f"Xác suất chèn trạng thái {fault}"
+        )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--log-level", choices=["DEBUG", "INFO", "WARNING"], default="WARNING", help="Mức log của crawler khi đo"
+    )
+    parser.add_argument(
+        "--profile",
+        type=parse_scopes,
+        default=(),
+        help=f"cProfile các section, cách nhau dấu phẩy ({', '.join(PROFILE_SCOPES)})",
+    )
+    parser.add_argument("--profile-every", type=int, default=DEFAULT_PROFILE_EVERY, help="Ghi profile sau mỗi N record")
+    parser.add_argument("--profile-memory", action="store_true", help="Snapshot tracemalloc mỗi N record")
+    parser.add_argument("--profile-dir", default="bench_profile", help="Thư mục profile (mỗi crawler một thư mục con)")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Đường dẫn tương đối tính theo thư mục gọi lệnh - phải resolve trước khi chdir vào thư mục tạm
+    args.driver_path = str(Path(args.driver_path).resolve())
+    setup_logging(args.log_level)
+    server = MockNoipServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        slow_latency=args.slow_latency,
+        faults={fault: getattr(args, fault) for fault in FAULTS},
+        seed=args.seed,
+    )
+    parse_pool = ParsePool(args.parse_workers) if args.parse_workers else None
+    original_cwd = os.getcwd()
+    results = []
+    with server, tempfile.TemporaryDirectory() as work_dir:
+        print("=" * 80)
+        print(f"BENCHMARK CRAWL trên {server.url} - {args.records} số đơn mỗi crawler")
+        print(f"Chèn lỗi: {', '.join(f'{k}={v}' for k, v in server.faults.items() if v) or 'không'}")
+        print("=" * 80)
+        # Crawler ghi Output_*/ theo đường dẫn tương đối - chạy trong thư mục tạm
+        os.chdir(work_dir)
+        try:
+            for kind in args.crawlers:
+                print(f"▶ {kind}...")
+                results.append(bench_crawler(kind, args, server.url, work_dir, parse_pool))
+        finally:
+            os.chdir(original_cwd)
+            if parse_pool:
+                parse_pool.close()
+
+    print_results(results)
+    print(f"Request tới mock: {server.counts}")
+    if args.json:
+        Path(args.json).write_text(
+            json.dumps({"config": vars(args), "results": results, "mock_requests": server.counts}, indent=2),
+            encoding="utf-8",
+        )
+        print(f"💾 Đã ghi {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark tải trang chi tiết: profile "full" (render đầy đủ như hiện tại) vs "light"
+Đo thời gian đến khi detail-container xuất hiện và tổng số byte tải về (Resource Timing API).
+Ví dụ:
+    python bench_page_load.py --type designs --input data_kdcn_bo_sung.xlsx --limit 20
+    python bench_page_load.py --type trademarks --ids 4-2025-45534 4-2025-45535
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from browser_profile import PAGE_PROFILES
+from record_store import RecordStore
+
+DETAIL_URLS = {
+    "designs": "https://wipopublish.ipvietnam.gov.vn/wopublish-search/public/detail/designs?id={}",
+    "trademarks": "https://wipopublish.ipvietnam.gov.vn/wopublish-search/public/detail/trademarks?id={}",
+}
+
+TRANSFER_BYTES_JS = """
+var entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+var total = 0;
+for (var i = 0; i < entries.length; i++) { total += entries[i].transferSize || 0; }
+return [total, entries.length];
+"""
+
+
+def make_crawler(crawler_type, driver_path, page_profile, load_images, work_dir):
+    """Tạo crawler chỉ dùng Selenium (tắt HTTP fetch) với profile Chrome và kho bản ghi tạm"""
+    store = RecordStore(Path(work_dir) / "bench.sqlite")
+    profile_dir = Path(work_dir) / f"chrome_{page_profile}"
+    if crawler_type == "designs":
+        from crawler_trademarks import DesignCrawler
+
+        crawler_class = DesignCrawler
+    else:
+        from crawler_nhan_hieu import TrademarkCrawler
+
+        crawler_class = TrademarkCrawler
+    return crawler_class(
+        driver_path,
+        "",
+        use_http=False,
+        profile_dir=profile_dir,
+        store=store,
+        page_profile=page_profile,
+        load_images=load_images,
+    )
+
+
+def to_detail_id(filing_number):
+    processed_id = str(filing_number).replace("-", "")
+    if not processed_id.upper().startswith("VN"):
+        processed_id = "VN" + processed_id
+    return processed_id
+
+
+def bench_profile(crawler_type, driver_path, page_profile, load_images, filing_numbers, timeout):
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        crawler = make_crawler(crawler_type, driver_path, page_profile, load_images, work_dir)
+        try:
+            for filing_number in filing_numbers:
+                url = DETAIL_URLS[crawler_type].format(to_detail_id(filing_number))
+                start_time = time.perf_counter()
+                crawler.driver.get(url)
+                try:
+                    WebDriverWait(crawler.driver, timeout).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, "div.detail-container.col-md-12"))
+                    )
+                    loaded = True
+                except TimeoutException:
+                    loaded = False
+                elapsed = time.perf_counter() - start_time
+                transfer_bytes, request_count = crawler.driver.execute_script(TRANSFER_BYTES_JS)
+                results.append((filing_number, loaded, elapsed, transfer_bytes, request_count))
+                print(
+                    f"  [{page_profile}] {filing_number}: {elapsed:.2f}s, "
+                    f"{transfer_bytes / 1024:.0f} KB, {request_count} request"
+                    f"{'' if loaded else ' (không thấy detail-container)'}"
+                )
+        finally:
+            crawler.close()
+            crawler.store.close()
+    return results
+
+
+def print_summary(page_profile, results):
+    loaded = [r for r in results if r[1]]
+    if not loaded:
+        print(f"{page_profile:<8} không có trang nào tải thành công")
+        return
+    times = [r[2] for r in loaded]
+    sizes = [r[3] for r in loaded]
+    requests_count = [r[4] for r in loaded]
+    print(
+        f"{page_profile:<8} {len(loaded):>3}/{len(results):<3} "
+        f"median {statistics.median(times):6.2f}s  mean {statistics.mean(times):6.2f}s  "
+        f"{statistics.mean(sizes) / 1024:8.0f} KB/trang  {statistics.mean(requests_count):5.1f} request/trang"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh profile tải trang full vs light")
+    parser.add_argument("--type", choices=sorted(DETAIL_URLS), default="designs")
+    parser.add_argument("--driver-path", default="chromedriver-win64/chromedriver.exe")
+    parser.add_argument("--input", help="File Excel có cột filing_number")
+    parser.add_argument("--ids", nargs="*", default=[], help="Danh sách số đơn")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--profiles", nargs="+", choices=PAGE_PROFILES, default=PAGE_PROFILES)
+    parser.add_argument("--load-images", action="store_true", help="Profile light vẫn tải ảnh")
+    parser.add_argument("--timeout", type=int, default=30)
+    args = parser.parse_args()
+
+    filing_numbers = list(args.ids)
+    if args.input:
+        filing_numbers += pd.read_excel(args.input)["filing_number"].dropna().astype(str).tolist()
+    filing_numbers = filing_numbers[: args.limit]
+    if not filing_numbers:
+        parser.error("Cần --ids hoặc --input")
+
+    print("=" * 80)
+    print(f"BENCHMARK TẢI TRANG {args.type.upper()} - {len(filing_numbers)} số đơn")
+    print("=" * 80)
+
+    all_results = {}
+    for page_profile in args.profiles:
+        all_results[page_profile] = bench_profile(
+            args.type, args.driver_path, page_profile, args.load_images, filing_numbers, args.timeout
+        )
+
+    print()
+    print("KẾT QUẢ:")
+    for page_profile, results in all_results.items():
+        print_summary(page_profile, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Profile tải trang nhẹ cho Chrome
+- Chặn stylesheet của NOIP, font và script bên thứ ba (analytics) bằng Chrome DevTools
+  (Network.setBlockedURLs) - không chặn reCAPTCHA để vẫn giải được challenge
+- Tùy chọn tắt tải ảnh trong trình duyệt (ảnh được tải riêng bằng requests trong save_images);
+  nếu cần giải challenge reCAPTCHA có hình thủ công thì bật load_images
+- Chạy headless trên server Linux (không có DISPLAY)
+"""
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+PAGE_PROFILE_FULL = "full"
+PAGE_PROFILE_LIGHT = "light"
+PAGE_PROFILES = [PAGE_PROFILE_FULL, PAGE_PROFILE_LIGHT]
+
+NOIP_STYLESHEET_PATTERNS = [
+    "*ipvietnam.gov.vn*.css",
+    "*ipvietnam.gov.vn*.css?*",
+]
+
+FONT_PATTERNS = [
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.eot",
+    "*fonts.googleapis.com*",
+    "*fonts.gstatic.com*",
+]
+
+THIRD_PARTY_SCRIPT_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*connect.facebook.net*",
+    "*hotjar.com*",
+]
+
+IMAGE_PATTERNS = ["*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.svg", "*.ico"]
+
+
+def should_run_headless():
+    """Headless mặc định trên Linux khi không có màn hình (server)"""
+    return sys.platform.startswith("linux") and not os.environ.get("DISPLAY")
+
+
+def apply_light_profile(chrome_options, load_images=False, headless=None):
+    """Thêm các tham số dòng lệnh của profile nhẹ vào Options (gọi trước khi tạo driver)"""
+    if headless is None:
+        headless = should_run_headless()
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+    if not load_images:
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument("--disable-background-networking")
+    chrome_options.add_argument("--disable-component-update")
+    chrome_options.add_argument("--disable-default-apps")
+    chrome_options.add_argument("--disable-sync")
+
+
+def enable_request_blocking(driver, load_images=False, block_stylesheets=True):
+    """Bật chặn request qua Chrome DevTools (gọi sau khi tạo driver, áp dụng cho mọi trang sau đó)"""
+    patterns = FONT_PATTERNS + THIRD_PARTY_SCRIPT_PATTERNS
+    if block_stylesheets:
+        patterns = NOIP_STYLESHEET_PATTERNS + patterns
+    if not load_images:
+        patterns = patterns + IMAGE_PATTERNS
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    logger.info(f"🪶 Profile nhẹ: chặn {len(patterns)} mẫu URL (ảnh: {'có' if load_images else 'không'})")
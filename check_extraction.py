@@ -0,0 +1,138 @@
+"""
+Kiểm tra hồi quy trích xuất: row_data của các trang đã lưu phải khớp golden + không vượt ngân sách hiệu năng
+- Golden: fixtures/detail_pages/<loại>_<số đơn>.json cạnh file HTML, so khớp cả giá trị
+  lẫn thứ tự cột (thứ tự cột Excel) với mọi backend parse có trên máy
+- Hiệu năng theo từng loại (backend mặc định): record/giây (tốt nhất trong rounds lần đo)
+  và bộ nhớ cấp phát đỉnh mỗi record (tracemalloc), so với fixtures/extraction_budgets.json
+Thoát mã 1 nếu golden khác hoặc vượt ngân sách.
+Ví dụ:
+    python check_extraction.py
+    python check_extraction.py --update-golden          (sau khi cố ý đổi output)
+    python check_extraction.py --budget-scale 0.5       (máy chậm: hạ ngưỡng record/giây một nửa)
+"""
+import argparse
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+from check_parser_parity import best_ms_per_record, load_pages
+from html_parser import DEFAULT_PARSER, available_parsers
+
+DEFAULT_BUDGETS = "fixtures/extraction_budgets.json"
+
+
+def golden_path(path):
+    return path.with_suffix(".json")
+
+
+def update_golden(pages):
+    for path, extractor, html in pages:
+        row_data = extractor(html)
+        golden_path(path).write_text(json.dumps(row_data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"✎ {golden_path(path).name}: {len(row_data)} trường")
+
+
+def check_golden(pages, parsers):
+    """So row_data (giá trị + thứ tự khóa) với golden; trả về số trang sai"""
+    failures = 0
+    for path, extractor, html in pages:
+        gold_file = golden_path(path)
+        if not gold_file.exists():
+            failures += 1
+            print(f"❌ {path.name}: thiếu golden {gold_file.name} (chạy --update-golden)")
+            continue
+        expected = json.loads(gold_file.read_text(encoding="utf-8"))
+        for parser in parsers:
+            actual = extractor(html, parser)
+            if list(actual.items()) == list(expected.items()):
+                print(f"✓ {path.name} [{parser}]: khớp golden ({len(expected)} trường)")
+                continue
+            failures += 1
+            print(f"❌ {path.name} [{parser}]: khác golden")
+            for key in sorted(set(expected) | set(actual)):
+                if expected.get(key) != actual.get(key):
+                    print(f"     {key!r}: {expected.get(key)!r} != {actual.get(key)!r}")
+            if actual == expected:
+                print(f"     thứ tự cột khác: {list(actual)} != {list(expected)}")
+    return failures
+
+
+def peak_kb_per_record(pages):
+    """Bộ nhớ cấp phát đỉnh trung bình (KB) khi trích xuất một record"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _, extractor, html in pages:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            extractor(html)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - baseline) / 1024)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks)
+
+
+def measure(pages, repeat, rounds):
+    """{loại: (record/giây, KB đỉnh/record)} với backend parse mặc định"""
+    by_type = {}
+    for page in pages:
+        by_type.setdefault(page[0].stem.split("_", 1)[0], []).append(page)
+    results = {}
+    for page_type, type_pages in sorted(by_type.items()):
+        ms = best_ms_per_record(type_pages, lambda extractor, html: extractor(html), repeat, rounds)
+        results[page_type] = (1000 / ms, peak_kb_per_record(type_pages))
+    return results
+
+
+def check_budgets(results, budgets, budget_scale):
+    failures = 0
+    print(f"HIỆU NĂNG ({DEFAULT_PARSER}):      record/giây   (ngân sách)  |  KB đỉnh/record   (ngân sách)")
+    for page_type, (records_per_sec, peak_kb) in results.items():
+        budget = budgets.get(page_type)
+        if budget is None:
+            print(f"  {page_type:<12} {records_per_sec:12.0f}   (chưa có)   |  {peak_kb:14.1f}   (chưa có)")
+            continue
+        min_rate = budget["min_records_per_sec"] * budget_scale
+        max_kb = budget["max_peak_kb_per_record"]
+        rate_ok = records_per_sec >= min_rate
+        memory_ok = peak_kb <= max_kb
+        failures += (not rate_ok) + (not memory_ok)
+        print(
+            f"  {page_type:<12} {records_per_sec:12.0f} {'✓' if rate_ok else '❌'} (>= {min_rate:.0f})"
+            f"  |  {peak_kb:14.1f} {'✓' if memory_ok else '❌'} (<= {max_kb:.0f})"
+        )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden + ngân sách hiệu năng cho trích xuất")
+    parser.add_argument("--pages", default="fixtures/detail_pages", help="Thư mục HTML trang chi tiết")
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS, help="File JSON ngân sách theo loại")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Nhân ngưỡng record/giây (máy chậm < 1)")
+    parser.add_argument("--repeat", type=int, default=20, help="Số lần lặp mỗi lần đo")
+    parser.add_argument("--rounds", type=int, default=5, help="Số lần đo (lấy kết quả tốt nhất)")
+    parser.add_argument("--update-golden", action="store_true", help="Ghi lại golden từ output hiện tại")
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    if not pages:
+        print(f"Không có trang nào trong {args.pages}")
+        return 1
+    if args.update_golden:
+        update_golden(pages)
+        return 0
+
+    failures = check_golden(pages, available_parsers())
+    print()
+    budgets = json.loads(Path(args.budgets).read_text(encoding="utf-8")) if Path(args.budgets).exists() else {}
+    failures += check_budgets(measure(pages, args.repeat, args.rounds), budgets, args.budget_scale)
+
+    print()
+    print("❌ CÓ HỒI QUY" if failures else "✅ Không có hồi quy")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
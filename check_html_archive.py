@@ -0,0 +1,54 @@
+"""
+Kiểm tra HtmlArchive.latest() / load(): lần fetch mới nhất của mỗi số đơn phải đi kèm
+đúng HTML của lần fetch đó, kết quả theo thứ tự fetch đầu tiên
+Thoát mã 1 nếu sai.
+Ví dụ:
+    python check_html_archive.py
+"""
+import sys
+import tempfile
+
+from html_archive import HtmlArchive, read_html
+
+
+def check_latest(archive):
+    """Trả về danh sách lỗi (rỗng: đúng)"""
+    errors = []
+    # X fetch hai lần: HTML cũ trước, HTML mới sau; Y ở giữa
+    archive.store("X", "designs", "<div>X cũ</div>", fetched_at=1.0)
+    archive.store("Y", "designs", "<div>Y</div>", fetched_at=1.5)
+    archive.store("X", "designs", "<div>X mới</div>", fetched_at=2.0)
+    # Ghi index không theo thứ tự thời gian (lần fetch cũ hơn ghi sau)
+    archive.store("Z", "designs", "<div>Z mới</div>", fetched_at=5.0)
+    archive.store("Z", "designs", "<div>Z cũ</div>", fetched_at=4.0)
+
+    pages = archive.latest()
+    if [page.filing_number for page in pages] != ["X", "Y", "Z"]:
+        errors.append(f"thứ tự: {[page.filing_number for page in pages]} != ['X', 'Y', 'Z']")
+    expected = {"X": (2.0, "<div>X mới</div>"), "Y": (1.5, "<div>Y</div>"), "Z": (5.0, "<div>Z mới</div>")}
+    for page in pages:
+        fetched_at, html = expected[page.filing_number]
+        actual = read_html(page.object_path)
+        if page.fetched_at != fetched_at or actual != html:
+            errors.append(f"latest {page.filing_number}: ({page.fetched_at}, {actual!r}) != ({fetched_at}, {html!r})")
+    for filing_number, (_, html) in expected.items():
+        if archive.load(filing_number) != html:
+            errors.append(f"load({filing_number!r}): {archive.load(filing_number)!r} != {html!r}")
+    return errors
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        archive = HtmlArchive(root)
+        try:
+            errors = check_latest(archive)
+        finally:
+            archive.close()
+    for error in errors:
+        print(f"❌ {error}")
+    print("❌ HtmlArchive sai" if errors else "✅ HtmlArchive.latest() trả đúng lần fetch mới nhất")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Kiểm tra backend parse HTML cho ra row_data giống hệt nhau + đo thời gian parse mỗi record
+(lxml: cây lxml.html duyệt trực tiếp; html.parser: BeautifulSoup - xem html_parser.py)
+Đọc các trang chi tiết đã lưu (HTML detail-container), tên file dạng
+<loại>_<số đơn>.html với loại là designs, trademarks hoặc patents
+Ví dụ:
+    python check_parser_parity.py
+    python check_parser_parity.py --pages fixtures/detail_pages --repeat 50 --rounds 10
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from detail_extractor import EXTRACTORS
+from html_parser import PARSER_HTML, available_parsers, get_backend
+
+
+def load_pages(pages_dir):
+    pages = []
+    for path in sorted(Path(pages_dir).glob("*.html")):
+        page_type = path.stem.split("_", 1)[0]
+        if page_type not in EXTRACTORS:
+            print(f"⚠️ Bỏ qua {path.name} (không rõ loại trang)")
+            continue
+        pages.append((path, EXTRACTORS[page_type], path.read_text(encoding="utf-8")))
+    return pages
+
+
+def check_parity(pages, parsers):
+    """So sánh row_data của từng backend với html.parser (backend gốc)"""
+    mismatches = 0
+    for path, extractor, html in pages:
+        expected = extractor(html, PARSER_HTML)
+        for parser in parsers:
+            if parser == PARSER_HTML:
+                continue
+            actual = extractor(html, parser)
+            if actual != expected:
+                mismatches += 1
+                print(f"❌ {path.name}: {parser} khác {PARSER_HTML}")
+                for key in sorted(set(expected) | set(actual)):
+                    if expected.get(key) != actual.get(key):
+                        print(f"     {key!r}: {expected.get(key)!r} != {actual.get(key)!r}")
+            else:
+                print(f"✓ {path.name}: {parser} giống {PARSER_HTML} ({len(expected)} trường)")
+    return mismatches
+
+
+def best_ms_per_record(pages, fn, repeat, rounds):
+    """Thời gian tốt nhất trong rounds lần đo (kiểu timeit) - ms mỗi record"""
+    best = None
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            for _, extractor, html in pages:
+                fn(extractor, html)
+        elapsed = (time.perf_counter() - start_time) * 1000 / (repeat * len(pages))
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark(pages, parsers, repeat, rounds=5):
+    """
+    Thời gian mỗi record (ms) của từng backend
+    Return: {parser: (ms chỉ dựng cây HTML, ms dựng cây + trích xuất row_data)}
+    """
+    results = {}
+    for parser in parsers:
+        backend = get_backend(parser)
+        parse_ms = best_ms_per_record(pages, lambda _, html: backend.parse(html), repeat, rounds)
+        total_ms = best_ms_per_record(pages, lambda extractor, html: extractor(html, parser), repeat, rounds)
+        results[parser] = (parse_ms, total_ms)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kiểm tra parity + benchmark backend parse HTML")
+    parser.add_argument("--pages", default="fixtures/detail_pages", help="Thư mục HTML trang chi tiết")
+    parser.add_argument("--repeat", type=int, default=20, help="Số lần lặp mỗi lần đo")
+    parser.add_argument("--rounds", type=int, default=5, help="Số lần đo (lấy kết quả tốt nhất)")
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    if not pages:
+        print(f"Không có trang nào trong {args.pages}")
+        return 1
+    parsers = available_parsers()
+    print(f"Backend: {', '.join(parsers)} | {len(pages)} trang")
+
+    mismatches = check_parity(pages, parsers)
+
+    print()
+    print("THỜI GIAN (ms/record):    dựng cây      x  |  dựng cây + trích xuất      x")
+    results = benchmark(pages, parsers, args.repeat, args.rounds)
+    base_parse, base_total = results[PARSER_HTML]
+    for name, (parse_ms, total_ms) in results.items():
+        print(
+            f"  {name:<22} {parse_ms:8.3f} {base_parse / parse_ms:6.2f}  |"
+            f"  {total_ms:21.3f} {base_total / total_ms:6.2f}"
+        )
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
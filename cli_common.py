@@ -0,0 +1,109 @@
+"""
+Tham số dòng lệnh và chọn runner dùng chung cho main.py, main_trademarks.py, main_nhan_hieu.py
+Mỗi script chỉ truyền mô tả và thư mục output của mình.
+"""
+import argparse
+
+from browser_profile import PAGE_PROFILES
+from log_config import DEFAULT_RECORD_BUDGET
+from pipeline import CrawlPipeline
+from profiling import DEFAULT_EVERY as DEFAULT_PROFILE_EVERY, SCOPES as PROFILE_SCOPES
+from profiling import parse_scopes
+from worker_pool import CrawlerPool
+
+
+def parse_args(description, output_dir):
+    """Tham số dòng lệnh chung; output_dir: thư mục output của script (cho mặc định trong help)"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Số Chrome driver chạy song song (mặc định: 1)"
+    )
+    parser.add_argument(
+        "--page-profile",
+        choices=PAGE_PROFILES,
+        default="full",
+        help="full: render đầy đủ như trình duyệt; light: chặn CSS/font/analytics, headless trên Linux",
+    )
+    parser.add_argument(
+        "--load-images", action="store_true", help="Profile light: vẫn tải ảnh trong trình duyệt"
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        help=(
+            "Số process parse HTML (mặc định 0: parse ngay trong thread của driver, lỗi parse thì "
+            "tải lại trang trừ khi chạy --pipeline). Có pool: lỗi parse chỉ được ghi thất bại vào "
+            "ledger, không tải lại trang - lần chạy sau thử lại"
+        ),
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Chạy theo pipeline fetch -> parse -> ảnh -> ghi với hàng đợi giới hạn giữa các bước",
+    )
+    parser.add_argument("--image-workers", type=int, default=4, help="Pipeline: số thread tải ảnh")
+    parser.add_argument("--queue-size", type=int, default=8, help="Pipeline: sức chứa hàng đợi giữa các bước")
+    parser.add_argument(
+        "--metrics-out",
+        default=None,
+        help=f"File thời gian từng pha (*.prom: Prometheus text, còn lại: JSON; mặc định: {output_dir}/metrics.json)",
+    )
+    parser.add_argument("--metrics-interval", type=float, default=30, help="Số giây giữa hai lần ghi file metrics")
+    parser.add_argument(
+        "--network-timing",
+        action="store_true",
+        help="Đo TTFB / thời gian tải trang chi tiết và ảnh trong Chrome qua CDP (histogram net_* trong metrics)",
+    )
+    parser.add_argument(
+        "--status-port",
+        type=int,
+        default=None,
+        help="Cổng HTTP xem trạng thái crawl (/, /status.json, /metrics; xem bằng status_dashboard.py)",
+    )
+    parser.add_argument(
+        "--status-interval", type=float, default=60, help="Số giây giữa hai lần log bảng trạng thái (0: tắt)"
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING"],
+        default="INFO",
+        help="Mức log (DEBUG: cả từng lần F5 / click / ảnh của mỗi số đơn)",
+    )
+    parser.add_argument("--log-json", default=None, help="Ghi thêm log dạng JSON-lines (mỗi dòng một object) vào file này")
+    parser.add_argument(
+        "--log-budget",
+        type=int,
+        default=DEFAULT_RECORD_BUDGET,
+        help=f"Số dòng log INFO/DEBUG tối đa mỗi số đơn (mặc định: {DEFAULT_RECORD_BUDGET}; 0: không giới hạn)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=parse_scopes,
+        default=(),
+        help=f"Bật cProfile cho các section, cách nhau dấu phẩy ({', '.join(PROFILE_SCOPES)}); mặc định: tắt",
+    )
+    parser.add_argument(
+        "--profile-every", type=int, default=DEFAULT_PROFILE_EVERY, help="Ghi file profile / snapshot bộ nhớ sau mỗi N record"
+    )
+    parser.add_argument(
+        "--profile-memory", action="store_true", help="Snapshot tracemalloc mỗi N record (dòng code tăng bộ nhớ nhiều nhất)"
+    )
+    parser.add_argument("--profile-dir", default=None, help=f"Thư mục ghi profile (mặc định: {output_dir}/profile)")
+    return parser.parse_args()
+
+
+def make_runner(args, crawler_factory, process_name, collector, parse_pool):
+    """CrawlPipeline (--pipeline) hoặc CrawlerPool"""
+    if args.pipeline:
+        return CrawlPipeline(
+            crawler_factory,
+            collector,
+            fetch_workers=args.workers,
+            # Có ParsePool: một thread chỉ gửi HTML vào pool, không chờ parse xong
+            parse_workers=1,
+            image_workers=args.image_workers,
+            queue_size=args.queue_size,
+            parse_pool=parse_pool,
+        )
+    return CrawlerPool(crawler_factory, process_name, args.workers, collector)
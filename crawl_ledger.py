@@ -0,0 +1,149 @@
+"""
+Sổ theo dõi trạng thái crawl của từng số đơn (nằm chung file records.sqlite)
+Mỗi số đơn có một dòng: pending / done / failed / not_found, số lần thử,
+lỗi gần nhất và thời gian xử lý. Khởi động lại chỉ cần "select pending",
+không phụ thuộc thứ tự file input và không crawl lại số đơn đã xong.
+Ledger dùng chung connection + lock của RecordStore: cập nhật trạng thái nằm trong
+cùng transaction với bản ghi và được commit theo nhóm (RecordStore.note_write) thay vì
+mở connection thứ hai phải chờ transaction ghi đang mở của RecordStore.
+Cột network (JSON) giữ thời gian mạng từng request của lần thử gần nhất khi chạy
+--network-timing (network_timing.py), để so TTFB server giữa các số đơn sau khi crawl.
+"""
+import json
+import logging
+import time
+
+from record_store import normalize_filing_number
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_NOT_FOUND = "not_found"
+
+
+class CrawlLedger:
+    def __init__(self, store, max_attempts=3):
+        self.store = store
+        self.db_path = store.db_path
+        self.max_attempts = max_attempts
+        self.lock = store.lock
+        self.conn = store.conn
+        with self.lock:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ledger (
+                    filing_number TEXT PRIMARY KEY,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    started_at REAL,
+                    finished_at REAL,
+                    duration REAL,
+                    network TEXT
+                )
+                """
+            )
+            # Ledger tạo trước khi có cột network: thêm cột (giá trị cũ là NULL)
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(ledger)")]
+            if "network" not in columns:
+                self.conn.execute("ALTER TABLE ledger ADD COLUMN network TEXT")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS ledger_status ON ledger (status)")
+            self.store.commit()
+
+    def close(self):
+        """Commit các cập nhật trạng thái còn chờ (connection do RecordStore đóng)"""
+        if not self.store.closed:
+            self.store.commit()
+
+    def add_pending(self, filing_numbers):
+        """
+        Đăng ký danh sách số đơn từ file input (số đơn đã có thì giữ nguyên trạng thái).
+        Số đơn đã nằm trong bảng records (từ các lần chạy trước) được đánh dấu done luôn.
+        Số đơn được chuẩn hóa (normalize_filing_number) giống khóa của RecordStore.import_excel.
+        """
+        filing_numbers = [normalize_filing_number(filing_number) for filing_number in filing_numbers]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO ledger (filing_number) VALUES (?)",
+                [(filing_number,) for filing_number in filing_numbers if filing_number],
+            )
+            has_records = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records'"
+            ).fetchone()
+            if has_records:
+                self.conn.execute(
+                    """
+                    UPDATE ledger SET status = ?
+                    WHERE status = ? AND filing_number IN (SELECT filing_number FROM records)
+                    """,
+                    (STATUS_DONE, STATUS_PENDING),
+                )
+            self.store.commit()
+
+    def select_pending(self, retry_failed=True):
+        """Danh sách số đơn cần crawl (pending + failed còn lượt thử), theo thứ tự đăng ký"""
+        with self.lock:
+            if retry_failed:
+                rows = self.conn.execute(
+                    """
+                    SELECT filing_number FROM ledger
+                    WHERE status = ? OR (status = ? AND attempts < ?)
+                    ORDER BY rowid
+                    """,
+                    (STATUS_PENDING, STATUS_FAILED, self.max_attempts),
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT filing_number FROM ledger WHERE status = ? ORDER BY rowid",
+                    (STATUS_PENDING,),
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    def status(self, filing_number):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status FROM ledger WHERE filing_number = ?", (str(filing_number),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def mark_started(self, filing_number):
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO ledger (filing_number, attempts, started_at) VALUES (?, 1, ?)
+                ON CONFLICT(filing_number) DO UPDATE SET attempts = attempts + 1, started_at = excluded.started_at
+                """,
+                (str(filing_number), time.time()),
+            )
+            self.store.note_write()
+
+    def mark_finished(self, filing_number, status, duration=None, error=None, network=None):
+        """network: danh sách dict của network_timing (None = không đo, giữ NULL)"""
+        network_json = json.dumps(network, ensure_ascii=False) if network is not None else None
+        with self.lock:
+            self.conn.execute(
+                """
+                UPDATE ledger SET status = ?, last_error = ?, finished_at = ?, duration = ?, network = ?
+                WHERE filing_number = ?
+                """,
+                (status, error, time.time(), duration, network_json, str(filing_number)),
+            )
+            self.store.note_write()
+
+    def network_timings(self, filing_number):
+        """Thời gian mạng đã ghi của một số đơn (None nếu lần thử gần nhất không đo)"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT network FROM ledger WHERE filing_number = ?", (str(filing_number),)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def summary(self):
+        """Số lượng số đơn theo từng trạng thái"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM ledger GROUP BY status"
+            ).fetchall()
+        return dict(rows)
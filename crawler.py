@@ -1,11 +1,8 @@
 import os
-import re
 import time
 import pandas as pd
-import requests
 import logging
 from pathlib import Path
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -15,24 +12,90 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
 from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
+from record_store import open_store
+from image_downloader import get_image_downloader
+from page_harvest import FetchedPage, harvest_page
+from detail_extractor import extract_design_fields
+from parse_pool import resolve_row
+from page_state import PageState, probe_page_state
+from http_fetcher import DESIGN_IMAGE_SELECTORS
+from browser_profile import PAGE_PROFILE_LIGHT, apply_light_profile, enable_request_blocking
+from metrics import increment, observe, span
+from webdriver_profiler import DriverProfiler, instrument_driver
+from network_timing import collect_network_timings, discard_network_events, enable_network_timing
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
+DETAIL_CONTAINER_XPATH = "//div[contains(@class, 'detail-container')]"
+# Trang tìm kiếm NOIP mở bằng http:// (Chrome hiện trang cảnh báo bảo mật - xem bypass_security_warning)
+SEARCH_BASE_URL = "http://wipopublish.ipvietnam.gov.vn"
+
+# Giới hạn trên (giây) cho từng điều kiện chờ - chờ xong sớm nếu server trả về nhanh
+DEFAULT_WAIT_TIMEOUTS = {
+    "search_input": 10,  # ô tìm kiếm xuất hiện
+    "result_link": 15,  # link chi tiết trong kết quả tìm kiếm có thể click
+    "detail_page": 10,  # sau khi click: detail-container hoặc lỗi 500 xuất hiện
+    "interstitial": 5,  # trang cảnh báo bảo mật biến mất sau khi click
+    "detail_container": 30,  # detail-container có class col-md-12 sẵn sàng để trích xuất
+}
+
+# Số lần tải trang + parse trong thread (lỗi parse -> tải lại trang, xem fetch_and_parse)
+PARSE_ATTEMPTS = 2
+
+
+def page_shows_server_error(driver):
+    """Điều kiện chờ: trang hiện tại là lỗi Internal Server Error"""
+    return probe_page_state(driver) is PageState.SERVER_500
+
 
 class Crawler:
-    def __init__(self, driver_path, excel_path, restart_interval=100):
+    def __init__(
+        self,
+        driver_path,
+        excel_path,
+        restart_interval=100,
+        profile_dir=None,
+        wait_timeouts=None,
+        store=None,
+        page_profile="full",
+        load_images=False,
+        headless=None,
+        parse_pool=None,
+        archive=None,
+        base_url=None,
+        network_timing=False,
+    ):
         self.driver_path = Path(driver_path)
         self.excel_path = Path(excel_path)
+        self.wait_timeouts = {**DEFAULT_WAIT_TIMEOUTS, **(wait_timeouts or {})}
+        # Profile tải trang: "full" (render đầy đủ) hoặc "light" (xem browser_profile.py)
+        self.page_profile = page_profile
+        self.load_images = load_images
+        self.headless = headless
+        # Thư mục profile Chrome riêng (mỗi worker trong pool một thư mục)
+        self.profile_dir = Path(profile_dir) if profile_dir else None
         # Thư mục output tường minh
         self.excel_folder = Path("Output_Designs")
         self.excel_folder.mkdir(exist_ok=True)
         self.excel_file_path = self.excel_folder / "designs_data.xlsx"
-        self.data = []
+        # RecordStore dùng chung (CrawlerPool truyền vào), None = tự mở kho trong thư mục output
+        self.store = store
+        # URL ảnh của trang hiện tại lấy từ harvest_page (None = lấy ảnh từ driver)
+        self.current_image_urls = None
+        # ParsePool dùng chung (parse_pool.py), None = parse ngay trong thread điều khiển Chrome
+        self.parse_pool = parse_pool
+        # HtmlArchive lưu HTML thô của mỗi trang fetch được (html_archive.py), None = không lưu
+        self.archive = archive
+        # Gốc URL trang tìm kiếm (None = site thật; bench_crawl.py trỏ vào mock_noip_server.py)
+        self.base_url = base_url or SEARCH_BASE_URL
         self.restart_interval = restart_interval
         self.search_count = 0
+        # Đo TTFB / thời gian tải từng request qua CDP performance log (network_timing.py)
+        self.network_timing = network_timing
+        # Đếm lệnh WebDriver theo từng số đơn (webdriver_profiler.py)
+        self.driver_profiler = DriverProfiler()
+        # Thời gian chờ trang chi tiết của số đơn đang xử lý (wait_for_detail_page)
+        self.detail_wait_seconds = 0.0
         self.load_existing_data()
         self.init_driver()
 
@@ -43,6 +106,9 @@ class Crawler:
         self.chrome_options.add_argument("--incognito")
         self.chrome_options.add_argument("--disable-extensions")
         self.chrome_options.add_argument("--window-size=1920,1080")
+        if self.profile_dir:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            self.chrome_options.add_argument(f"--user-data-dir={self.profile_dir.absolute()}")
         # Bỏ qua cảnh báo bảo mật HTTPS
         self.chrome_options.add_argument("--ignore-certificate-errors")
         self.chrome_options.add_argument("--ignore-ssl-errors")
@@ -55,52 +121,69 @@ class Crawler:
             "profile.default_content_setting_values.mixed_content": 1,
             "profile.default_content_setting_values.protocol_handlers": 1,
         })
+        if self.page_profile == PAGE_PROFILE_LIGHT:
+            apply_light_profile(self.chrome_options, self.load_images, self.headless)
         # Sử dụng ChromeDriver local đã cập nhật
+        if self.network_timing:
+            enable_network_timing(self.chrome_options)
         self.service = Service(executable_path=self.driver_path)
         self.driver = webdriver.Chrome(
             service=self.service, options=self.chrome_options
         )
+        instrument_driver(self.driver, self.driver_profiler)
+        if self.page_profile == PAGE_PROFILE_LIGHT:
+            # Link chi tiết (a.fa-file-text) chỉ là icon font, không có CSS thì kích thước 0
+            # và không "clickable" - giữ stylesheet cho crawler tìm kiếm qua giao diện
+            enable_request_blocking(self.driver, self.load_images, block_stylesheets=False)
 
     def load_existing_data(self):
-        if self.excel_file_path.exists():
-            self.existing_data = pd.read_excel(self.excel_file_path)
-            self.last_so_don = (
-                self.existing_data["Số công bố"].iloc[-1]
-                if not self.existing_data.empty
-                else None
-            )
-        else:
-            self.existing_data = pd.DataFrame()
-            self.last_so_don = None
+        # Kho bản ghi SQLite (tự nạp file Excel cũ ở lần chạy đầu tiên)
+        if self.store is None:
+            self.store = open_store(self.excel_folder, self.excel_file_path)
 
     def close_driver(self):
         if self.driver:
             self.driver.quit()
             self.driver = None
 
+    def close(self):
+        """Đóng hẳn khi hết việc (cùng giao diện với crawler direct URL)"""
+        self.close_driver()
+
     def restart_driver(self):
+        increment("driver_restarts")
         self.close_driver()
         self.init_driver()
         self.search_count = 0
         logger.info("Driver đã được khởi động lại.")
 
+    def wait_for_navigation(self, old_page):
+        """Chờ trang cũ bị thay thế (element gốc trở thành stale) - tối đa wait_timeouts['interstitial'] giây"""
+        try:
+            WebDriverWait(self.driver, self.wait_timeouts["interstitial"]).until(
+                EC.staleness_of(old_page)
+            )
+            return True
+        except TimeoutException:
+            return False
+
     def bypass_security_warning(self):
         """Tự động click qua trang cảnh báo bảo mật nếu có"""
         max_attempts = 5
         for attempt in range(max_attempts):
             try:
-                time.sleep(1)
-                # Kiểm tra xem có đang ở trang cảnh báo không
-                if "doesn't support a secure connection" in self.driver.page_source or \
-                   "Continue to site" in self.driver.page_source:
-                    logger.info(f"Phát hiện trang cảnh báo bảo mật, đang thử click 'Continue to site' (lần {attempt + 1})...")
+                # driver.get() đã chờ trang load xong, kiểm tra ngay không cần sleep
+                # Kiểm tra xem có đang ở trang cảnh báo không (một lệnh probe, không đọc page_source)
+                if probe_page_state(self.driver) is PageState.SECURITY_INTERSTITIAL:
+                    logger.debug("Phát hiện trang cảnh báo bảo mật, đang thử click 'Continue to site' (lần %s)...", attempt + 1)
+                    old_page = self.driver.find_element(By.TAG_NAME, "html")
 
                     # Phương pháp 1: Tìm button bằng text
                     try:
                         button = self.driver.find_element(By.XPATH, "//button[contains(text(), 'Continue to site')]")
                         button.click()
-                        logger.info("Đã click 'Continue to site' thành công!")
-                        time.sleep(2)
+                        logger.debug("Đã click 'Continue to site' thành công!")
+                        self.wait_for_navigation(old_page)
                         return
                     except:
                         pass
@@ -116,8 +199,8 @@ class Crawler:
                                 }
                             }
                         """)
-                        logger.info("Đã click 'Continue to site' bằng JavaScript!")
-                        time.sleep(2)
+                        logger.debug("Đã click 'Continue to site' bằng JavaScript!")
+                        self.wait_for_navigation(old_page)
                         return
                     except:
                         pass
@@ -127,9 +210,9 @@ class Crawler:
                         try:
                             elem = self.driver.find_element(By.ID, element_id)
                             elem.click()
-                            time.sleep(1)
                         except:
                             pass
+                    self.wait_for_navigation(old_page)
                 else:
                     # Không còn trang cảnh báo
                     return
@@ -140,21 +223,21 @@ class Crawler:
         logger.warning("Không thể bypass trang cảnh báo bảo mật sau 5 lần thử")
 
     def search_and_click(self, search_value):
-        logger.info(f"=" * 80)
-        logger.info(f"BẮT ĐẦU XỬ LÝ SỐ ĐƠN: {search_value}")
-        logger.info(f"=" * 80)
+        logger.debug("=" * 80)
+        logger.info("BẮT ĐẦU XỬ LÝ SỐ ĐƠN: %s", search_value)
+        logger.debug("=" * 80)
 
         try:
-            self.driver.get(
-                "http://wipopublish.ipvietnam.gov.vn/wopublish-search/public/designs?1&query=*:*"
-            )
-            logger.info(f"✓ Đã truy cập trang tìm kiếm Designs (Kiểu dáng công nghiệp)")
+            with span("navigate"):
+                self.driver.get(f"{self.base_url}/wopublish-search/public/designs?1&query=*:*")
+            logger.debug("✓ Đã truy cập trang tìm kiếm Designs (Kiểu dáng công nghiệp)")
 
             # Thử bypass cảnh báo bảo mật nếu có
-            self.bypass_security_warning()
+            with span("interstitial"):
+                self.bypass_security_warning()
 
             # Đợi ô tìm kiếm xuất hiện
-            WebDriverWait(self.driver, 10).until(
+            WebDriverWait(self.driver, self.wait_timeouts["search_input"]).until(
                 EC.presence_of_element_located(
                     (
                         By.NAME,
@@ -167,10 +250,10 @@ class Crawler:
                 By.NAME,
                 "advancedInputWrapper:advancedInputsList:1:advancedInputSearchPanel:input",
             )
-            logger.info(f"✓ Tìm thấy ô tìm kiếm, đang nhập số đơn: {search_value}")
+            logger.debug("✓ Tìm thấy ô tìm kiếm, đang nhập số đơn: %s", search_value)
             input_field.send_keys(search_value)
             input_field.send_keys(Keys.RETURN)
-            logger.info(f"✓ Đã gửi yêu cầu tìm kiếm, đang chờ kết quả...")
+            logger.debug("✓ Đã gửi yêu cầu tìm kiếm, đang chờ kết quả...")
 
             # Thử click vào link chi tiết - 5 lần thử
             max_click_attempts = 5
@@ -178,53 +261,46 @@ class Crawler:
 
             for attempt in range(max_click_attempts):
                 try:
-                    logger.info(f"Đang thử click vào link chi tiết (lần {attempt + 1}/{max_click_attempts})...")
+                    logger.debug("Đang thử click vào link chi tiết (lần %s/%s)...", attempt + 1, max_click_attempts)
 
                     # Đợi link xuất hiện
-                    a_tag = WebDriverWait(self.driver, 15).until(
+                    a_tag = WebDriverWait(self.driver, self.wait_timeouts["result_link"]).until(
                         EC.element_to_be_clickable((By.CSS_SELECTOR, "a.fa-file-text.fa-lg"))
                     )
+                    search_url = self.driver.current_url
 
                     # Phương pháp 1: JavaScript click (nhanh nhất)
                     try:
                         self.driver.execute_script("arguments[0].click();", a_tag)
-                        time.sleep(2)
                     except:
                         pass
 
-                    # Phương pháp 2: Click thông thường
-                    try:
-                        a_tag.click()
-                        time.sleep(2)
-                    except:
-                        pass
-
-                    # Kiểm tra xem đã vào trang chi tiết chưa
-                    time.sleep(3)
+                    # Phương pháp 2: Click thông thường - chỉ khi JS click không chuyển trang
+                    if not self.wait_for_detail_page(search_url):
+                        try:
+                            a_tag.click()
+                        except:
+                            pass
+                        self.wait_for_detail_page(search_url)
 
                     # Kiểm tra xem có lỗi Internal Server Error không
-                    if "Internal Server Error" in self.driver.page_source:
+                    if page_shows_server_error(self.driver):
                         logger.error(f"❌ Server trả về Internal Server Error (lỗi 500)")
                         logger.error(f"⚠️ Đây là lỗi từ phía server NOIP, không phải lỗi code")
                         logger.error(f"🔄 Sẽ restart driver và skip record này...")
                         self.restart_driver()
                         raise Exception(f"Server Internal Error - skip record {search_value}")
 
-                    try:
-                        self.driver.find_element(By.XPATH, "//div[contains(@class, 'detail-container')]")
-                        logger.info(f"✓ Đã vào trang chi tiết thành công sau {attempt + 1} lần thử!")
+                    if self.driver.find_elements(By.XPATH, DETAIL_CONTAINER_XPATH):
+                        logger.info("✓ Đã vào trang chi tiết thành công sau %s lần thử!", attempt + 1)
                         clicked_successfully = True
                         break
-                    except:
-                        logger.warning(f"Chưa vào được trang chi tiết, thử lại...")
-                        time.sleep(1)
+                    logger.warning(f"Chưa vào được trang chi tiết, thử lại...")
 
                 except TimeoutException:
                     logger.warning(f"Timeout khi tìm link chi tiết lần {attempt + 1}")
-                    time.sleep(2)
                 except Exception as e:
                     logger.warning(f"Lỗi khi thử click lần {attempt + 1}: {type(e).__name__}")
-                    time.sleep(2)
 
             if not clicked_successfully:
                 logger.error(f"⚠️ Không thể vào trang chi tiết sau {max_click_attempts} lần thử!")
@@ -238,157 +314,116 @@ class Crawler:
             self.restart_driver()
             raise
 
+    def wait_for_detail_page(self, search_url):
+        """
+        Chờ sau khi click link chi tiết: detail-container xuất hiện hoặc server trả lỗi 500
+        Return False nếu hết wait_timeouts['detail_page'] giây mà URL vẫn chưa đổi
+        Thời gian chờ cộng vào self.detail_wait_seconds (_fetch_page ghi một lần vào pha detail_wait)
+        """
+        started = time.perf_counter()
+        try:
+            WebDriverWait(self.driver, self.wait_timeouts["detail_page"]).until(
+                EC.any_of(
+                    EC.presence_of_element_located((By.XPATH, DETAIL_CONTAINER_XPATH)),
+                    page_shows_server_error,
+                )
+            )
+            return True
+        except TimeoutException:
+            return self.driver.current_url != search_url
+        finally:
+            self.detail_wait_seconds += time.perf_counter() - started
+
     def extract_data(self, detail_container):
-        html = detail_container.get_attribute("outerHTML")
-        soup = BeautifulSoup(html, "html.parser")
-        rows = soup.find_all("div", class_="row")
-        row_data = {}
-
-        for row in rows:
-            label_divs = row.find_all("div", class_="product-form-label")
-            details_divs = row.find_all("div", class_="product-form-details")
-            for label_div, details_div in zip(label_divs, details_divs):
-                if label_div and details_div:
-                    label_text = re.sub(
-                        r"^\([^)]*\)\s*", "", label_div.get_text(strip=True)
-                    )
-                    details_text = details_div.get_text(strip=True)
-
-                    if label_text == "Số bằng và ngày cấp":
-                        spans = details_div.find_all("span")
-                        if len(spans) >= 2:
-                            row_data["Số bằng"] = spans[0].get_text(strip=True)
-                            row_data["Ngày cấp"] = spans[1].get_text(strip=True)
-                    elif label_text == "Số đơn và Ngày nộp đơn":
-                        spans = details_div.find_all("span")
-                        if len(spans) == 2:
-                            row_data["Số đơn"] = spans[0].get_text(strip=True)
-                            row_data["Ngày nộp đơn"] = spans[1].get_text(strip=True)
-                    elif label_text == "Số công bố và ngày công bố":
-                        details_text = details_div.find("div", class_="row")
-                        content = details_text.find_all("div", class_="col-md-4")
-                        row_data["Số công bố"] = content[0].get_text(strip=True)
-                        row_data["Ngày công bố"] = content[1].get_text(strip=True)
-                    elif label_text == "Chủ đơn/Chủ bằng":
-                        contents = details_div.find_all("div", id="apnaDiv")
-                        for idx in range(1, 6):
-                            if idx <= len(contents):
-                                content = contents[idx - 1]
-                                first_row = content.find("div", class_="row")
-                                if first_row:
-                                    raw_text = "".join(
-                                        [
-                                            text
-                                            for text in first_row.stripped_strings
-                                            if not text.startswith("(")
-                                        ]
-                                    )
-                                    parts = raw_text.split(":", 1)
-                                    if len(parts) == 2:
-                                        row_data[f"Chủ đơn_{idx}"] = parts[0].strip()
-                                        row_data[f"Địa chỉ Chủ đơn_{idx}"] = parts[
-                                            1
-                                        ].strip()
-                                    elif len(parts) == 1:
-                                        row_data[f"Chủ đơn_{idx}"] = parts[0].strip()
-                                        row_data[f"Địa chỉ Chủ đơn_{idx}"] = ""
-                            else:
-                                row_data[f"Chủ đơn_{idx}"] = ""
-                                row_data[f"Địa chỉ Chủ đơn_{idx}"] = ""
-                    elif label_text == "Đại diện SHCN":
-                        contents = details_div.find("div", class_="row")
-                        for content in contents:
-                            raw_text = "".join(
-                                [
-                                    text
-                                    for text in content.stripped_strings
-                                    if not text.startswith("(")
-                                ]
-                            )
-                            parts = raw_text.split(":", 1)
-                            if len(parts) == 2:
-                                row_data["Đại diện SHCN"] = parts[0].strip()
-                                row_data["Địa chỉ đại diện"] = parts[1].strip()
-                    elif label_text == "Nhóm sản phẩm/dịch vụ":
-                        rows = details_div.find_all("div", class_="row")
-                        for idx in range(1, 10):
-                            if idx <= len(rows):
-                                row = rows[idx - 1]
-                                group_div = row.find("div", class_="col-md-2")
-                                service_div = row.find("div", class_="col-md-10")
-                                if group_div and service_div:
-                                    row_data[f"Nhóm sản phẩm_{idx}"] = (
-                                        group_div.get_text(strip=True)
-                                    )
-                                    row_data[f"Dịch vụ_{idx}"] = service_div.get_text(
-                                        strip=True
-                                    )
-                            else:
-                                row_data[f"Nhóm sản phẩm_{idx}"] = ""
-                                row_data[f"Dịch vụ_{idx}"] = ""
-                    else:
-                        row_data[label_text] = details_text
+        """Trích xuất dữ liệu từ trang chi tiết (nhận HTML hoặc WebElement)"""
+        if isinstance(detail_container, str):
+            html = detail_container
+        else:
+            html = detail_container.get_attribute("outerHTML")
+        return extract_design_fields(html)
 
-        return row_data
+    def parse_detail(self, detail_container):
+        """row_data (parse ngay trong thread này) hoặc Future khi có parse_pool"""
+        if self.parse_pool is None:
+            with span("parse"):
+                row_data = self.extract_data(detail_container)
+            logger.info("✓ Đã trích xuất %s trường dữ liệu", len(row_data))
+            return row_data
+        if not isinstance(detail_container, str):
+            detail_container = detail_container.get_attribute("outerHTML")
+        logger.debug("✓ Đã chuyển HTML sang parse pool")
+        return self.parse_pool.submit("designs", detail_container)
+
+    def collect_image_urls(self):
+        """URL ảnh của trang chi tiết hiện tại"""
+        if self.current_image_urls is not None:
+            # URL ảnh đã có sẵn từ harvest_page
+            image_urls = self.current_image_urls
+        else:
+            # Tìm ảnh với class DRAWING-detail (cho trang designs)
+            images = self.driver.find_elements(By.CSS_SELECTOR, "img.DRAWING-detail")
 
-    def save_images(self, folder_name, search_value):
-        # Tìm ảnh với class DRAWING-detail (cho trang designs)
-        images = self.driver.find_elements(By.CSS_SELECTOR, "img.DRAWING-detail")
+            # Nếu không tìm thấy, thử selector cũ (cho trademarks nếu cần)
+            if len(images) == 0:
+                logger.debug("   Không tìm thấy ảnh với selector 'img.DRAWING-detail', thử selector khác...")
+                images = self.driver.find_elements(By.CSS_SELECTOR, "img.detail-img")
 
-        # Nếu không tìm thấy, thử selector cũ (cho trademarks nếu cần)
-        if len(images) == 0:
-            logger.info(f"   Không tìm thấy ảnh với selector 'img.DRAWING-detail', thử selector khác...")
-            images = self.driver.find_elements(By.CSS_SELECTOR, "img.detail-img")
+            # Nếu vẫn không có, thử selector chung
+            if len(images) == 0:
+                logger.debug("   Thử tìm tất cả ảnh trong detail-container...")
+                images = self.driver.find_elements(By.CSS_SELECTOR, "img.img-responsive-drawing")
 
-        # Nếu vẫn không có, thử selector chung
-        if len(images) == 0:
-            logger.info(f"   Thử tìm tất cả ảnh trong detail-container...")
-            images = self.driver.find_elements(By.CSS_SELECTOR, "img.img-responsive-drawing")
+            image_urls = [img.get_attribute("src") for img in images]
+        return image_urls
 
-        image_paths = []
-        total_images = len(images)
+    def save_images(self, folder_name, search_value, image_urls=None):
+        """Lưu ảnh của trang chi tiết (image_urls=None: lấy từ trang hiện tại)"""
+        if image_urls is None:
+            image_urls = self.collect_image_urls()
+        total_images = len(image_urls)
 
         if total_images == 0:
             logger.warning(f"⚠️ Không tìm thấy ảnh nào cho số đơn {search_value}")
-            return image_paths
+            return []
 
-        logger.info(f"   Tìm thấy {total_images} ảnh")
-        for idx, img in enumerate(images, start=1):
-            img_url = img.get_attribute("src")
-            if img_url:
-                try:
-                    img_data = requests.get(img_url).content
-                    img_name = f"{search_value.replace('/', '_')}_{idx}.jpg"
-                    img_path = folder_name / img_name
-                    image_paths.append(str(img_path))
-                    with open(img_path, "wb") as f:
-                        f.write(img_data)
-                    logger.info(f"  ✓ Ảnh {idx}/{total_images}: {img_name}")
-                except Exception as e:
-                    logger.error(f"  ✗ Lỗi tải ảnh {idx}/{total_images}: {e}")
-        return image_paths
+        logger.debug("   Tìm thấy %s ảnh", total_images)
+        return get_image_downloader().download_all(image_urls, folder_name, search_value)
 
     def save_data_to_excel(self):
-        if self.data:
-            logger.info(f"📊 Đang lưu dữ liệu vào Excel...")
-            for index, row in enumerate(self.data, start=1):
-                row["STT"] = index + len(self.existing_data)
-            df = pd.DataFrame(self.data)
-            columns = ["STT"] + [col for col in df.columns if col != "STT"]
-            df = df[columns]
-            combined_data = pd.concat([self.existing_data, df], ignore_index=True)
-            combined_data.to_excel(self.excel_file_path, index=False)
-
-            total_records = len(combined_data)
-            new_records = len(self.data)
-            logger.info(f"✅ THÀNH CÔNG! Đã lưu {new_records} bản ghi mới")
+        """Xuất RecordStore ra Excel - chạy theo yêu cầu, không còn ghi lại file sau mỗi record"""
+        if self.store.count():
+            logger.info(f"📊 Đang xuất dữ liệu từ {self.store.db_path} ra Excel...")
+            total_records = self.store.export_excel(self.excel_file_path)
             logger.info(f"📈 Tổng số bản ghi trong file: {total_records}")
             logger.info(f"💾 File output: {self.excel_file_path}")
         else:
             logger.warning("⚠️ Không có dữ liệu để lưu.")
 
-    def process_search(self, search_value):
-        start_time = time.time()
+    def fetch_page(self, search_value):
+        """FetchedPage hoặc None - mọi lệnh WebDriver trong lúc fetch được tính cho số đơn này"""
+        # Thời gian mạng của số đơn này (--network-timing), None = không đo
+        self.last_network = None
+        with self.driver_profiler.record(search_value):
+            if self.network_timing and self.driver:
+                discard_network_events(self.driver)
+            page = self._fetch_page(search_value)
+            if self.network_timing:
+                network = []
+                if self.driver:
+                    network += collect_network_timings(self.driver, search_value)
+                self.last_network = network
+                if page:
+                    page.network = network
+            return page
+
+    def _fetch_page(self, search_value):
+        """
+        Tìm số đơn và tải trang chi tiết (retry 2 lần, restart driver khi hết lượt)
+        Return: FetchedPage, hoặc None nếu không lấy được (lỗi trong self.last_error)
+        """
+        page = None
+        # Lỗi cuối cùng của số đơn này (CrawlerPool ghi vào CrawlLedger)
+        self.last_error = None
 
         # Thư mục output tường minh
         base_folder = Path("Output_Designs/Images")
@@ -412,28 +447,47 @@ class Crawler:
         retry_attempts = 2
         while retry_attempts > 0:
             try:
-                self.search_and_click(search_value)
-                logger.info(f"⏳ Đang chờ tải trang chi tiết...")
-                detail_container = WebDriverWait(self.driver, 30).until(
-                    EC.presence_of_element_located(
-                        (
-                            By.XPATH,
-                            "//div[contains(@class, 'detail-container') and contains(@class, 'col-md-12')]",
+                # Mỗi pha một lần đo: search không tính các lần chờ trang chi tiết sau click,
+                # detail_wait = các lần chờ đó + lần chờ detail-container dưới đây
+                self.detail_wait_seconds = 0.0
+                search_started = time.perf_counter()
+                try:
+                    self.search_and_click(search_value)
+                except BaseException:
+                    observe("search", time.perf_counter() - search_started - self.detail_wait_seconds, error=True)
+                    if self.detail_wait_seconds:
+                        observe("detail_wait", self.detail_wait_seconds, error=True)
+                    raise
+                observe("search", time.perf_counter() - search_started - self.detail_wait_seconds)
+                logger.debug("⏳ Đang chờ tải trang chi tiết...")
+                wait_started = time.perf_counter()
+                try:
+                    WebDriverWait(self.driver, self.wait_timeouts["detail_container"]).until(
+                        EC.presence_of_element_located(
+                            (
+                                By.XPATH,
+                                "//div[contains(@class, 'detail-container') and contains(@class, 'col-md-12')]",
+                            )
                         )
                     )
-                )
-                logger.info(f"✓ Trang chi tiết đã tải xong!")
-
-                logger.info(f"📝 Đang trích xuất dữ liệu...")
-                row_data = self.extract_data(detail_container)
-                self.data.append(row_data)
-                logger.info(f"✓ Đã trích xuất {len(row_data)} trường dữ liệu")
-
-                logger.info(f"🖼️  Đang tải ảnh...")
-                image_paths = self.save_images(folder_name, search_value)
-                logger.info(f"✓ Đã lưu {len(image_paths)} ảnh vào: {folder_name}")
+                except BaseException:
+                    observe("detail_wait", self.detail_wait_seconds + time.perf_counter() - wait_started, error=True)
+                    raise
+                observe("detail_wait", self.detail_wait_seconds + time.perf_counter() - wait_started)
+                # Một lần execute_script: HTML detail-container + URL ảnh + trạng thái trang
+                with span("harvest"):
+                    harvest = harvest_page(self.driver, DESIGN_IMAGE_SELECTORS)
+                if not harvest.is_detail:
+                    raise Exception("Trang chi tiết không hợp lệ (lỗi 500/template hoặc thiếu detail-container)")
+                self.current_image_urls = harvest.image_urls
+                logger.debug("✓ Trang chi tiết đã tải xong!")
+                page = FetchedPage(search_value, "designs", harvest.container_html, harvest.image_urls, folder_name)
+                if self.archive:
+                    self.archive.add_page(page)
+                self.last_error = None
                 break
             except TimeoutException as e:
+                self.last_error = e
                 error_file = error_folder_phase_2 / f"{search_value.replace('/', '_')}_error.png"
                 logger.error(f"❌ TIMEOUT: Không tìm thấy kết quả cho {search_value}")
                 logger.error(f"📸 Screenshot lỗi đã lưu: {error_file}")
@@ -445,6 +499,7 @@ class Crawler:
                     logger.error(f"⚠️ Hết số lần retry, đang restart driver...")
                     self.restart_driver()
             except Exception as e:
+                self.last_error = e
                 error_file = error_folder_phase_1 / f"{search_value.replace('/', '_')}_error.png"
                 logger.error(f"❌ LỖI: {type(e).__name__} - {str(e)}")
                 logger.error(f"📸 Screenshot lỗi đã lưu: {error_file}")
@@ -460,11 +515,63 @@ class Crawler:
         if self.search_count >= self.restart_interval:
             logger.info(f"🔄 Đã xử lý {self.search_count} số đơn, đang khởi động lại driver...")
             self.restart_driver()
+        return page
+
+    def fetch_and_parse(self, search_value):
+        """
+        fetch_page + parse_detail. Parse trong thread lỗi (trang render dở, thiếu trường...)
+        thì tải lại trang, tối đa PARSE_ATTEMPTS lần.
+        Có parse_pool: lỗi parse chỉ biết khi Future xong - ghi thất bại, không tải lại
+        Return: (FetchedPage hoặc None, row_data hoặc Future); lỗi parse lần cuối được raise
+        """
+        for attempt in range(1, PARSE_ATTEMPTS + 1):
+            page = self.fetch_page(search_value)
+            if page is None:
+                return None, None
+            try:
+                return page, self.parse_detail(page.html)
+            except Exception as e:
+                if self.parse_pool is not None or attempt == PARSE_ATTEMPTS:
+                    raise
+                logger.warning(
+                    f"🔄 Lỗi parse lần {attempt}/{PARSE_ATTEMPTS} ({type(e).__name__} - {e}), tải lại trang..."
+                )
 
-        self.save_data_to_excel()
+    def process_search(self, search_value, save=True):
+        """
+        Xử lý một số đơn: tìm + tải trang -> trích xuất -> tải ảnh -> ghi
+        save=False: không ghi vào RecordStore, chỉ trả về row_data (dùng khi chạy trong CrawlerPool)
+        """
+        start_time = time.time()
+        row_data = None
+
+        try:
+            logger.debug("📝 Đang tải trang và trích xuất dữ liệu...")
+            page, row_data = self.fetch_and_parse(search_value)
+            if page:
+                logger.debug("🖼️  Đang tải ảnh...")
+                image_paths = self.save_images(page.images_folder, search_value, page.image_urls)
+                logger.info("✓ Đã lưu %s ảnh vào: %s", len(image_paths), page.images_folder)
+        except Exception as e:
+            self.last_error = e
+            row_data = None
+            logger.error(f"❌ LỖI: {type(e).__name__} - {str(e)}")
+
+        if save and row_data:
+            try:
+                # Chờ parse pool (nếu có) trả row_data trước khi ghi
+                row_data = resolve_row(row_data)
+            except Exception as e:
+                self.last_error = e
+                row_data = None
+                logger.error(f"❌ Lỗi parse {search_value}: {type(e).__name__} - {str(e)}")
+            if row_data:
+                self.store.save(search_value, row_data)
 
         end_time = time.time()
         elapsed_time = end_time - start_time
-        logger.info(f"⏱️  Thời gian xử lý: {elapsed_time:.2f} giây")
-        logger.info(f"=" * 80)
-        logger.info("")
+        observe("record", elapsed_time, error=not row_data)
+        logger.info("⏱️  Thời gian xử lý: %.2f giây", elapsed_time)
+        logger.debug("=" * 80)
+        logger.debug("")
+        return row_data
@@ -3,37 +3,85 @@ Crawler cho Nhãn hiệu - Sử dụng Direct URL
 Kết hợp logic từ crawler_trademarks.py (captcha, F5 retry) và backup3.py (extract data)
 """
 import os
-import re
 import time
 import logging
-import requests
 import pandas as pd
 from pathlib import Path
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException
+from http_fetcher import DetailFetcher, RecordNotFound, SeleniumUnavailable, detail_url, TRADEMARK_IMAGE_SELECTORS
+from record_store import open_store
+from image_downloader import get_image_downloader
+from page_harvest import FetchedPage, harvest_page
+from detail_extractor import extract_trademark_fields
+from parse_pool import resolve_row
+from page_state import PageState, wait_for_page_state
+from browser_profile import PAGE_PROFILE_LIGHT, apply_light_profile, enable_request_blocking
+from metrics import observe, span
+from webdriver_profiler import DriverProfiler, instrument_driver
+from network_timing import collect_network_timings, discard_network_events, enable_network_timing
 
 # Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Số lần tải trang + parse trong thread (lỗi parse -> tải lại trang, xem fetch_and_parse)
+PARSE_ATTEMPTS = 2
+
 
 class TrademarkCrawler:
-    def __init__(self, driver_path, excel_path):
+    def __init__(
+        self,
+        driver_path,
+        excel_path,
+        use_http=True,
+        profile_dir="selenium_chrome_profile",
+        store=None,
+        page_profile="full",
+        load_images=False,
+        headless=None,
+        parse_pool=None,
+        archive=None,
+        base_url=None,
+        network_timing=False,
+        http_only=False,
+    ):
         self.driver_path = driver_path
         self.excel_path = excel_path
+        # Thư mục profile Chrome riêng (mỗi worker trong pool một thư mục)
+        self.profile_dir = Path(profile_dir)
+        # Profile tải trang: "full" (render đầy đủ) hoặc "light" (xem browser_profile.py)
+        self.page_profile = page_profile
+        self.load_images = load_images
+        self.headless = headless
         self.excel_file_path = Path("Output_Trademarks_Direct/trademarks_data.xlsx")
-        self.existing_data = pd.DataFrame()
-        self.data = []
+        # RecordStore dùng chung (CrawlerPool truyền vào), None = tự mở kho trong thư mục output
+        self.store = store
+        # Fetch trang chi tiết bằng HTTP trước, chỉ dùng Selenium khi cần
+        self.fetcher = DetailFetcher() if use_http else None
+        # URL ảnh của trang hiện tại (None = lấy ảnh từ driver)
+        self.current_image_urls = None
+        # ParsePool dùng chung (parse_pool.py), None = parse ngay trong thread điều khiển Chrome
+        self.parse_pool = parse_pool
+        # HtmlArchive lưu HTML thô của mỗi trang fetch được (html_archive.py), None = không lưu
+        self.archive = archive
+        # Gốc URL NOIP (None = site thật; bench_crawl.py trỏ vào mock_noip_server.py)
+        self.base_url = base_url
+        # Đo TTFB / thời gian tải từng request qua CDP performance log (network_timing.py)
+        self.network_timing = network_timing
+        # Đếm lệnh WebDriver theo từng số đơn (webdriver_profiler.py)
+        self.driver_profiler = DriverProfiler()
+        # http_only: không bao giờ mở Chrome, số đơn HTTP không lấy được thì ghi là lỗi
+        self.http_only = http_only and self.fetcher is not None
+        self.driver = None
         self.load_existing_data()
-        self.init_driver()
+        if self.fetcher is None:
+            self.init_driver()
+        # Có HTTP fetch: Chrome chỉ khởi động ở lần đầu cần Selenium (ensure_driver)
 
     def init_driver(self):
         self.chrome_options = Options()
@@ -41,8 +89,8 @@ class TrademarkCrawler:
         self.chrome_options.add_argument("--disable-gpu")
 
         # TẠO PROFILE RIÊNG CHO SELENIUM (tab mới, không conflict với Chrome đang mở)
-        selenium_profile = Path("selenium_chrome_profile")
-        selenium_profile.mkdir(exist_ok=True)
+        selenium_profile = self.profile_dir
+        selenium_profile.mkdir(parents=True, exist_ok=True)
 
         self.chrome_options.add_argument(f"--user-data-dir={selenium_profile.absolute()}")
 
@@ -52,26 +100,56 @@ class TrademarkCrawler:
         # Tắt cờ automation
         self.chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         self.chrome_options.add_experimental_option('useAutomationExtension', False)
+        if self.page_profile == PAGE_PROFILE_LIGHT:
+            apply_light_profile(self.chrome_options, self.load_images, self.headless)
 
+        if self.network_timing:
+            enable_network_timing(self.chrome_options)
         self.service = Service(executable_path=self.driver_path)
         self.driver = webdriver.Chrome(service=self.service, options=self.chrome_options)
+        instrument_driver(self.driver, self.driver_profiler)
+        if self.page_profile == PAGE_PROFILE_LIGHT:
+            enable_request_blocking(self.driver, self.load_images)
 
         # Tắt thuộc tính webdriver
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
 
     def load_existing_data(self):
-        """Load dữ liệu cũ từ file Excel nếu có"""
-        if self.excel_file_path.exists():
-            self.existing_data = pd.read_excel(self.excel_file_path)
-            logger.info(f"📂 Đã load {len(self.existing_data)} bản ghi từ file cũ")
-        else:
-            logger.info(f"📂 Chưa có file Excel, sẽ tạo mới")
+        """Mở kho bản ghi SQLite (tự nạp file Excel cũ ở lần chạy đầu tiên)"""
+        if self.store is None:
+            self.store = open_store(self.excel_file_path.parent, self.excel_file_path)
+        logger.info(f"📂 Kho bản ghi {self.store.db_path}: {self.store.count()} bản ghi")
+
+    def ensure_driver(self):
+        """Khởi động Chrome nếu chưa có (lần đầu HTTP fetch không đủ, hoặc sau restart_driver)"""
+        if self.driver is None:
+            if self.http_only:
+                raise SeleniumUnavailable("HTTP fetch không lấy được trang chi tiết (chế độ http_only)")
+            self.init_driver()
+        return self.driver
+
+    def save_error_screenshot(self, path):
+        """Chụp màn hình lỗi nếu Chrome đang mở"""
+        if self.driver is None:
+            return
+        try:
+            self.driver.save_screenshot(str(path))
+            logger.info("📸 Screenshot lỗi: %s", path)
+        except WebDriverException as e:
+            logger.warning(f"⚠️ Không chụp được screenshot: {e}")
 
     def close_driver(self):
         if self.driver:
             self.driver.quit()
+            self.driver = None
             logger.info("Browser đã đóng")
 
+    def close(self):
+        """Đóng hẳn khi hết việc: Chrome + session HTTP của fetcher (restart_driver chỉ đóng Chrome)"""
+        self.close_driver()
+        if self.fetcher:
+            self.fetcher.close()
+
     def handle_security_warning(self):
         """Xử lý cảnh báo bảo mật nếu có"""
         try:
@@ -81,7 +159,7 @@ class TrademarkCrawler:
             proceed_link = self.driver.find_element(By.ID, "proceed-link")
             proceed_link.click()
             time.sleep(2)
-            logger.info("✓ Đã vượt qua cảnh báo bảo mật")
+            logger.debug("✓ Đã vượt qua cảnh báo bảo mật")
             return True
         except:
             return False
@@ -89,7 +167,7 @@ class TrademarkCrawler:
     def handle_recaptcha(self):
         """Xử lý reCAPTCHA thủ công"""
         try:
-            logger.info("🔍 Đang tìm reCAPTCHA checkbox...")
+            logger.debug("🔍 Đang tìm reCAPTCHA checkbox...")
 
             # Đợi iframe reCAPTCHA xuất hiện
             WebDriverWait(self.driver, 15).until(
@@ -103,9 +181,9 @@ class TrademarkCrawler:
                 EC.element_to_be_clickable((By.CSS_SELECTOR, "div.recaptcha-checkbox-border"))
             )
 
-            logger.info("✓ Đã tìm thấy checkbox reCAPTCHA")
+            logger.debug("✓ Đã tìm thấy checkbox reCAPTCHA")
             checkbox.click()
-            logger.info("✓ Đã click vào checkbox")
+            logger.debug("✓ Đã click vào checkbox")
 
             # Đợi 2 giây để xem captcha có verified không
             time.sleep(2)
@@ -116,7 +194,7 @@ class TrademarkCrawler:
                 checkbox_checked = self.driver.find_element(
                     By.CSS_SELECTOR, "div.recaptcha-checkbox-checkmark"
                 )
-                logger.info("✓ Captcha đã verified ngay (không có challenge)!")
+                logger.debug("✓ Captcha đã verified ngay (không có challenge)!")
 
                 # Switch về main content
                 self.driver.switch_to.default_content()
@@ -124,13 +202,13 @@ class TrademarkCrawler:
                 # Thử tìm và click nút Next (thử nhiều cách)
                 next_clicked = False
                 try:
-                    logger.info("🔘 Đang tìm nút Next...")
+                    logger.debug("🔘 Đang tìm nút Next...")
 
                     # Cách 1: Tìm button với text "Next"
                     try:
                         next_button = self.driver.find_element(By.XPATH, "//button[contains(text(), 'Next')]")
                         next_button.click()
-                        logger.info("✓ Đã click nút Next (cách 1)")
+                        logger.debug("✓ Đã click nút Next (cách 1)")
                         next_clicked = True
                     except:
                         pass
@@ -140,7 +218,7 @@ class TrademarkCrawler:
                         try:
                             next_button = self.driver.find_element(By.CSS_SELECTOR, "button.btn-primary")
                             next_button.click()
-                            logger.info("✓ Đã click nút Next (cách 2)")
+                            logger.debug("✓ Đã click nút Next (cách 2)")
                             next_clicked = True
                         except:
                             pass
@@ -150,7 +228,7 @@ class TrademarkCrawler:
                         try:
                             next_button = self.driver.find_element(By.XPATH, "//input[@type='submit']")
                             next_button.click()
-                            logger.info("✓ Đã click nút Next (cách 3)")
+                            logger.debug("✓ Đã click nút Next (cách 3)")
                             next_clicked = True
                         except:
                             pass
@@ -194,7 +272,7 @@ class TrademarkCrawler:
                 EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'btn-primary') and contains(text(), 'Next')]"))
             )
             next_button.click()
-            logger.info("✓ Đã click nút Next")
+            logger.debug("✓ Đã click nút Next")
             time.sleep(3)
             return True
         except Exception as e:
@@ -206,45 +284,39 @@ class TrademarkCrawler:
         F5 liên tục cho đến khi xuất hiện reCAPTCHA HOẶC trang chi tiết
         Return: 'captcha' nếu thấy captcha, 'detail' nếu thấy trang chi tiết, None nếu timeout
         """
-        logger.info(f"🔄 Đang F5 để chờ captcha hoặc trang chi tiết...")
+        logger.debug("🔄 Đang F5 để chờ captcha hoặc trang chi tiết...")
 
         for attempt in range(1, max_attempts + 1):
             try:
-                logger.info(f"🔄 F5 lần {attempt}/{max_attempts}...")
+                logger.debug("🔄 F5 lần %s/%s...", attempt, max_attempts)
 
-                if attempt == 1:
-                    self.driver.get(url)
-                else:
-                    self.driver.refresh()
+                with span("navigate"):
+                    if attempt == 1:
+                        self.driver.get(url)
+                    else:
+                        self.driver.refresh()
 
-                time.sleep(2)
+                # Đợi trang load - mỗi lần kiểm tra chỉ là một lệnh probe nhỏ
+                state = wait_for_page_state(self.driver, timeout=2)
 
-                # Kiểm tra lỗi template
-                if "${" in self.driver.page_source and "appltype" in self.driver.page_source:
+                if state is PageState.TEMPLATE_ERROR:
                     logger.warning(f"⚠️ Trang bị lỗi template, tiếp tục F5...")
                     continue
 
-                # Kiểm tra Internal Server Error
-                if "Internal Server Error" in self.driver.page_source:
+                if state is PageState.SERVER_500:
                     logger.warning(f"⚠️ Server lỗi 500, tiếp tục F5...")
                     continue
 
-                # Kiểm tra xem có captcha không
-                try:
-                    self.driver.find_element(By.XPATH, "//iframe[contains(@src, 'google.com/recaptcha')]")
-                    logger.info(f"✓ Đã tìm thấy reCAPTCHA sau {attempt} lần F5!")
+                if state is PageState.CHALLENGE:
+                    logger.info("✓ Đã tìm thấy reCAPTCHA sau %s lần F5!", attempt)
                     return "captcha"
-                except:
-                    pass
 
-                # Nếu không có captcha, kiểm tra xem có trang chi tiết không
-                try:
-                    self.driver.find_element(By.XPATH, "//div[contains(@class, 'detail-container') and contains(@class, 'col-md-12')]")
-                    logger.info(f"✓ Đã vào thẳng trang chi tiết sau {attempt} lần F5 (không cần captcha)!")
+                if state is PageState.DETAIL:
+                    logger.info("✓ Đã vào thẳng trang chi tiết sau %s lần F5 (không cần captcha)!", attempt)
                     return "detail"
-                except:
-                    logger.info(f"   Chưa thấy captcha hay trang chi tiết, tiếp tục F5...")
-                    continue
+
+                logger.debug("   Chưa thấy captcha hay trang chi tiết (%s), tiếp tục F5...", state.value)
+                continue
 
             except Exception as e:
                 logger.warning(f"Lỗi khi F5 lần {attempt}: {e}")
@@ -255,10 +327,13 @@ class TrademarkCrawler:
         return None
 
     def load_trademark_detail(self, filing_number):
-        """Load trang chi tiết trademark và xử lý reCAPTCHA"""
-        logger.info(f"=" * 80)
-        logger.info(f"BẮT ĐẦU XỬ LÝ SỐ ĐƠN: {filing_number}")
-        logger.info(f"=" * 80)
+        """
+        Load trang chi tiết trademark và xử lý reCAPTCHA
+        Return: HTML detail-container (fetch bằng HTTP hoặc harvest_page từ Selenium)
+        """
+        logger.debug("=" * 80)
+        logger.info("BẮT ĐẦU XỬ LÝ SỐ ĐƠN: %s", filing_number)
+        logger.debug("=" * 80)
 
         try:
             # Xử lý filing_number: thêm VN đằng trước và bỏ dấu -
@@ -266,16 +341,28 @@ class TrademarkCrawler:
             if not processed_id.upper().startswith("VN"):
                 processed_id = "VN" + processed_id
 
-            logger.info(f"📝 Filing number gốc: {filing_number}")
-            logger.info(f"📝 ID đã xử lý: {processed_id}")
+            logger.debug("📝 Filing number gốc: %s", filing_number)
+            logger.debug("📝 ID đã xử lý: %s", processed_id)
 
             # Tạo URL từ filing_number - TRADEMARKS
-            url = f"https://wipopublish.ipvietnam.gov.vn/wopublish-search/public/detail/trademarks?id={processed_id}"
+            url = detail_url("trademarks", processed_id, self.base_url)
+
+            # Thử GET trực tiếp bằng HTTP (không cần render Chrome)
+            if self.fetcher:
+                with span("http_fetch"):
+                    page = self.fetcher.fetch_detail(url, TRADEMARK_IMAGE_SELECTORS, filing_number, "trademarks")
+                if page:
+                    logger.info("✓ Đã tải trang chi tiết bằng HTTP (không cần Selenium)!")
+                    self.current_image_urls = page.image_urls
+                    return page.html
+            self.current_image_urls = None
+            self.ensure_driver()
 
-            logger.info(f"✓ Đang truy cập: {url}")
+            logger.debug("✓ Đang truy cập: %s", url)
 
             # F5 liên tục cho đến khi xuất hiện reCAPTCHA HOẶC trang chi tiết
-            result = self.wait_for_recaptcha_or_detail(url, max_attempts=20)
+            with span("refresh_loop"):
+                result = self.wait_for_recaptcha_or_detail(url, max_attempts=20)
 
             if result == None:
                 logger.error(f"❌ Không tìm thấy captcha hay trang chi tiết sau nhiều lần F5")
@@ -283,60 +370,61 @@ class TrademarkCrawler:
 
             elif result == "captcha":
                 # Xử lý reCAPTCHA khi đã xuất hiện (handle_recaptcha sẽ tự động click Next)
-                logger.info("Đang xử lý reCAPTCHA...")
-                self.handle_recaptcha()
+                logger.debug("Đang xử lý reCAPTCHA...")
+                with span("challenge"):
+                    self.handle_recaptcha()
 
                 # Sau khi xử lý captcha và click Next, F5 liên tục cho đến khi thấy trang chi tiết
-                logger.info("⏳ Đang F5 để tải trang chi tiết...")
+                logger.debug("⏳ Đang F5 để tải trang chi tiết...")
                 max_f5_after_captcha = 20
                 detail_found = False
+                detail_wait_start = time.perf_counter()
 
                 for f5_attempt in range(1, max_f5_after_captcha + 1):
                     try:
-                        logger.info(f"🔄 F5 sau captcha lần {f5_attempt}/{max_f5_after_captcha}...")
+                        logger.debug("🔄 F5 sau captcha lần %s/%s...", f5_attempt, max_f5_after_captcha)
 
                         if f5_attempt > 1:
-                            self.driver.refresh()
-                            time.sleep(2)
+                            with span("navigate"):
+                                self.driver.refresh()
+
+                        state = wait_for_page_state(self.driver, timeout=2)
 
-                        # Kiểm tra lỗi template
-                        if "${" in self.driver.page_source and "appltype" in self.driver.page_source:
+                        if state is PageState.TEMPLATE_ERROR:
                             logger.warning(f"⚠️ Trang bị lỗi template, tiếp tục F5...")
                             continue
 
-                        # Kiểm tra Internal Server Error
-                        if "Internal Server Error" in self.driver.page_source:
+                        if state is PageState.SERVER_500:
                             logger.warning(f"⚠️ Server lỗi 500, tiếp tục F5...")
                             continue
 
-                        # Tìm trang chi tiết với col-md-12
-                        self.driver.find_element(By.XPATH, "//div[contains(@class, 'detail-container') and contains(@class, 'col-md-12')]")
-                        logger.info(f"✓ Đã tìm thấy trang chi tiết sau {f5_attempt} lần F5!")
-                        detail_found = True
-                        break
+                        if state is PageState.DETAIL:
+                            logger.info("✓ Đã tìm thấy trang chi tiết sau %s lần F5!", f5_attempt)
+                            detail_found = True
+                            break
 
-                    except:
-                        logger.info(f"   Chưa thấy trang chi tiết, tiếp tục F5...")
+                        logger.debug("   Chưa thấy trang chi tiết (%s), tiếp tục F5...", state.value)
+
+                    except Exception as e:
+                        logger.debug("   Chưa thấy trang chi tiết (%s), tiếp tục F5...", type(e).__name__)
                         continue
 
+                observe("detail_wait", time.perf_counter() - detail_wait_start, error=not detail_found)
                 if not detail_found:
                     raise Exception(f"Không tìm thấy trang chi tiết sau {max_f5_after_captcha} lần F5")
 
-                # Lấy detail container có data (col-md-12)
-                detail_container = self.driver.find_element(
-                    By.XPATH, "//div[contains(@class, 'detail-container') and contains(@class, 'col-md-12')]"
-                )
-                logger.info(f"✓ Trang chi tiết đã tải xong!")
-
             elif result == "detail":
                 # Đã vào thẳng trang chi tiết (không cần captcha)
-                logger.info("⏳ Đang lấy detail container...")
-                detail_container = self.driver.find_element(
-                    By.XPATH, "//div[contains(@class, 'detail-container') and contains(@class, 'col-md-12')]"
-                )
-                logger.info(f"✓ Trang chi tiết đã sẵn sàng!")
+                logger.debug("⏳ Đang lấy detail container...")
 
-            return detail_container
+            # Một lần execute_script: HTML detail-container + URL ảnh + trạng thái trang
+            with span("harvest"):
+                harvest = harvest_page(self.driver, TRADEMARK_IMAGE_SELECTORS)
+            if not harvest.is_detail:
+                raise Exception("Trang chi tiết không hợp lệ (lỗi 500/template hoặc thiếu detail-container)")
+            self.current_image_urls = harvest.image_urls
+            logger.debug("✓ Trang chi tiết đã sẵn sàng!")
+            return harvest.container_html
 
         except Exception as e:
             logger.error(f"❌ Lỗi load_trademark_detail: {e}")
@@ -347,167 +435,81 @@ class TrademarkCrawler:
         try:
             detail_container = self.load_trademark_detail(filing_number)
 
-            html = detail_container.get_attribute("outerHTML")
-            soup = BeautifulSoup(html, "html.parser")
-            rows = soup.find_all("div", class_="row")
-
-            row_data = {}
-
-            for row in rows:
-                # Tìm tất cả các div có class "product-form-label" và "product-form-details"
-                label_divs = row.find_all("div", class_="product-form-label")
-                details_divs = row.find_all("div", class_="product-form-details")
-
-                # Ghép cặp các div lại với nhau và xử lý
-                for label_div, details_div in zip(label_divs, details_divs):
-                    if label_div and details_div:
-                        # Xử lý label text
-                        if label_div.get_text(strip=True) == "(541) Nhãn hiệu":
-                            label_text = "Nhãn hiệu gốc"
-                        else:
-                            # Loại bỏ ký tự trong ngoặc ở đầu
-                            label_text = re.sub(
-                                r"^\([^)]*\)\s*",
-                                "",
-                                label_div.get_text(strip=True),
-                            )
-                        details_text = details_div.get_text(strip=True)
-
-                        # Xử lý các trường hợp đặc biệt
-                        if label_text == "Số bằng và ngày cấp":
-                            spans = details_div.find_all("span")
-                            if len(spans) >= 2:
-                                row_data["Số bằng"] = spans[0].get_text(strip=True)
-                                row_data["Ngày cấp"] = spans[1].get_text(strip=True)
-                        elif label_text == "Số đơn và Ngày nộp đơn":
-                            spans = details_div.find_all("span")
-                            if len(spans) == 2:
-                                row_data["Số đơn"] = spans[0].get_text(strip=True)
-                                row_data["Ngày nộp đơn"] = spans[1].get_text(strip=True)
-                        elif label_text == "Số công bố và ngày công bố":
-                            details_text_row = details_div.find("div", class_="row")
-                            if details_text_row:
-                                content = details_text_row.find_all("div", class_="col-md-4")
-                                if len(content) >= 2:
-                                    row_data["Số công bố"] = content[0].get_text(strip=True)
-                                    row_data["Ngày công bố"] = content[1].get_text(strip=True)
-                        elif label_text == "Chủ đơn/Chủ bằng":
-                            contents = details_div.find_all("div", id="apnaDiv")
-                            for idx, content in enumerate(contents, start=1):
-                                first_row = content.find("div", class_="row")
-                                if first_row:
-                                    raw_text = "".join(
-                                        [
-                                            text
-                                            for text in first_row.stripped_strings
-                                            if not text.startswith("(")
-                                        ]
-                                    )
-                                    parts = raw_text.split(":", 1)
-                                    if len(parts) == 2:
-                                        row_data[f"Chủ đơn_{idx}"] = parts[0].strip()
-                                        row_data[f"Địa chỉ Chủ đơn_{idx}"] = parts[1].strip()
-                                    elif len(parts) == 1:
-                                        row_data[f"Chủ đơn_{idx}"] = parts[0].strip()
-                                        row_data[f"Địa chỉ Chủ đơn_{idx}"] = ""
-                        elif label_text == "Đại diện SHCN":
-                            contents = details_div.find("div", class_="row")
-                            if contents:
-                                for content in contents:
-                                    raw_text = "".join(
-                                        [
-                                            text
-                                            for text in content.stripped_strings
-                                            if not text.startswith("(")
-                                        ]
-                                    )
-                                    parts = raw_text.split(":", 1)
-                                    if len(parts) == 2:
-                                        row_data["Đại diện SHCN"] = parts[0].strip()
-                                        row_data["Địa chỉ đại diện"] = parts[1].strip()
-                        elif label_text == "Nhãn hiệu gốc":
-                            row_data[label_text] = re.sub(
-                                r"^\([^)]*\)\s*",
-                                "",
-                                details_text,
-                            )
-                        elif label_text == "Nhóm sản phẩm/dịch vụ":
-                            content_text = details_div.find("div", class_="col-md-10")
-                            if content_text:
-                                row_data[label_text] = content_text.get_text(strip=True)
-                            else:
-                                row_data[label_text] = details_text
-                        else:
-                            row_data[label_text] = details_text
-
-            logger.info(f"✓ Đã extract {len(row_data)} trường dữ liệu")
+            if isinstance(detail_container, str):
+                html = detail_container
+            else:
+                html = detail_container.get_attribute("outerHTML")
+            row_data = extract_trademark_fields(html)
+
+            logger.info("✓ Đã extract %s trường dữ liệu", len(row_data))
             return row_data
 
         except Exception as e:
             logger.error(f"❌ Lỗi extract_data: {e}")
             raise
 
-    def save_images(self, folder_name, search_value):
-        """Lưu ảnh từ trang chi tiết - cho TRADEMARKS"""
-        # Tìm ảnh với class detail-img (cho trademarks)
-        images = self.driver.find_elements(By.CSS_SELECTOR, "img.detail-img")
+    def collect_image_urls(self):
+        """URL ảnh của trang chi tiết hiện tại"""
+        if self.current_image_urls is not None:
+            # URL ảnh đã có sẵn (HTTP fetch hoặc harvest_page)
+            image_urls = self.current_image_urls
+        else:
+            # Tìm ảnh với class detail-img (cho trademarks)
+            images = self.driver.find_elements(By.CSS_SELECTOR, "img.detail-img")
 
-        # Nếu không tìm thấy, thử selector khác
-        if len(images) == 0:
-            logger.info(f"   Không tìm thấy ảnh với selector 'img.detail-img', thử selector khác...")
-            images = self.driver.find_elements(By.CSS_SELECTOR, "img.img-responsive")
+            # Nếu không tìm thấy, thử selector khác
+            if len(images) == 0:
+                logger.debug("   Không tìm thấy ảnh với selector 'img.detail-img', thử selector khác...")
+                images = self.driver.find_elements(By.CSS_SELECTOR, "img.img-responsive")
 
-        image_paths = []
-        total_images = len(images)
+            image_urls = [img.get_attribute("src") for img in images]
+        return image_urls
 
-        logger.info(f"   Tìm thấy {total_images} ảnh")
-        for idx, img in enumerate(images, start=1):
-            img_url = img.get_attribute("src")
-            if img_url:
-                try:
-                    img_data = requests.get(img_url).content
-                    img_name = f"{search_value.replace('/', '_')}_{idx}.jpg"
-                    img_path = folder_name / img_name
-                    image_paths.append(str(img_path))
-                    with open(img_path, "wb") as f:
-                        f.write(img_data)
-                    logger.info(f"  ✓ Ảnh {idx}/{total_images}: {img_name}")
-                except Exception as e:
-                    logger.error(f"  ✗ Lỗi tải ảnh {idx}/{total_images}: {e}")
+    def save_images(self, folder_name, search_value, image_urls=None):
+        """Lưu ảnh từ trang chi tiết - cho TRADEMARKS (image_urls=None: lấy từ trang hiện tại)"""
+        if image_urls is None:
+            image_urls = self.collect_image_urls()
+        total_images = len(image_urls)
 
-        return image_paths
+        logger.debug("   Tìm thấy %s ảnh", total_images)
+        return get_image_downloader().download_all(image_urls, folder_name, search_value)
 
     def save_data_to_excel(self):
-        """Lưu dữ liệu vào file Excel"""
-        if self.data:
-            # Add STT cho các records mới
-            for index, row in enumerate(self.data, start=1):
-                row["STT"] = index + len(self.existing_data)
-
-            df = pd.DataFrame(self.data)
-            columns = ["STT"] + [col for col in df.columns if col != "STT"]
-            df = df[columns]
-
-            # Tạo output folder nếu chưa có
-            self.excel_file_path.parent.mkdir(parents=True, exist_ok=True)
-
-            combined_data = pd.concat([self.existing_data, df], ignore_index=True)
-            combined_data.to_excel(self.excel_file_path, index=False)
-
-            total_records = len(combined_data)
-            new_records = len(self.data)
-            logger.info(f"✅ Đã lưu {new_records} bản ghi mới vào Excel")
+        """Xuất RecordStore ra Excel - chạy theo yêu cầu, không còn ghi lại file sau mỗi record"""
+        if self.store.count():
+            total_records = self.store.export_excel(self.excel_file_path)
             logger.info(f"📈 Tổng: {total_records} bản ghi | File: {self.excel_file_path}")
-
-            # Cập nhật existing_data và clear data cho lần save tiếp theo
-            self.existing_data = combined_data
-            self.data = []
         else:
             logger.warning("⚠️ Không có dữ liệu để lưu.")
 
-    def process_trademark(self, filing_number):
-        """Xử lý một filing number (số đơn trademarks)"""
-        start_time = time.time()
+    def fetch_page(self, filing_number):
+        """FetchedPage hoặc None - mọi lệnh WebDriver trong lúc fetch được tính cho số đơn này"""
+        # Thời gian mạng của số đơn này (--network-timing), None = không đo
+        self.last_network = None
+        with self.driver_profiler.record(filing_number):
+            if self.network_timing and self.driver:
+                discard_network_events(self.driver)
+            if self.fetcher:
+                self.fetcher.take_timings()
+            page = self._fetch_page(filing_number)
+            if self.network_timing:
+                network = []
+                if self.fetcher:
+                    network += self.fetcher.take_timings()
+                if self.driver:
+                    network += collect_network_timings(self.driver, filing_number)
+                self.last_network = network
+                if page:
+                    page.network = network
+            return page
+
+    def _fetch_page(self, filing_number):
+        """
+        Load trang chi tiết trademark
+        Return: FetchedPage, hoặc None nếu không lấy được (lỗi trong self.last_error)
+        """
+        # Lỗi cuối cùng của số đơn này (CrawlerPool ghi vào CrawlLedger)
+        self.last_error = None
 
         # Thư mục output
         base_folder = Path("Output_Trademarks_Direct/Images")
@@ -523,28 +525,89 @@ class TrademarkCrawler:
         folder_name.mkdir(exist_ok=True)
 
         try:
-            # Extract dữ liệu
-            logger.info("📊 Đang extract dữ liệu...")
-            row_data = self.extract_data(filing_number)
+            detail_container = self.load_trademark_detail(filing_number)
+            if not isinstance(detail_container, str):
+                detail_container = detail_container.get_attribute("outerHTML")
+            page = FetchedPage(
+                filing_number, "trademarks", detail_container, self.collect_image_urls(), folder_name
+            )
+            if self.archive:
+                self.archive.add_page(page)
+            return page
 
-            # Lưu ảnh
-            logger.info("🖼️  Đang lưu ảnh...")
-            image_paths = self.save_images(folder_name, filing_number)
+        except RecordNotFound as e:
+            self.last_error = e
+            logger.warning(f"⚠️ Không tồn tại số đơn {filing_number}: {e}")
+            return None
 
-            # Thêm data vào list
-            self.data.append(row_data)
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"❌ LỖI khi xử lý {filing_number}: {e}")
+            # Screenshot lỗi
+            self.save_error_screenshot(error_folder_phase_1 / f"{filing_number.replace('/', '_')}_error.png")
+            return None
+
+    def parse_detail(self, html):
+        """row_data (parse ngay trong thread này) hoặc Future khi có parse_pool"""
+        if self.parse_pool is None:
+            with span("parse"):
+                row_data = extract_trademark_fields(html)
+            logger.info("✓ Đã extract %s trường dữ liệu", len(row_data))
+            return row_data
+        return self.parse_pool.submit("trademarks", html)
 
-            # Lưu vào Excel ngay sau mỗi lần crawl thành công
-            logger.info("💾 Đang lưu vào Excel...")
-            self.save_data_to_excel()
+    def fetch_and_parse(self, filing_number):
+        """
+        fetch_page + parse_detail. Parse trong thread lỗi (trang render dở, thiếu trường...)
+        thì tải lại trang, tối đa PARSE_ATTEMPTS lần.
+        Có parse_pool: lỗi parse chỉ biết khi Future xong - ghi thất bại, không tải lại
+        Return: (FetchedPage hoặc None, row_data hoặc Future); lỗi parse lần cuối được raise
+        """
+        for attempt in range(1, PARSE_ATTEMPTS + 1):
+            page = self.fetch_page(filing_number)
+            if page is None:
+                return None, None
+            try:
+                return page, self.parse_detail(page.html)
+            except Exception as e:
+                if self.parse_pool is not None or attempt == PARSE_ATTEMPTS:
+                    raise
+                logger.warning(
+                    f"🔄 Lỗi parse lần {attempt}/{PARSE_ATTEMPTS} ({type(e).__name__} - {e}), tải lại trang..."
+                )
+
+    def process_trademark(self, filing_number, save=True):
+        """
+        Xử lý một filing number (số đơn trademarks): fetch -> extract -> lưu ảnh -> ghi
+        save=False: không ghi vào RecordStore, chỉ trả về row_data (dùng khi chạy trong CrawlerPool)
+        """
+        start_time = time.time()
+
+        try:
+            # Tải trang + extract dữ liệu (parse pool: tải ảnh trong lúc parse)
+            logger.debug("📊 Đang tải trang và extract dữ liệu...")
+            page, row_data = self.fetch_and_parse(filing_number)
+            if page is None:
+                observe("record", time.time() - start_time, error=True)
+                return None
+
+            # Lưu ảnh
+            logger.debug("🖼️  Đang lưu ảnh...")
+            self.save_images(page.images_folder, filing_number, page.image_urls)
+
+            if save:
+                # Chờ parse pool (nếu có), rồi một lệnh INSERT nhỏ vào RecordStore cho mỗi record
+                row_data = resolve_row(row_data)
+                self.store.save(filing_number, row_data)
 
             elapsed_time = time.time() - start_time
-            logger.info(f"✅ THÀNH CÔNG! Xử lý xong {filing_number} trong {elapsed_time:.2f}s")
-            logger.info(f"=" * 80)
+            observe("record", elapsed_time)
+            logger.info("✅ THÀNH CÔNG! Xử lý xong %s trong %.2fs", filing_number, elapsed_time)
+            logger.debug("=" * 80)
+            return row_data
 
         except Exception as e:
+            self.last_error = e
+            observe("record", time.time() - start_time, error=True)
             logger.error(f"❌ LỖI khi xử lý {filing_number}: {e}")
-            # Screenshot lỗi
-            screenshot_path = error_folder_phase_1 / f"{filing_number.replace('/', '_')}_error.png"
-            self.driver.save_screenshot(str(screenshot_path))
-            logger.info(f"📸 Screenshot lỗi: {screenshot_path}")
+            return None
@@ -1,36 +1,86 @@
 import os
-import re
 import time
 import pandas as pd
-import requests
 import logging
 from pathlib import Path
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+from http_fetcher import DetailFetcher, RecordNotFound, SeleniumUnavailable, detail_url, DESIGN_IMAGE_SELECTORS
+from record_store import open_store
+from image_downloader import get_image_downloader
+from page_harvest import FetchedPage, harvest_page
+from detail_extractor import extract_design_fields
+from parse_pool import resolve_row
+from page_state import PageState, wait_for_page_state
+from browser_profile import PAGE_PROFILE_LIGHT, apply_light_profile, enable_request_blocking
+from metrics import increment, observe, span
+from webdriver_profiler import DriverProfiler, instrument_driver
+from network_timing import collect_network_timings, discard_network_events, enable_network_timing
+from log_config import record_context
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
+# Số lần tải trang + parse trong thread (lỗi parse -> tải lại trang, xem fetch_and_parse)
+PARSE_ATTEMPTS = 2
+
 
 class DesignCrawler:
-    def __init__(self, driver_path, excel_path):
+    def __init__(
+        self,
+        driver_path,
+        excel_path,
+        use_http=True,
+        profile_dir="selenium_chrome_profile",
+        store=None,
+        page_profile="full",
+        load_images=False,
+        headless=None,
+        parse_pool=None,
+        archive=None,
+        base_url=None,
+        network_timing=False,
+        http_only=False,
+    ):
         self.driver_path = Path(driver_path)
         self.excel_path = Path(excel_path)
+        # Thư mục profile Chrome riêng (mỗi worker trong pool một thư mục)
+        self.profile_dir = Path(profile_dir)
+        # Profile tải trang: "full" (render đầy đủ) hoặc "light" (xem browser_profile.py)
+        self.page_profile = page_profile
+        self.load_images = load_images
+        self.headless = headless
         # Thư mục output
         self.excel_folder = Path("Output_Designs_Direct")
         self.excel_folder.mkdir(exist_ok=True)
         self.excel_file_path = self.excel_folder / "designs_data.xlsx"
-        self.data = []
+        # RecordStore dùng chung (CrawlerPool truyền vào), None = tự mở kho trong thư mục output
+        self.store = store
+        # Fetch trang chi tiết bằng HTTP trước, chỉ dùng Selenium khi cần
+        self.fetcher = DetailFetcher() if use_http else None
+        # URL ảnh của trang hiện tại (None = lấy ảnh từ driver)
+        self.current_image_urls = None
+        # ParsePool dùng chung (parse_pool.py), None = parse ngay trong thread điều khiển Chrome
+        self.parse_pool = parse_pool
+        # HtmlArchive lưu HTML thô của mỗi trang fetch được (html_archive.py), None = không lưu
+        self.archive = archive
+        # Gốc URL NOIP (None = site thật; bench_crawl.py trỏ vào mock_noip_server.py)
+        self.base_url = base_url
+        # Đo TTFB / thời gian tải từng request qua CDP performance log (network_timing.py)
+        self.network_timing = network_timing
+        # Đếm lệnh WebDriver theo từng số đơn (webdriver_profiler.py)
+        self.driver_profiler = DriverProfiler()
+        # http_only: không bao giờ mở Chrome, số đơn HTTP không lấy được thì ghi là lỗi
+        self.http_only = http_only and self.fetcher is not None
+        self.driver = None
         self.load_existing_data()
-        self.init_driver()
+        if self.fetcher is None:
+            self.init_driver()
+        # Có HTTP fetch: Chrome chỉ khởi động ở lần đầu cần Selenium (ensure_driver)
 
     def init_driver(self):
         self.chrome_options = Options()
@@ -39,8 +89,8 @@ class DesignCrawler:
 
         # TẠO PROFILE RIÊNG CHO SELENIUM (tab mới, không conflict với Chrome đang mở)
         # Profile này sẽ nằm trong thư mục project
-        selenium_profile = Path("selenium_chrome_profile")
-        selenium_profile.mkdir(exist_ok=True)
+        selenium_profile = self.profile_dir
+        selenium_profile.mkdir(parents=True, exist_ok=True)
 
         self.chrome_options.add_argument(f"--user-data-dir={selenium_profile.absolute()}")
 
@@ -65,42 +115,67 @@ class DesignCrawler:
             "profile.default_content_setting_values.mixed_content": 1,
             "profile.default_content_setting_values.protocol_handlers": 1,
         })
+        if self.page_profile == PAGE_PROFILE_LIGHT:
+            apply_light_profile(self.chrome_options, self.load_images, self.headless)
 
         # Sử dụng ChromeDriver local
+        if self.network_timing:
+            enable_network_timing(self.chrome_options)
         self.service = Service(executable_path=self.driver_path)
         self.driver = webdriver.Chrome(
             service=self.service, options=self.chrome_options
         )
+        instrument_driver(self.driver, self.driver_profiler)
+        if self.page_profile == PAGE_PROFILE_LIGHT:
+            enable_request_blocking(self.driver, self.load_images)
 
         # Ẩn thông tin "Chrome is being controlled by automated test software"
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
 
     def load_existing_data(self):
-        if self.excel_file_path.exists():
-            self.existing_data = pd.read_excel(self.excel_file_path)
-            self.last_so_don = (
-                self.existing_data["Số công bố"].iloc[-1]
-                if not self.existing_data.empty
-                else None
-            )
-        else:
-            self.existing_data = pd.DataFrame()
-            self.last_so_don = None
+        # Kho bản ghi SQLite (tự nạp file Excel cũ ở lần chạy đầu tiên)
+        if self.store is None:
+            self.store = open_store(self.excel_folder, self.excel_file_path)
+
+    def ensure_driver(self):
+        """Khởi động Chrome nếu chưa có (lần đầu HTTP fetch không đủ, hoặc sau restart_driver)"""
+        if self.driver is None:
+            if self.http_only:
+                raise SeleniumUnavailable("HTTP fetch không lấy được trang chi tiết (chế độ http_only)")
+            self.init_driver()
+        return self.driver
+
+    def save_error_screenshot(self, path):
+        """Chụp màn hình lỗi nếu Chrome đang mở"""
+        if self.driver is None:
+            return
+        try:
+            self.driver.save_screenshot(str(path))
+            logger.info("📸 Screenshot lỗi: %s", path)
+        except WebDriverException as e:
+            logger.warning(f"⚠️ Không chụp được screenshot: {e}")
 
     def close_driver(self):
         if self.driver:
             self.driver.quit()
             self.driver = None
 
+    def close(self):
+        """Đóng hẳn khi hết việc: Chrome + session HTTP của fetcher (restart_driver chỉ đóng Chrome)"""
+        self.close_driver()
+        if self.fetcher:
+            self.fetcher.close()
+
     def restart_driver(self):
+        increment("driver_restarts")
         self.close_driver()
-        self.init_driver()
-        logger.info("Driver đã được khởi động lại.")
+        # Chrome mới mở ở lần tải kế tiếp (ensure_driver) - lỗi khởi động ghi vào số đơn đó
+        logger.info("Driver đã đóng, sẽ khởi động lại ở lần tải kế tiếp.")
 
     def handle_recaptcha(self):
         """Tự động click vào checkbox reCAPTCHA của Google"""
         try:
-            logger.info("Đang tìm kiếm reCAPTCHA...")
+            logger.debug("Đang tìm kiếm reCAPTCHA...")
 
             # Đợi iframe reCAPTCHA xuất hiện
             WebDriverWait(self.driver, 10).until(
@@ -108,20 +183,20 @@ class DesignCrawler:
                     (By.XPATH, "//iframe[contains(@src, 'recaptcha')]")
                 )
             )
-            logger.info("✓ Đã tìm thấy iframe reCAPTCHA")
+            logger.debug("✓ Đã tìm thấy iframe reCAPTCHA")
 
             # Tìm và click vào checkbox
             checkbox = WebDriverWait(self.driver, 10).until(
                 EC.element_to_be_clickable((By.CLASS_NAME, "recaptcha-checkbox-border"))
             )
             checkbox.click()
-            logger.info("✓ Đã click vào checkbox reCAPTCHA")
+            logger.debug("✓ Đã click vào checkbox reCAPTCHA")
 
             # Switch về main content
             self.driver.switch_to.default_content()
 
             # Đợi reCAPTCHA verify xong (tối đa 15 giây)
-            logger.info("⏳ Đang đợi reCAPTCHA verify...")
+            logger.debug("⏳ Đang đợi reCAPTCHA verify...")
             max_wait = 15
             verified = False
 
@@ -135,7 +210,7 @@ class DesignCrawler:
                     # Nếu checkbox đã checked thì sẽ có class recaptcha-checkbox-checked
                     checkbox_div = self.driver.find_element(By.CLASS_NAME, "recaptcha-checkbox")
                     if "recaptcha-checkbox-checked" in checkbox_div.get_attribute("class"):
-                        logger.info(f"✓ reCAPTCHA đã verify thành công sau {i+1} giây!")
+                        logger.info("✓ reCAPTCHA đã verify thành công sau %s giây!", i + 1)
                         verified = True
                         self.driver.switch_to.default_content()
                         break
@@ -163,23 +238,23 @@ class DesignCrawler:
     def click_next_button(self):
         """Click vào nút Next sau khi xử lý reCAPTCHA"""
         try:
-            logger.info("Đang tìm nút Next...")
+            logger.debug("Đang tìm nút Next...")
 
             # Tìm nút Next
             next_button = WebDriverWait(self.driver, 10).until(
                 EC.element_to_be_clickable((By.XPATH, "/html/body/div[1]/div/div/form/div[3]/div/input"))
             )
-            logger.info("✓ Đã tìm thấy nút Next")
+            logger.debug("✓ Đã tìm thấy nút Next")
 
             # Click vào nút Next
             try:
                 # Phương pháp 1: JavaScript click
                 self.driver.execute_script("arguments[0].click();", next_button)
-                logger.info("✓ Đã click vào nút Next (JavaScript)")
+                logger.debug("✓ Đã click vào nút Next (JavaScript)")
             except:
                 # Phương pháp 2: Click thông thường
                 next_button.click()
-                logger.info("✓ Đã click vào nút Next (Regular)")
+                logger.debug("✓ Đã click vào nút Next (Regular)")
 
             # Đợi trang chuyển
             time.sleep(2)
@@ -195,47 +270,40 @@ class DesignCrawler:
 
     def wait_for_recaptcha_or_detail(self, url, max_attempts=20):
         """F5 liên tục cho đến khi xuất hiện reCAPTCHA HOẶC trang chi tiết"""
-        logger.info("🔄 Bắt đầu F5 liên tục để đợi reCAPTCHA hoặc trang chi tiết...")
+        logger.debug("🔄 Bắt đầu F5 liên tục để đợi reCAPTCHA hoặc trang chi tiết...")
 
         for attempt in range(1, max_attempts + 1):
             try:
-                logger.info(f"🔄 F5 lần {attempt}/{max_attempts}...")
+                logger.debug("🔄 F5 lần %s/%s...", attempt, max_attempts)
 
                 # Refresh trang
-                if attempt == 1:
-                    self.driver.get(url)
-                else:
-                    self.driver.refresh()
+                with span("navigate"):
+                    if attempt == 1:
+                        self.driver.get(url)
+                    else:
+                        self.driver.refresh()
 
-                # Đợi trang load
-                time.sleep(2)
+                # Đợi trang load - mỗi lần kiểm tra chỉ là một lệnh probe nhỏ
+                state = wait_for_page_state(self.driver, timeout=2)
 
-                # Kiểm tra Internal Server Error
-                if "Internal Server Error" in self.driver.page_source:
+                if state is PageState.SERVER_500:
                     logger.warning(f"⚠️ Server trả về lỗi 500, tiếp tục F5...")
                     continue
 
-                # Kiểm tra trang có bị lỗi template không (có ${...})
-                if "${" in self.driver.page_source and "appltype" in self.driver.page_source:
+                if state is PageState.TEMPLATE_ERROR:
                     logger.warning(f"⚠️ Trang bị lỗi template (có ${{...}}), tiếp tục F5...")
                     continue
 
-                # Kiểm tra xem có iframe reCAPTCHA không
-                try:
-                    self.driver.find_element(By.XPATH, "//iframe[contains(@src, 'recaptcha')]")
-                    logger.info(f"✓ Đã phát hiện reCAPTCHA sau {attempt} lần F5!")
+                if state is PageState.CHALLENGE:
+                    logger.info("✓ Đã phát hiện reCAPTCHA sau %s lần F5!", attempt)
                     return "captcha"
-                except:
-                    pass
 
-                # Nếu không có captcha, kiểm tra xem có trang chi tiết không
-                try:
-                    self.driver.find_element(By.XPATH, "//div[contains(@class, 'detail-container') and contains(@class, 'col-md-12')]")
-                    logger.info(f"✓ Đã vào thẳng trang chi tiết sau {attempt} lần F5 (không cần captcha)!")
+                if state is PageState.DETAIL:
+                    logger.info("✓ Đã vào thẳng trang chi tiết sau %s lần F5 (không cần captcha)!", attempt)
                     return "detail"
-                except:
-                    logger.info(f"   Chưa thấy captcha hay trang chi tiết, tiếp tục F5...")
-                    continue
+
+                logger.debug("   Chưa thấy captcha hay trang chi tiết (%s), tiếp tục F5...", state.value)
+                continue
 
             except Exception as e:
                 logger.warning(f"Lỗi khi F5 lần {attempt}: {e}")
@@ -246,10 +314,13 @@ class DesignCrawler:
         return None
 
     def load_design_detail(self, filing_number):
-        """Load trang chi tiết design và xử lý reCAPTCHA"""
-        logger.info(f"=" * 80)
-        logger.info(f"BẮT ĐẦU XỬ LÝ SỐ ĐƠN: {filing_number}")
-        logger.info(f"=" * 80)
+        """
+        Load trang chi tiết design và xử lý reCAPTCHA
+        Return: HTML detail-container (fetch bằng HTTP hoặc harvest_page từ Selenium)
+        """
+        logger.debug("=" * 80)
+        logger.info("BẮT ĐẦU XỬ LÝ SỐ ĐƠN: %s", filing_number)
+        logger.debug("=" * 80)
 
         try:
             # Xử lý filing_number: thêm VN đằng trước và bỏ dấu -
@@ -257,16 +328,28 @@ class DesignCrawler:
             if not processed_id.upper().startswith("VN"):
                 processed_id = "VN" + processed_id
 
-            logger.info(f"📝 Filing number gốc: {filing_number}")
-            logger.info(f"📝 ID đã xử lý: {processed_id}")
+            logger.debug("📝 Filing number gốc: %s", filing_number)
+            logger.debug("📝 ID đã xử lý: %s", processed_id)
 
             # Tạo URL từ filing_number - DESIGNS không phải TRADEMARKS
-            url = f"https://wipopublish.ipvietnam.gov.vn/wopublish-search/public/detail/designs?id={processed_id}"
+            url = detail_url("designs", processed_id, self.base_url)
 
-            logger.info(f"✓ Đang truy cập: {url}")
+            # Thử GET trực tiếp bằng HTTP (không cần render Chrome)
+            if self.fetcher:
+                with span("http_fetch"):
+                    page = self.fetcher.fetch_detail(url, DESIGN_IMAGE_SELECTORS, filing_number, "designs")
+                if page:
+                    logger.info("✓ Đã tải trang chi tiết bằng HTTP (không cần Selenium)!")
+                    self.current_image_urls = page.image_urls
+                    return page.html
+            self.current_image_urls = None
+            self.ensure_driver()
+
+            logger.debug("✓ Đang truy cập: %s", url)
 
             # F5 liên tục cho đến khi xuất hiện reCAPTCHA HOẶC trang chi tiết
-            result = self.wait_for_recaptcha_or_detail(url, max_attempts=20)
+            with span("refresh_loop"):
+                result = self.wait_for_recaptcha_or_detail(url, max_attempts=20)
 
             if result == None:
                 logger.error(f"❌ Không tìm thấy captcha hay trang chi tiết sau nhiều lần F5")
@@ -274,225 +357,163 @@ class DesignCrawler:
 
             elif result == "captcha":
                 # Xử lý reCAPTCHA khi đã xuất hiện
-                logger.info("Đang xử lý reCAPTCHA...")
-                self.handle_recaptcha()
+                logger.debug("Đang xử lý reCAPTCHA...")
+                with span("challenge"):
+                    self.handle_recaptcha()
 
-                # Click vào nút Next sau khi xử lý reCAPTCHA
-                logger.info("Đang kiểm tra nút Next...")
-                self.click_next_button()
+                    # Click vào nút Next sau khi xử lý reCAPTCHA
+                    logger.debug("Đang kiểm tra nút Next...")
+                    self.click_next_button()
 
                 # Sau khi click Next, F5 liên tục cho đến khi thấy trang chi tiết
-                logger.info("⏳ Đang F5 để tải trang chi tiết...")
+                logger.debug("⏳ Đang F5 để tải trang chi tiết...")
                 max_f5_after_captcha = 20
                 detail_found = False
+                detail_wait_start = time.perf_counter()
 
                 for f5_attempt in range(1, max_f5_after_captcha + 1):
                     try:
-                        logger.info(f"🔄 F5 sau captcha lần {f5_attempt}/{max_f5_after_captcha}...")
+                        logger.debug("🔄 F5 sau captcha lần %s/%s...", f5_attempt, max_f5_after_captcha)
 
                         if f5_attempt > 1:
-                            self.driver.refresh()
-                            time.sleep(2)
+                            with span("navigate"):
+                                self.driver.refresh()
+
+                        state = wait_for_page_state(self.driver, timeout=2)
 
-                        # Kiểm tra lỗi template
-                        if "${" in self.driver.page_source and "appltype" in self.driver.page_source:
+                        if state is PageState.TEMPLATE_ERROR:
                             logger.warning(f"⚠️ Trang bị lỗi template, tiếp tục F5...")
                             continue
 
-                        # Kiểm tra Internal Server Error
-                        if "Internal Server Error" in self.driver.page_source:
+                        if state is PageState.SERVER_500:
                             logger.warning(f"⚠️ Server lỗi 500, tiếp tục F5...")
                             continue
 
-                        # Tìm trang chi tiết với col-md-12
-                        self.driver.find_element(By.XPATH, "//div[contains(@class, 'detail-container') and contains(@class, 'col-md-12')]")
-                        logger.info(f"✓ Đã tìm thấy trang chi tiết sau {f5_attempt} lần F5!")
-                        detail_found = True
-                        break
+                        if state is PageState.DETAIL:
+                            logger.info("✓ Đã tìm thấy trang chi tiết sau %s lần F5!", f5_attempt)
+                            detail_found = True
+                            break
+
+                        logger.debug("   Chưa thấy trang chi tiết (%s), tiếp tục F5...", state.value)
 
-                    except:
-                        logger.info(f"   Chưa thấy trang chi tiết, tiếp tục F5...")
+                    except Exception as e:
+                        logger.debug("   Chưa thấy trang chi tiết (%s), tiếp tục F5...", type(e).__name__)
                         continue
 
+                observe("detail_wait", time.perf_counter() - detail_wait_start, error=not detail_found)
                 if not detail_found:
                     raise Exception(f"Không tìm thấy trang chi tiết sau {max_f5_after_captcha} lần F5")
 
-                # Lấy detail container có data (col-md-12)
-                detail_container = self.driver.find_element(
-                    By.XPATH, "//div[contains(@class, 'detail-container') and contains(@class, 'col-md-12')]"
-                )
-                logger.info(f"✓ Trang chi tiết đã tải xong!")
-
             elif result == "detail":
                 # Đã vào thẳng trang chi tiết (không cần captcha)
-                logger.info("⏳ Đang lấy detail container...")
-                detail_container = self.driver.find_element(
-                    By.XPATH, "//div[contains(@class, 'detail-container') and contains(@class, 'col-md-12')]"
-                )
-                logger.info(f"✓ Trang chi tiết đã sẵn sàng!")
+                logger.debug("⏳ Đang lấy detail container...")
 
-            return detail_container
+            # Một lần execute_script: HTML detail-container + URL ảnh + trạng thái trang
+            with span("harvest"):
+                harvest = harvest_page(self.driver, DESIGN_IMAGE_SELECTORS)
+            if not harvest.is_detail:
+                raise Exception("Trang chi tiết không hợp lệ (lỗi 500/template hoặc thiếu detail-container)")
+            self.current_image_urls = harvest.image_urls
+            logger.debug("✓ Trang chi tiết đã sẵn sàng!")
+            return harvest.container_html
 
         except Exception as e:
             logger.error(f"❌ Lỗi khi load trang: {type(e).__name__} - {str(e)}")
             raise
 
     def extract_data(self, detail_container):
-        """Trích xuất dữ liệu từ trang chi tiết design"""
-        html = detail_container.get_attribute("outerHTML")
-        soup = BeautifulSoup(html, "html.parser")
-        rows = soup.find_all("div", class_="row")
-        row_data = {}
-
-        for row in rows:
-            label_divs = row.find_all("div", class_="product-form-label")
-            details_divs = row.find_all("div", class_="product-form-details")
-            for label_div, details_div in zip(label_divs, details_divs):
-                if label_div and details_div:
-                    label_text = re.sub(
-                        r"^\([^)]*\)\s*", "", label_div.get_text(strip=True)
-                    )
-                    details_text = details_div.get_text(strip=True)
-
-                    if label_text == "Số bằng và ngày cấp":
-                        spans = details_div.find_all("span")
-                        if len(spans) >= 2:
-                            row_data["Số bằng"] = spans[0].get_text(strip=True)
-                            row_data["Ngày cấp"] = spans[1].get_text(strip=True)
-                    elif label_text == "Số đơn và Ngày nộp đơn":
-                        spans = details_div.find_all("span")
-                        if len(spans) == 2:
-                            row_data["Số đơn"] = spans[0].get_text(strip=True)
-                            row_data["Ngày nộp đơn"] = spans[1].get_text(strip=True)
-                    elif label_text == "Số công bố và ngày công bố":
-                        details_text = details_div.find("div", class_="row")
-                        content = details_text.find_all("div", class_="col-md-4")
-                        row_data["Số công bố"] = content[0].get_text(strip=True)
-                        row_data["Ngày công bố"] = content[1].get_text(strip=True)
-                    elif label_text == "Chủ đơn/Chủ bằng":
-                        contents = details_div.find_all("div", id="apnaDiv")
-                        for idx in range(1, 6):
-                            if idx <= len(contents):
-                                content = contents[idx - 1]
-                                first_row = content.find("div", class_="row")
-                                if first_row:
-                                    raw_text = "".join(
-                                        [
-                                            text
-                                            for text in first_row.stripped_strings
-                                            if not text.startswith("(")
-                                        ]
-                                    )
-                                    parts = raw_text.split(":", 1)
-                                    if len(parts) == 2:
-                                        row_data[f"Chủ đơn_{idx}"] = parts[0].strip()
-                                        row_data[f"Địa chỉ Chủ đơn_{idx}"] = parts[
-                                            1
-                                        ].strip()
-                                    elif len(parts) == 1:
-                                        row_data[f"Chủ đơn_{idx}"] = parts[0].strip()
-                                        row_data[f"Địa chỉ Chủ đơn_{idx}"] = ""
-                            else:
-                                row_data[f"Chủ đơn_{idx}"] = ""
-                                row_data[f"Địa chỉ Chủ đơn_{idx}"] = ""
-                    elif label_text == "Đại diện SHCN":
-                        contents = details_div.find("div", class_="row")
-                        for content in contents:
-                            raw_text = "".join(
-                                [
-                                    text
-                                    for text in content.stripped_strings
-                                    if not text.startswith("(")
-                                ]
-                            )
-                            parts = raw_text.split(":", 1)
-                            if len(parts) == 2:
-                                row_data["Đại diện SHCN"] = parts[0].strip()
-                                row_data["Địa chỉ đại diện"] = parts[1].strip()
-                    elif label_text == "Nhóm sản phẩm/dịch vụ":
-                        rows = details_div.find_all("div", class_="row")
-                        for idx in range(1, 10):
-                            if idx <= len(rows):
-                                row = rows[idx - 1]
-                                group_div = row.find("div", class_="col-md-2")
-                                service_div = row.find("div", class_="col-md-10")
-                                if group_div and service_div:
-                                    row_data[f"Nhóm sản phẩm_{idx}"] = (
-                                        group_div.get_text(strip=True)
-                                    )
-                                    row_data[f"Dịch vụ_{idx}"] = service_div.get_text(
-                                        strip=True
-                                    )
-                            else:
-                                row_data[f"Nhóm sản phẩm_{idx}"] = ""
-                                row_data[f"Dịch vụ_{idx}"] = ""
-                    else:
-                        row_data[label_text] = details_text
+        """Trích xuất dữ liệu từ trang chi tiết design (nhận HTML hoặc WebElement)"""
+        if isinstance(detail_container, str):
+            html = detail_container
+        else:
+            html = detail_container.get_attribute("outerHTML")
+        return extract_design_fields(html)
 
-        return row_data
+    def parse_detail(self, detail_container):
+        """row_data (parse ngay trong thread này) hoặc Future khi có parse_pool"""
+        if self.parse_pool is None:
+            with span("parse"):
+                row_data = self.extract_data(detail_container)
+            logger.info("✓ Đã trích xuất %s trường dữ liệu", len(row_data))
+            return row_data
+        if not isinstance(detail_container, str):
+            detail_container = detail_container.get_attribute("outerHTML")
+        logger.debug("✓ Đã chuyển HTML sang parse pool")
+        return self.parse_pool.submit("designs", detail_container)
+
+    def collect_image_urls(self):
+        """URL ảnh của trang chi tiết hiện tại"""
+        if self.current_image_urls is not None:
+            # URL ảnh đã có sẵn (HTTP fetch hoặc harvest_page)
+            image_urls = self.current_image_urls
+        else:
+            # Tìm ảnh với class DRAWING-detail (cho trang designs)
+            images = self.driver.find_elements(By.CSS_SELECTOR, "img.DRAWING-detail")
 
-    def save_images(self, folder_name, search_value):
-        """Lưu ảnh từ trang chi tiết design"""
-        # Tìm ảnh với class DRAWING-detail (cho trang designs)
-        images = self.driver.find_elements(By.CSS_SELECTOR, "img.DRAWING-detail")
+            # Nếu không tìm thấy, thử selector cũ (cho trademarks nếu cần)
+            if len(images) == 0:
+                logger.debug("   Không tìm thấy ảnh với selector 'img.DRAWING-detail', thử selector khác...")
+                images = self.driver.find_elements(By.CSS_SELECTOR, "img.detail-img")
 
-        # Nếu không tìm thấy, thử selector cũ (cho trademarks nếu cần)
-        if len(images) == 0:
-            logger.info(f"   Không tìm thấy ảnh với selector 'img.DRAWING-detail', thử selector khác...")
-            images = self.driver.find_elements(By.CSS_SELECTOR, "img.detail-img")
+            # Nếu vẫn không có, thử selector chung
+            if len(images) == 0:
+                logger.debug("   Thử tìm tất cả ảnh trong detail-container...")
+                images = self.driver.find_elements(By.CSS_SELECTOR, "img.img-responsive-drawing")
 
-        # Nếu vẫn không có, thử selector chung
-        if len(images) == 0:
-            logger.info(f"   Thử tìm tất cả ảnh trong detail-container...")
-            images = self.driver.find_elements(By.CSS_SELECTOR, "img.img-responsive-drawing")
+            image_urls = [img.get_attribute("src") for img in images]
+        return image_urls
 
-        image_paths = []
-        total_images = len(images)
+    def save_images(self, folder_name, search_value, image_urls=None):
+        """Lưu ảnh từ trang chi tiết design (image_urls=None: lấy từ trang hiện tại)"""
+        if image_urls is None:
+            image_urls = self.collect_image_urls()
+        total_images = len(image_urls)
 
         if total_images == 0:
             logger.warning(f"⚠️ Không tìm thấy ảnh nào cho số đơn {search_value}")
-            return image_paths
-
-        logger.info(f"   Tìm thấy {total_images} ảnh")
-        for idx, img in enumerate(images, start=1):
-            img_url = img.get_attribute("src")
-            if img_url:
-                try:
-                    img_data = requests.get(img_url).content
-                    img_name = f"{search_value.replace('/', '_')}_{idx}.jpg"
-                    img_path = folder_name / img_name
-                    image_paths.append(str(img_path))
-                    with open(img_path, "wb") as f:
-                        f.write(img_data)
-                    logger.info(f"  ✓ Ảnh {idx}/{total_images}: {img_name}")
-                except Exception as e:
-                    logger.error(f"  ✗ Lỗi tải ảnh {idx}/{total_images}: {e}")
+            return []
 
-        return image_paths
+        logger.debug("   Tìm thấy %s ảnh", total_images)
+        return get_image_downloader().download_all(image_urls, folder_name, search_value)
 
     def save_data_to_excel(self):
-        """Lưu dữ liệu vào file Excel"""
-        if self.data:
-            logger.info(f"📊 Đang lưu dữ liệu vào Excel...")
-            for index, row in enumerate(self.data, start=1):
-                row["STT"] = index + len(self.existing_data)
-            df = pd.DataFrame(self.data)
-            columns = ["STT"] + [col for col in df.columns if col != "STT"]
-            df = df[columns]
-            combined_data = pd.concat([self.existing_data, df], ignore_index=True)
-            combined_data.to_excel(self.excel_file_path, index=False)
-
-            total_records = len(combined_data)
-            new_records = len(self.data)
-            logger.info(f"✅ THÀNH CÔNG! Đã lưu {new_records} bản ghi mới")
+        """Xuất RecordStore ra Excel - chạy theo yêu cầu, không còn ghi lại file sau mỗi record"""
+        if self.store.count():
+            logger.info(f"📊 Đang xuất dữ liệu từ {self.store.db_path} ra Excel...")
+            total_records = self.store.export_excel(self.excel_file_path)
             logger.info(f"📈 Tổng số bản ghi trong file: {total_records}")
             logger.info(f"💾 File output: {self.excel_file_path}")
         else:
             logger.warning("⚠️ Không có dữ liệu để lưu.")
 
-    def process_design(self, filing_number):
-        """Xử lý một filing number (số đơn designs)"""
-        start_time = time.time()
+    def fetch_page(self, filing_number):
+        """FetchedPage hoặc None - mọi lệnh WebDriver trong lúc fetch được tính cho số đơn này"""
+        # Thời gian mạng của số đơn này (--network-timing), None = không đo
+        self.last_network = None
+        with self.driver_profiler.record(filing_number):
+            if self.network_timing and self.driver:
+                discard_network_events(self.driver)
+            if self.fetcher:
+                self.fetcher.take_timings()
+            page = self._fetch_page(filing_number)
+            if self.network_timing:
+                network = []
+                if self.fetcher:
+                    network += self.fetcher.take_timings()
+                if self.driver:
+                    network += collect_network_timings(self.driver, filing_number)
+                self.last_network = network
+                if page:
+                    page.network = network
+            return page
+
+    def _fetch_page(self, filing_number):
+        """
+        Load trang chi tiết design (retry 2 lần, restart driver khi hết lượt)
+        Return: FetchedPage, hoặc None nếu không lấy được (lỗi trong self.last_error)
+        """
+        # Lỗi cuối cùng của số đơn này (CrawlerPool ghi vào CrawlLedger)
+        self.last_error = None
 
         # Thư mục output
         base_folder = Path("Output_Designs_Direct/Images")
@@ -518,49 +539,110 @@ class DesignCrawler:
             try:
                 # Load trang chi tiết và xử lý reCAPTCHA
                 detail_container = self.load_design_detail(filing_number)
-
-                # Trích xuất dữ liệu
-                logger.info(f"📝 Đang trích xuất dữ liệu...")
-                row_data = self.extract_data(detail_container)
-                self.data.append(row_data)
-                logger.info(f"✓ Đã trích xuất {len(row_data)} trường dữ liệu")
-
-                # Lưu ảnh
-                logger.info(f"🖼️  Đang tải ảnh...")
-                image_paths = self.save_images(folder_name, filing_number)
-                logger.info(f"✓ Đã lưu {len(image_paths)} ảnh vào: {folder_name}")
-                break
-
+                if not isinstance(detail_container, str):
+                    detail_container = detail_container.get_attribute("outerHTML")
+                self.last_error = None
+                page = FetchedPage(
+                    filing_number, "designs", detail_container, self.collect_image_urls(), folder_name
+                )
+                if self.archive:
+                    self.archive.add_page(page)
+                return page
+
+            except RecordNotFound as e:
+                # Số đơn không tồn tại - không retry
+                self.last_error = e
+                logger.warning(f"⚠️ Không tồn tại số đơn {filing_number}: {e}")
+                return None
             except TimeoutException as e:
+                self.last_error = e
                 error_file = error_folder_phase_2 / f"{filing_number.replace('/', '_')}_error.png"
                 logger.error(f"❌ TIMEOUT: Không tìm thấy kết quả cho {filing_number}")
-                logger.error(f"📸 Screenshot lỗi đã lưu: {error_file}")
-                self.driver.save_screenshot(str(error_file))
+                self.save_error_screenshot(error_file)
                 retry_attempts -= 1
                 if retry_attempts > 0:
                     logger.warning(f"🔄 Thử lại lần {3 - retry_attempts}/2...")
                 else:
                     logger.error(f"⚠️ Hết số lần retry, đang restart driver...")
                     self.restart_driver()
+            except SeleniumUnavailable as e:
+                # Chế độ http_only - không có trình duyệt để thử lại
+                self.last_error = e
+                logger.error(f"❌ {filing_number}: {e}")
+                return None
             except Exception as e:
+                self.last_error = e
                 error_file = error_folder_phase_1 / f"{filing_number.replace('/', '_')}_error.png"
                 logger.error(f"❌ LỖI: {type(e).__name__} - {str(e)}")
-                logger.error(f"📸 Screenshot lỗi đã lưu: {error_file}")
-                self.driver.save_screenshot(str(error_file))
+                self.save_error_screenshot(error_file)
                 retry_attempts -= 1
                 if retry_attempts > 0:
                     logger.warning(f"🔄 Thử lại lần {3 - retry_attempts}/2...")
                 else:
                     logger.error(f"⚠️ Hết số lần retry, đang restart driver...")
                     self.restart_driver()
+        return None
 
-        self.save_data_to_excel()
+    def fetch_and_parse(self, filing_number):
+        """
+        fetch_page + parse_detail. Parse trong thread lỗi (trang render dở, thiếu trường...)
+        thì tải lại trang, tối đa PARSE_ATTEMPTS lần.
+        Có parse_pool: lỗi parse chỉ biết khi Future xong - ghi thất bại, không tải lại
+        Return: (FetchedPage hoặc None, row_data hoặc Future); lỗi parse lần cuối được raise
+        """
+        for attempt in range(1, PARSE_ATTEMPTS + 1):
+            page = self.fetch_page(filing_number)
+            if page is None:
+                return None, None
+            try:
+                return page, self.parse_detail(page.html)
+            except Exception as e:
+                if self.parse_pool is not None or attempt == PARSE_ATTEMPTS:
+                    raise
+                logger.warning(
+                    f"🔄 Lỗi parse lần {attempt}/{PARSE_ATTEMPTS} ({type(e).__name__} - {e}), tải lại trang..."
+                )
+
+    def process_design(self, filing_number, save=True):
+        """
+        Xử lý một filing number (số đơn designs): fetch -> trích xuất -> tải ảnh -> ghi
+        save=False: không ghi vào RecordStore, chỉ trả về row_data (dùng khi chạy trong CrawlerPool)
+        """
+        start_time = time.time()
+        row_data = None
+
+        try:
+            # Tải trang + trích xuất dữ liệu
+            logger.debug("📝 Đang tải trang và trích xuất dữ liệu...")
+            page, row_data = self.fetch_and_parse(filing_number)
+            if page:
+                # Lưu ảnh
+                logger.debug("🖼️  Đang tải ảnh...")
+                image_paths = self.save_images(page.images_folder, filing_number, page.image_urls)
+                logger.info("✓ Đã lưu %s ảnh vào: %s", len(image_paths), page.images_folder)
+        except Exception as e:
+            self.last_error = e
+            row_data = None
+            logger.error(f"❌ LỖI: {type(e).__name__} - {str(e)}")
+
+        if save and row_data:
+            try:
+                # Chờ parse pool (nếu có) trả row_data trước khi ghi
+                row_data = resolve_row(row_data)
+            except Exception as e:
+                self.last_error = e
+                row_data = None
+                logger.error(f"❌ Lỗi parse {filing_number}: {type(e).__name__} - {str(e)}")
+            if row_data:
+                self.store.save(filing_number, row_data)
 
         end_time = time.time()
         elapsed_time = end_time - start_time
-        logger.info(f"⏱️  Thời gian xử lý: {elapsed_time:.2f} giây")
-        logger.info(f"=" * 80)
-        logger.info("")
+        observe("record", elapsed_time, error=not row_data)
+        logger.info("⏱️  Thời gian xử lý: %.2f giây", elapsed_time)
+        logger.debug("=" * 80)
+        logger.debug("")
+        return row_data
 
     def run(self, filing_numbers):
         """Chạy crawler cho danh sách filing numbers (số đơn designs)"""
@@ -568,13 +650,15 @@ class DesignCrawler:
         logger.info(f"=" * 80)
 
         for idx, filing_number in enumerate(filing_numbers, start=1):
-            logger.info(f"📍 Đang xử lý {idx}/{len(filing_numbers)}: {filing_number}")
-            try:
-                self.process_design(filing_number)
-            except Exception as e:
-                logger.error(f"Lỗi nghiêm trọng khi xử lý {filing_number}: {e}")
-                logger.info("Thử restart driver và tiếp tục...")
-                self.restart_driver()
+            with record_context(filing_number):
+                logger.info("📍 Đang xử lý %s/%s: %s", idx, len(filing_numbers), filing_number)
+                try:
+                    self.process_design(filing_number)
+                except Exception as e:
+                    logger.error(f"Lỗi nghiêm trọng khi xử lý {filing_number}: {e}")
+                    logger.info("Thử restart driver và tiếp tục...")
+                    self.restart_driver()
 
         logger.info(f"✅ HOÀN THÀNH! Đã xử lý {len(filing_numbers)} số đơn designs")
-        self.close_driver()
+        self.save_data_to_excel()
+        self.close()
@@ -0,0 +1,262 @@
+"""
+Trích xuất row_data từ HTML detail-container của trang chi tiết NOIP
+Tách khỏi crawler để parse được HTML đã lưu (không cần driver) và chọn backend
+parse (html_parser.py): mọi thao tác trên cây đi qua HtmlBackend nên cùng một logic
+chạy trên lxml.html (nhanh) hoặc BeautifulSoup.
+
+Duyệt cây một lần: mỗi cặp label/details được ghép theo div.row gần nhất chứa nó
+và chỉ xử lý đúng một lần (trước đây mỗi div.row lồng nhau lại find_all toàn bộ
+cây con, các row bên trong bị quét lại nhiều lần). Label được map sang hàm xử lý
+bằng dict - các hàm này được biên dịch sẵn từ spec khai báo trong field_specs.py.
+"""
+import logging
+import re
+
+from field_specs import DESIGN_SPEC, PATENT_SPEC, TRADEMARK_SPEC
+from html_parser import get_backend
+
+logger = logging.getLogger(__name__)
+
+LABEL_CLASS = "product-form-label"
+DETAILS_CLASS = "product-form-details"
+# Bỏ mã INID trong ngoặc ở đầu label, ví dụ "(21) Số đơn và Ngày nộp đơn"
+LABEL_PREFIX_RE = re.compile(r"^\([^)]*\)\s*")
+SELECTOR_RE = re.compile(r"^([a-z0-9]+)?(?:\.([\w-]+)|#([\w-]+))?$")
+
+
+class Selector:
+    """Selector đơn giản (tag, tag.class, tag#id) tách sẵn thành tham số find/find_all của HtmlBackend"""
+
+    def __init__(self, selector):
+        match = SELECTOR_RE.match(selector)
+        if not match:
+            raise ValueError(f"Selector không hỗ trợ: {selector}")
+        self.selector = selector
+        self.name, self.class_name, self.element_id = match.groups()
+
+    def find(self, backend, element):
+        return backend.find(element, self.name, self.class_name, self.element_id)
+
+    def find_all(self, backend, element):
+        return backend.find_all(element, self.name, self.class_name, self.element_id)
+
+
+ROW = Selector("div.row")
+SPAN = Selector("span")
+
+
+def iter_label_details(backend, root):
+    """
+    Các cặp (label_div, details_div) theo thứ tự tài liệu
+    Một lần duyệt cho cả hai class, ghép cặp trong từng div.row gần nhất
+    """
+    groups = {}
+    for div, classes in backend.find_all_classes(root, "div", (LABEL_CLASS, DETAILS_CLASS)):
+        row = backend.find_parent(div, "div", "row")
+        if row is None:
+            continue
+        # Giữ tham chiếu tới row: id() của proxy lxml chỉ cố định khi proxy còn sống
+        _, labels, details = groups.setdefault(id(row), (row, [], []))
+        if LABEL_CLASS in classes:
+            labels.append(div)
+        else:
+            details.append(div)
+    for _, labels, details in groups.values():
+        yield from zip(labels, details)
+
+
+def split_name_address(backend, element):
+    """'Tên : Địa chỉ' (bỏ các đoạn mã nước như '(VN)') -> [tên] hoặc [tên, địa chỉ]"""
+    raw_text = "".join(text for text in backend.strings(element) if not text.startswith("("))
+    return raw_text.split(":", 1)
+
+
+# ---------- Biên dịch từng kiểu trường thành handler(backend, details_div, row_data, label_text) ----------
+
+
+def store_text(backend, details_div, row_data, label_text):
+    row_data[label_text] = backend.text(details_div)
+
+
+def compile_text(field):
+    if not field.get("strip_prefix"):
+        return store_text
+
+    def handler(backend, details_div, row_data, label_text):
+        row_data[label_text] = LABEL_PREFIX_RE.sub("", backend.text(details_div))
+
+    return handler
+
+
+def compile_spans(field):
+    first_key, second_key = field["keys"]
+    exact = field.get("exact", False)
+    lstrip = field.get("lstrip")
+
+    def handler(backend, details_div, row_data, label_text):
+        spans = SPAN.find_all(backend, details_div)
+        enough = len(spans) == 2 if exact else len(spans) >= 2
+        if enough:
+            first = backend.text(spans[0])
+            row_data[first_key] = first.lstrip(lstrip) if lstrip else first
+            row_data[second_key] = backend.text(spans[1])
+
+    return handler
+
+
+def compile_columns(field):
+    first_key, second_key = field["keys"]
+    (first_selector, first_index), (second_selector, second_index) = [
+        (Selector(selector), index) for selector, index in field["columns"]
+    ]
+    lstrip = field.get("lstrip")
+
+    def handler(backend, details_div, row_data, label_text):
+        details_row = ROW.find(backend, details_div)
+        if details_row is None:
+            return
+        first_columns = first_selector.find_all(backend, details_row)
+        second_columns = (
+            first_columns if second_selector.selector == first_selector.selector
+            else second_selector.find_all(backend, details_row)
+        )
+        if len(first_columns) > first_index and len(second_columns) > second_index:
+            first = backend.text(first_columns[first_index])
+            row_data[first_key] = first.lstrip(lstrip) if lstrip else first
+            row_data[second_key] = backend.text(second_columns[second_index])
+
+    return handler
+
+
+def compile_parties(field):
+    selector = Selector(field["selector"])
+    name_key, address_key = field["keys"]
+    limit = field.get("limit")
+    pad = field.get("pad", False)
+
+    def handler(backend, details_div, row_data, label_text):
+        contents = selector.find_all(backend, details_div)[:limit]
+        for idx, content in enumerate(contents, start=1):
+            first_row = ROW.find(backend, content)
+            if first_row is not None:
+                parts = split_name_address(backend, first_row)
+                row_data[f"{name_key}_{idx}"] = parts[0].strip()
+                row_data[f"{address_key}_{idx}"] = parts[1].strip() if len(parts) == 2 else ""
+        if pad and limit:
+            for idx in range(len(contents) + 1, limit + 1):
+                row_data[f"{name_key}_{idx}"] = ""
+                row_data[f"{address_key}_{idx}"] = ""
+
+    return handler
+
+
+def compile_party(field):
+    name_key, address_key = field["keys"]
+
+    def handler(backend, details_div, row_data, label_text):
+        contents = ROW.find(backend, details_div)
+        if contents is not None:
+            for content in backend.children(contents):
+                parts = split_name_address(backend, content)
+                if len(parts) == 2:
+                    row_data[name_key] = parts[0].strip()
+                    row_data[address_key] = parts[1].strip()
+
+    return handler
+
+
+def compile_table(field):
+    first_key, second_key = field["keys"]
+    first_selector, second_selector = [Selector(selector) for selector in field["columns"]]
+    limit = field.get("limit")
+    pad = field.get("pad", False)
+
+    def handler(backend, details_div, row_data, label_text):
+        table_rows = ROW.find_all(backend, details_div)[:limit]
+        for idx, table_row in enumerate(table_rows, start=1):
+            first = first_selector.find(backend, table_row)
+            second = second_selector.find(backend, table_row)
+            if first is not None and second is not None:
+                row_data[f"{first_key}_{idx}"] = backend.text(first)
+                row_data[f"{second_key}_{idx}"] = backend.text(second)
+        if pad and limit:
+            for idx in range(len(table_rows) + 1, limit + 1):
+                row_data[f"{first_key}_{idx}"] = ""
+                row_data[f"{second_key}_{idx}"] = ""
+
+    return handler
+
+
+def compile_first_text(field):
+    selector = Selector(field["selector"])
+
+    def handler(backend, details_div, row_data, label_text):
+        content = selector.find(backend, details_div)
+        row_data[label_text] = backend.text(details_div if content is None else content)
+
+    return handler
+
+
+FIELD_COMPILERS = {
+    "text": compile_text,
+    "spans": compile_spans,
+    "columns": compile_columns,
+    "parties": compile_parties,
+    "party": compile_party,
+    "table": compile_table,
+    "first_text": compile_first_text,
+}
+
+
+class ExtractionPlan:
+    """Spec đã biên dịch: label -> handler, alias label gốc"""
+
+    def __init__(self, name, handlers, aliases):
+        self.name = name
+        self.handlers = handlers
+        self.aliases = aliases
+
+    def extract(self, html, parser=None):
+        backend = get_backend(parser)
+        root = backend.parse(html)
+        row_data = {}
+        for label_div, details_div in iter_label_details(backend, root):
+            raw_label = backend.text(label_div)
+            label_text = self.aliases.get(raw_label) or LABEL_PREFIX_RE.sub("", raw_label)
+            self.handlers.get(label_text, store_text)(backend, details_div, row_data, label_text)
+        return row_data
+
+
+def compile_spec(spec):
+    handlers = {
+        label: FIELD_COMPILERS[field["type"]](field) for label, field in spec["fields"].items()
+    }
+    return ExtractionPlan(spec["name"], handlers, dict(spec.get("aliases", {})))
+
+
+DESIGN_PLAN = compile_spec(DESIGN_SPEC)
+TRADEMARK_PLAN = compile_spec(TRADEMARK_SPEC)
+PATENT_PLAN = compile_spec(PATENT_SPEC)
+
+
+def extract_design_fields(html, parser=None):
+    """Trích xuất dữ liệu từ trang chi tiết design (kiểu dáng công nghiệp)"""
+    return DESIGN_PLAN.extract(html, parser)
+
+
+def extract_trademark_fields(html, parser=None):
+    """Trích xuất dữ liệu từ trang chi tiết trademark (nhãn hiệu)"""
+    return TRADEMARK_PLAN.extract(html, parser)
+
+
+def extract_patent_fields(html, parser=None):
+    """Trích xuất dữ liệu từ trang chi tiết patent (sáng chế)"""
+    return PATENT_PLAN.extract(html, parser)
+
+
+# Hàm trích xuất theo loại đối tượng (tên giống tiền tố file HTML đã lưu)
+EXTRACTORS = {
+    "designs": extract_design_fields,
+    "trademarks": extract_trademark_fields,
+    "patents": extract_patent_fields,
+}
@@ -0,0 +1,50 @@
+"""
+Xuất dữ liệu từ kho bản ghi (records.sqlite) ra file Excel
+Ví dụ:
+    python export_excel.py Output_Designs
+    python export_excel.py Output_Trademarks_Direct --file ket_qua.xlsx
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from log_config import setup_logging
+from record_store import RECORDS_DB_NAME, RecordStore
+
+logger = logging.getLogger(__name__)
+
+# Tên file Excel mặc định của từng thư mục output
+DEFAULT_EXCEL_NAMES = {
+    "Output_Designs": "designs_data.xlsx",
+    "Output_Designs_Direct": "designs_data.xlsx",
+    "Output_Trademarks_Direct": "trademarks_data.xlsx",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xuất records.sqlite ra Excel")
+    parser.add_argument("output_folder", help="Thư mục output của crawler (chứa records.sqlite)")
+    parser.add_argument("--file", help="Đường dẫn file Excel (mặc định: file Excel của crawler)")
+    args = parser.parse_args()
+    setup_logging()
+
+    output_folder = Path(args.output_folder)
+    db_path = output_folder / RECORDS_DB_NAME
+    if not db_path.exists():
+        logger.error(f"❌ Không tìm thấy {db_path}")
+        sys.exit(1)
+
+    excel_name = DEFAULT_EXCEL_NAMES.get(output_folder.name, "data.xlsx")
+    excel_file_path = Path(args.file) if args.file else output_folder / excel_name
+
+    # Read-only: xuất được cả khi crawler đang chạy (không đụng journal của crawler)
+    store = RecordStore(db_path, read_only=True)
+    try:
+        store.export_excel(excel_file_path)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
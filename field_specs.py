@@ -0,0 +1,109 @@
+"""
+Khai báo trường dữ liệu của từng loại đối tượng SHCN (designs, trademarks, patents)
+Mỗi spec map label (đã bỏ mã INID trong ngoặc) sang cách lấy dữ liệu từ div details.
+detail_extractor.compile_spec biên dịch spec một lần khi import thành ExtractionPlan
+(regex, selector dựng sẵn). Thêm loại đối tượng mới chỉ cần thêm một spec ở đây.
+
+Các kiểu trường:
+- text: toàn bộ text của details (strip_prefix: bỏ "(...)" ở đầu giá trị)
+- spans: hai span đầu -> keys (exact: phải đúng 2 span; lstrip: ký tự bỏ ở đầu giá trị đầu)
+- columns: trong row đầu tiên của details, lấy cột theo selector + thứ tự -> keys
+- parties: danh sách người (div#apnaDiv / div#innaDiv), mỗi người "Tên : Địa chỉ" -> key_1, key_2...
+  (limit/pad: chỉ lấy và luôn điền đủ N người)
+- party: một người trong row đầu tiên của details (phần tử con cuối có ":" thắng)
+- table: các row của details, mỗi row hai cột -> key_1, key_2... (pad: luôn đủ N row)
+- first_text: text của phần tử đầu tiên khớp selector, không có thì toàn bộ text
+"""
+
+DESIGN_SPEC = {
+    "name": "designs",
+    "fields": {
+        "Số bằng và ngày cấp": {"type": "spans", "keys": ["Số bằng", "Ngày cấp"]},
+        "Số đơn và Ngày nộp đơn": {"type": "spans", "keys": ["Số đơn", "Ngày nộp đơn"], "exact": True},
+        "Số công bố và ngày công bố": {
+            "type": "columns",
+            "keys": ["Số công bố", "Ngày công bố"],
+            "columns": [["div.col-md-4", 0], ["div.col-md-4", 1]],
+        },
+        "Chủ đơn/Chủ bằng": {
+            "type": "parties",
+            "selector": "div#apnaDiv",
+            "keys": ["Chủ đơn", "Địa chỉ Chủ đơn"],
+            "limit": 5,
+            "pad": True,
+        },
+        "Đại diện SHCN": {"type": "party", "keys": ["Đại diện SHCN", "Địa chỉ đại diện"]},
+        "Nhóm sản phẩm/dịch vụ": {
+            "type": "table",
+            "keys": ["Nhóm sản phẩm", "Dịch vụ"],
+            "columns": ["div.col-md-2", "div.col-md-10"],
+            "limit": 9,
+            "pad": True,
+        },
+    },
+}
+
+TRADEMARK_SPEC = {
+    "name": "trademarks",
+    "aliases": {"(541) Nhãn hiệu": "Nhãn hiệu gốc"},
+    "fields": {
+        "Số bằng và ngày cấp": {"type": "spans", "keys": ["Số bằng", "Ngày cấp"]},
+        "Số đơn và Ngày nộp đơn": {"type": "spans", "keys": ["Số đơn", "Ngày nộp đơn"], "exact": True},
+        "Số công bố và ngày công bố": {
+            "type": "columns",
+            "keys": ["Số công bố", "Ngày công bố"],
+            "columns": [["div.col-md-4", 0], ["div.col-md-4", 1]],
+        },
+        "Chủ đơn/Chủ bằng": {
+            "type": "parties",
+            "selector": "div#apnaDiv",
+            "keys": ["Chủ đơn", "Địa chỉ Chủ đơn"],
+        },
+        "Đại diện SHCN": {"type": "party", "keys": ["Đại diện SHCN", "Địa chỉ đại diện"]},
+        "Nhãn hiệu gốc": {"type": "text", "strip_prefix": True},
+        "Nhóm sản phẩm/dịch vụ": {"type": "first_text", "selector": "div.col-md-10"},
+    },
+}
+
+# Logic patents (sáng chế) từ backup2.py
+PATENT_SPEC = {
+    "name": "patents",
+    "fields": {
+        "Số bằng và ngày cấp": {"type": "spans", "keys": ["Số bằng", "Ngày cấp"], "exact": True},
+        "Số đơn và Ngày nộp đơn": {
+            "type": "spans",
+            "keys": ["Số đơn", "Ngày nộp đơn"],
+            "exact": True,
+            "lstrip": "VN",
+        },
+        "Số công bố và ngày công bố": {
+            "type": "columns",
+            "keys": ["Số công bố", "Ngày công bố"],
+            "columns": [["div.col-md-5", 0], ["div.col-md-2", 0]],
+            "lstrip": "VN",
+        },
+        "Chủ đơn/Chủ bằng": {"type": "party", "keys": ["Chủ đơn", "Địa chỉ chủ đơn"]},
+        "Tác giả sáng chế": {
+            "type": "parties",
+            "selector": "div#innaDiv",
+            "keys": ["Tác giả", "Địa chỉ tác giả"],
+        },
+        "Đại diện SHCN": {"type": "party", "keys": ["Đại diện SHCN", "Địa chỉ đại diện"]},
+        "Số đơn và ngày nộp đơn PCT": {
+            "type": "spans",
+            "keys": ["Số đơn PCT", "Ngày nộp đơn PCT"],
+            "exact": True,
+            "lstrip": "VN",
+        },
+        "Số công bố và ngày công bố đơn PCT": {
+            "type": "spans",
+            "keys": ["Số công bố PCT", "Ngày công bố đơn PCT"],
+            "exact": True,
+            "lstrip": "VN",
+        },
+        "Tên": {"type": "text", "strip_prefix": True},
+        "Tóm tắt": {"type": "text", "strip_prefix": True},
+    },
+}
+
+FIELD_SPECS = {spec["name"]: spec for spec in [DESIGN_SPEC, TRADEMARK_SPEC, PATENT_SPEC]}
@@ -0,0 +1,136 @@
+"""
+Kho lưu HTML detail-container thô (nén gzip, định danh theo nội dung)
+Mỗi trang chi tiết fetch được lưu một lần dưới objects/<sha[:2]>/<sha>.html.gz
+(sha256 của HTML - trang không đổi giữa các lần crawl chỉ tốn một file); index
+SQLite ghi (số đơn, thời điểm fetch) -> sha256. Sửa lỗi trích xuất chỉ cần chạy
+reparse.py trên kho này thay vì crawl lại NOIP.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR_NAME = "html_archive"
+INDEX_NAME = "archive.sqlite"
+OBJECTS_DIR = "objects"
+
+
+def read_html(object_path):
+    """Giải nén một object HTML trong kho"""
+    with gzip.open(object_path, "rb") as f:
+        return f.read().decode("utf-8")
+
+
+class ArchivedPage:
+    def __init__(self, filing_number, ip_type, fetched_at, sha256, object_path):
+        self.filing_number = filing_number
+        self.ip_type = ip_type
+        self.fetched_at = fetched_at
+        self.sha256 = sha256
+        self.object_path = object_path
+
+
+class HtmlArchive:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects_root = self.root / OBJECTS_DIR
+        self.objects_root.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.root / INDEX_NAME), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                filing_number TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                ip_type TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (filing_number, fetched_at)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def object_path(self, sha256):
+        return self.objects_root / sha256[:2] / f"{sha256}.html.gz"
+
+    def store(self, filing_number, ip_type, html, fetched_at=None):
+        """Lưu HTML của một lần fetch, trả về sha256 (object đã có thì chỉ thêm dòng index)"""
+        data = html.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.object_path(sha256)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.part")
+            tmp_path.write_bytes(gzip.compress(data, mtime=0))
+            os.replace(tmp_path, path)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (filing_number, fetched_at, ip_type, sha256, size) VALUES (?, ?, ?, ?, ?)",
+                (str(filing_number), fetched_at or time.time(), ip_type, sha256, len(data)),
+            )
+            self.conn.commit()
+        return sha256
+
+    def add_page(self, page):
+        """Lưu FetchedPage vừa fetch - lỗi ghi kho chỉ log, không làm hỏng lần crawl"""
+        try:
+            return self.store(page.filing_number, page.ip_type, page.html)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"⚠️ Không lưu được HTML {page.filing_number} vào kho: {e}")
+            return None
+
+    def latest(self, ip_type=None, filing_numbers=None):
+        """Lần fetch mới nhất của từng số đơn (theo thứ tự fetch đầu tiên)"""
+        # Chọn cả dòng của lần fetch mới nhất (ROW_NUMBER) - GROUP BY với hai hàm gộp
+        # (MAX + MIN) làm SQLite lấy sha256/ip_type từ một dòng bất kỳ trong nhóm
+        query = """
+            SELECT filing_number, ip_type, fetched_at, sha256 FROM (
+                SELECT filing_number, ip_type, fetched_at, sha256,
+                    ROW_NUMBER() OVER (PARTITION BY filing_number ORDER BY fetched_at DESC) AS fetch_rank,
+                    MIN(rowid) OVER (PARTITION BY filing_number) AS first_rowid
+                FROM pages {where}
+            )
+            WHERE fetch_rank = 1 ORDER BY first_rowid
+        """
+        conditions, params = [], []
+        if ip_type:
+            conditions.append("ip_type = ?")
+            params.append(ip_type)
+        if filing_numbers:
+            conditions.append(f"filing_number IN ({', '.join('?' * len(filing_numbers))})")
+            params.extend(str(filing_number) for filing_number in filing_numbers)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self.conn.execute(query.format(where=where), params).fetchall()
+        return [
+            ArchivedPage(filing_number, page_type, fetched_at, sha256, self.object_path(sha256))
+            for filing_number, page_type, fetched_at, sha256 in rows
+        ]
+
+    def load(self, filing_number):
+        """HTML mới nhất của một số đơn (None nếu chưa có)"""
+        pages = self.latest(filing_numbers=[filing_number])
+        return read_html(pages[0].object_path) if pages else None
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(DISTINCT filing_number) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_archive(output_folder):
+    """Mở kho HTML trong thư mục output của crawler"""
+    return HtmlArchive(Path(output_folder) / ARCHIVE_DIR_NAME)
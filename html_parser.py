@@ -0,0 +1,205 @@
+"""
+Backend parse HTML cho extract_data
+- lxml: cây lxml.html duyệt trực tiếp (C, không dựng cây BeautifulSoup) - mặc định nếu đã cài
+- html.parser: BeautifulSoup + html.parser thuần Python (không cần lxml, là chuẩn so khớp)
+Hai backend có cùng bộ thao tác (HtmlBackend) nên detail_extractor chỉ có một bản logic
+trích xuất; check_parser_parity.py kiểm tra row_data giống hệt nhau giữa các backend.
+Chọn backend bằng biến môi trường NOIP_HTML_PARSER=lxml|html.parser
+"""
+import logging
+import os
+
+from bs4 import BeautifulSoup, Comment
+
+logger = logging.getLogger(__name__)
+
+PARSER_LXML = "lxml"
+PARSER_HTML = "html.parser"
+PARSERS = [PARSER_LXML, PARSER_HTML]
+# Text trong các thẻ con này không thuộc get_text() của BeautifulSoup (trừ khi gọi trên chính thẻ đó)
+SKIP_TEXT_TAGS = frozenset(["script", "style", "template"])
+
+
+def available_parsers():
+    """Các backend dùng được trên máy hiện tại (theo thứ tự ưu tiên)"""
+    parsers = []
+    try:
+        import lxml.html  # noqa: F401
+
+        parsers.append(PARSER_LXML)
+    except ImportError:
+        pass
+    parsers.append(PARSER_HTML)
+    return parsers
+
+
+def default_parser():
+    parser = os.environ.get("NOIP_HTML_PARSER")
+    if parser:
+        if parser not in available_parsers():
+            raise ValueError(f"Backend parse không dùng được: {parser} (có: {', '.join(available_parsers())})")
+        return parser
+    return available_parsers()[0]
+
+
+DEFAULT_PARSER = default_parser()
+
+
+def make_soup(html, parser=None):
+    """BeautifulSoup (tree builder lxml nếu có) - cho code cần CSS select của bs4 (http_fetcher)"""
+    return BeautifulSoup(html, parser or DEFAULT_PARSER)
+
+
+class HtmlBackend:
+    """
+    Thao tác trên cây HTML mà detail_extractor cần
+    find/find_all: phần tử con cháu (không tính chính nó) theo tag + class/id
+    text: get_text(strip=True) của BeautifulSoup; strings: stripped_strings
+    children: con trực tiếp (phần tử và đoạn text) theo thứ tự
+    """
+
+    name = None
+
+    def parse(self, html):
+        raise NotImplementedError
+
+
+class SoupBackend(HtmlBackend):
+    name = PARSER_HTML
+
+    def parse(self, html):
+        return BeautifulSoup(html, PARSER_HTML)
+
+    def find(self, element, name, class_name=None, element_id=None):
+        return element.find(name, **self._attrs(class_name, element_id))
+
+    def find_all(self, element, name, class_name=None, element_id=None):
+        return element.find_all(name, **self._attrs(class_name, element_id))
+
+    @staticmethod
+    def _attrs(class_name, element_id):
+        attrs = {}
+        if class_name:
+            attrs["class_"] = class_name
+        if element_id:
+            attrs["id"] = element_id
+        return attrs
+
+    def find_all_classes(self, root, name, class_names):
+        """(phần tử, danh sách class) của mọi thẻ name có một trong class_names, theo thứ tự tài liệu"""
+        return [(tag, tag.get("class", [])) for tag in root.find_all(name, class_=list(class_names))]
+
+    def find_parent(self, element, name, class_name):
+        return element.find_parent(name, class_=class_name)
+
+    def text(self, element):
+        return element.get_text(strip=True)
+
+    def strings(self, element):
+        return element.stripped_strings
+
+    def children(self, element):
+        return [child for child in element.children if not isinstance(child, Comment)]
+
+
+class LxmlBackend(HtmlBackend):
+    name = PARSER_LXML
+
+    def __init__(self):
+        from lxml import etree, html as lxml_html
+
+        self.etree = etree
+        self.lxml_html = lxml_html
+
+    def parse(self, html):
+        try:
+            return self.lxml_html.document_fromstring(html)
+        except (self.etree.ParserError, ValueError):
+            # HTML rỗng / không có phần tử nào: như BeautifulSoup - cây rỗng
+            return self.lxml_html.document_fromstring("<html></html>")
+
+    @staticmethod
+    def _matches(element, class_name, element_id):
+        if class_name and class_name not in (element.get("class") or "").split():
+            return False
+        if element_id and element.get("id") != element_id:
+            return False
+        return True
+
+    def find_all(self, element, name, class_name=None, element_id=None):
+        return [
+            child
+            for child in (element.iterdescendants(name) if name else element.iterdescendants())
+            if isinstance(child.tag, str) and self._matches(child, class_name, element_id)
+        ]
+
+    def find(self, element, name, class_name=None, element_id=None):
+        for child in element.iterdescendants(name) if name else element.iterdescendants():
+            if isinstance(child.tag, str) and self._matches(child, class_name, element_id):
+                return child
+        return None
+
+    def find_all_classes(self, root, name, class_names):
+        found = []
+        for element in root.iter(name):
+            classes = (element.get("class") or "").split()
+            if any(class_name in classes for class_name in class_names):
+                found.append((element, classes))
+        return found
+
+    def find_parent(self, element, name, class_name):
+        for parent in element.iterancestors(name):
+            if class_name in (parent.get("class") or "").split():
+                return parent
+        return None
+
+    def _strings(self, element, top=True):
+        """Các đoạn text như _all_strings của bs4: bỏ comment, script/style/template con"""
+        if isinstance(element, str):
+            yield element
+            return
+        if not top and element.tag in SKIP_TEXT_TAGS:
+            return
+        if element.text:
+            yield element.text
+        for child in element:
+            if isinstance(child.tag, str):
+                yield from self._strings(child, False)
+            if child.tail:
+                yield child.tail
+
+    def text(self, element):
+        return "".join(text.strip() for text in self._strings(element))
+
+    def strings(self, element):
+        for text in self._strings(element):
+            text = text.strip()
+            if text:
+                yield text
+
+    def children(self, element):
+        children = [element.text] if element.text else []
+        for child in element:
+            if isinstance(child.tag, str):
+                children.append(child)
+            if child.tail:
+                children.append(child.tail)
+        return children
+
+
+_backends = {}
+
+
+def get_backend(parser=None):
+    """HtmlBackend của parser (None: backend mặc định), tạo một lần rồi dùng lại"""
+    parser = parser or DEFAULT_PARSER
+    backend = _backends.get(parser)
+    if backend is None:
+        if parser == PARSER_LXML:
+            backend = LxmlBackend()
+        elif parser == PARSER_HTML:
+            backend = SoupBackend()
+        else:
+            raise ValueError(f"Backend parse không hỗ trợ: {parser} (có: {', '.join(PARSERS)})")
+        _backends[parser] = backend
+    return backend
@@ -0,0 +1,138 @@
+"""
+Fetcher HTTP cho trang chi tiết NOIP - không cần Selenium
+Phần lớn trang chi tiết (designs, trademarks) trả về HTML đầy đủ mà không cần
+JavaScript, nên GET thẳng bằng requests.Session rẻ hơn nhiều so với render Chrome.
+Chỉ khi trang là challenge (reCAPTCHA), lỗi 500 hoặc lỗi template ${appltype}
+thì crawler mới quay về luồng Selenium.
+"""
+import logging
+import time
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from html_parser import make_soup
+from metrics import increment, observe
+from network_timing import http_timing
+from page_harvest import FetchedPage
+from page_state import PageState, classify_html
+
+logger = logging.getLogger(__name__)
+
+# Gốc URL của NOIP WIPO Publish (mock_noip_server.py thay bằng http://127.0.0.1:<port>)
+NOIP_BASE_URL = "https://wipopublish.ipvietnam.gov.vn"
+# Selector ảnh theo thứ tự ưu tiên (giống save_images của từng crawler)
+DESIGN_IMAGE_SELECTORS = ["img.DRAWING-detail", "img.detail-img", "img.img-responsive-drawing"]
+TRADEMARK_IMAGE_SELECTORS = ["img.detail-img", "img.img-responsive"]
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "vi-VN,vi;q=0.9,en;q=0.8",
+}
+
+
+# Trạng thái trang (page_state.classify_html) buộc phải quay về Selenium
+FALLBACK_REASONS = {
+    PageState.SERVER_500: "lỗi 500",
+    PageState.TEMPLATE_ERROR: "lỗi template ${appltype}",
+    PageState.CHALLENGE: "trang challenge (reCAPTCHA)",
+    PageState.SECURITY_INTERSTITIAL: "trang cảnh báo bảo mật",
+}
+
+
+def detail_url(ip_type, processed_id, base_url=None):
+    """URL trang chi tiết, ví dụ detail_url("designs", "VN320190123")"""
+    return f"{base_url or NOIP_BASE_URL}/wopublish-search/public/detail/{ip_type}?id={processed_id}"
+
+
+class RecordNotFound(Exception):
+    """Server xác nhận số đơn không tồn tại (HTTP 404) - không cần thử lại"""
+
+
+class SeleniumUnavailable(Exception):
+    """HTTP fetch không lấy được trang và crawler chạy http_only (không mở Chrome)"""
+
+
+class DetailFetcher:
+    def __init__(self, pool_size=10, timeout=(5, 30), verify_ssl=True):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.session.verify = verify_ssl
+        # Connection pool dùng chung, giữ keep-alive giữa các record
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Thời gian từng request GET (network_timing.http_timing), crawler lấy ra sau mỗi số đơn
+        self.request_timings = []
+
+    def take_timings(self):
+        """Lấy và xóa các request_timings đã ghi"""
+        timings, self.request_timings = self.request_timings, []
+        return timings
+
+    def close(self):
+        self.session.close()
+
+    @staticmethod
+    def fallback_reason(status_code, html):
+        """Trả về lý do cần fallback sang Selenium, hoặc None nếu HTML dùng được"""
+        if status_code >= 500:
+            return FALLBACK_REASONS[PageState.SERVER_500]
+        state = classify_html(html)
+        if state in FALLBACK_REASONS:
+            return FALLBACK_REASONS[state]
+        if status_code != 200:
+            return f"HTTP {status_code}"
+        return None
+
+    def fetch_detail(self, url, image_selectors=(), filing_number=None, ip_type=None, images_folder=None):
+        """
+        GET trang chi tiết và tách detail-container
+        Return: FetchedPage (HTML detail-container + URL ảnh) nếu thành công, None nếu cần fallback sang Selenium
+        Raise RecordNotFound nếu server trả về 404
+        """
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.request_timings.append(http_timing(url, time.perf_counter() - started, error=type(e).__name__))
+            logger.warning(f"⚠️ HTTP fetch lỗi ({type(e).__name__}), chuyển sang Selenium...")
+            return None
+        # response.elapsed: gửi request -> parse xong header (TTFB phía server)
+        observe("net_document_ttfb", response.elapsed.total_seconds())
+        self.request_timings.append(http_timing(url, time.perf_counter() - started, response))
+
+        if response.status_code == 404:
+            raise RecordNotFound(f"Không tồn tại trang chi tiết: {url}")
+
+        html = response.text
+        reason = self.fallback_reason(response.status_code, html)
+        if reason:
+            increment("http_fallbacks", reason=reason)
+            logger.info("   HTTP fetch gặp %s, chuyển sang Selenium...", reason)
+            return None
+
+        soup = make_soup(html)
+        detail_container = soup.select_one("div.detail-container.col-md-12")
+        if detail_container is None:
+            # Trang cần JavaScript để render nội dung
+            logger.info("   HTTP fetch không có detail-container, chuyển sang Selenium...")
+            return None
+
+        image_urls = []
+        for selector in image_selectors:
+            image_urls = [
+                urljoin(response.url, img["src"])
+                for img in soup.select(selector)
+                if img.get("src")
+            ]
+            if image_urls:
+                break
+
+        return FetchedPage(filing_number, ip_type, str(detail_container), image_urls, images_folder)
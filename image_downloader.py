@@ -0,0 +1,181 @@
+"""
+Tải ảnh song song cho các crawler
+- Một requests.Session với connection pool dùng chung (keep-alive) cho mọi worker
+- Giới hạn song song ở hai mức: toàn cục (số thread của executor, chia cho mọi record
+  đang chạy trong CrawlerPool) và trong một record (per_record)
+- Ghi ảnh theo từng chunk vào file .part rồi os.replace - không giữ cả ảnh trong RAM,
+  không để lại file ảnh dở dang khi lỗi giữa chừng
+- Timeout cho từng request + retry với backoff, thêm giới hạn tổng thời gian mỗi ảnh
+  để một ảnh treo không giữ worker mãi
+- Ảnh đã có trong manifest (image_manifest.py) thì chỉ hardlink lại, không gọi mạng
+- close() chờ các ảnh đang tải và đóng manifest; bản dùng chung (get_image_downloader)
+  được đóng bởi close_image_downloader() ở cuối main script, hoặc atexit
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from http_fetcher import DEFAULT_HEADERS
+from image_manifest import ImageManifest, link_file
+from metrics import observe, span
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ImageDownloadTimeout(Exception):
+    """Ảnh tải quá max_duration giây (server trả về nhỏ giọt)"""
+
+
+class ImageDownloader:
+    def __init__(
+        self,
+        max_workers=16,
+        per_record=4,
+        timeout=(5, 30),
+        retries=3,
+        max_duration=120,
+        verify_ssl=True,
+    ):
+        self.per_record = per_record
+        self.timeout = timeout
+        self.max_duration = max_duration
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.session.verify = verify_ssl
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+        )
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-download")
+        # Mỗi thư mục Images có một manifest riêng
+        self.manifests = {}
+        self.manifests_lock = threading.Lock()
+        self.closed = False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.executor.shutdown(wait=True)
+        self.session.close()
+        with self.manifests_lock:
+            for manifest in self.manifests.values():
+                manifest.close()
+            self.manifests.clear()
+
+    def manifest_for(self, images_root):
+        images_root = Path(images_root).absolute()
+        with self.manifests_lock:
+            if images_root not in self.manifests:
+                self.manifests[images_root] = ImageManifest(images_root)
+            return self.manifests[images_root]
+
+    def download(self, url, manifest):
+        """
+        Tải một ảnh vào kho object của manifest (stream từng chunk vào file tạm, vừa tải vừa tính sha256)
+        Return: đường dẫn object
+        """
+        tmp_path = manifest.objects_dir / f"{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        start_time = time.monotonic()
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                observe("net_image_ttfb", response.elapsed.total_seconds())
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if time.monotonic() - start_time > self.max_duration:
+                            raise ImageDownloadTimeout(f"quá {self.max_duration}s")
+                        digest.update(chunk)
+                        f.write(chunk)
+            return manifest.store(url, tmp_path, digest.hexdigest())
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def save_image(self, url, img_path):
+        """
+        Lưu ảnh của URL vào img_path (hardlink từ kho object)
+        Return: (img_path, cached) - cached=True nếu không phải tải qua mạng
+        """
+        img_path = Path(img_path)
+        manifest = self.manifest_for(img_path.parent.parent)
+        object_path = manifest.lookup(url)
+        cached = object_path is not None
+        if object_path is None and img_path.is_file() and img_path.stat().st_size > 0:
+            # Ảnh tải từ trước khi có manifest
+            object_path = manifest.adopt(url, img_path)
+            cached = True
+        if object_path is None:
+            with span("image_download"):
+                object_path = self.download(url, manifest)
+        if not (img_path.exists() and img_path.samefile(object_path)):
+            link_file(object_path, img_path)
+        return img_path, cached
+
+    def download_all(self, image_urls, folder_name, search_value):
+        """
+        Tải toàn bộ ảnh của một record (folder_name = Images/<số đơn>), tối đa per_record ảnh cùng lúc
+        Return: danh sách đường dẫn ảnh tải thành công (theo thứ tự ảnh trên trang)
+        """
+        total_images = len(image_urls)
+        slots = threading.BoundedSemaphore(self.per_record)
+        futures = []
+        for idx, img_url in enumerate(image_urls, start=1):
+            if not img_url:
+                continue
+            img_name = f"{search_value.replace('/', '_')}_{idx}.jpg"
+            slots.acquire()
+            future = self.executor.submit(self.save_image, img_url, Path(folder_name) / img_name)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append((idx, img_name, future))
+
+        image_paths = []
+        for idx, img_name, future in futures:
+            try:
+                img_path, cached = future.result()
+                image_paths.append(str(img_path))
+                logger.debug("  ✓ Ảnh %s/%s: %s%s", idx, total_images, img_name, " (đã có)" if cached else "")
+            except Exception as e:
+                logger.error(f"  ✗ Lỗi tải ảnh {idx}/{total_images}: {e}")
+        return image_paths
+
+
+_shared_downloader = None
+_shared_lock = threading.Lock()
+
+
+def get_image_downloader():
+    """ImageDownloader dùng chung cho cả process (mọi crawler/worker chia một pool kết nối)"""
+    global _shared_downloader
+    with _shared_lock:
+        if _shared_downloader is None:
+            _shared_downloader = ImageDownloader()
+            atexit.register(close_image_downloader)
+        return _shared_downloader
+
+
+def close_image_downloader():
+    """Đóng ImageDownloader dùng chung (nếu đã tạo) - lần gọi get_image_downloader sau tạo bản mới"""
+    global _shared_downloader
+    with _shared_lock:
+        downloader, _shared_downloader = _shared_downloader, None
+    if downloader is not None:
+        atexit.unregister(close_image_downloader)
+        downloader.close()
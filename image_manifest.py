@@ -0,0 +1,120 @@
+"""
+Manifest ảnh + kho ảnh theo nội dung (content-addressed) trong thư mục Images
+- Manifest (SQLite) ghi URL -> (sha256, size): ảnh đã tải thì lần chạy sau / lần retry
+  bỏ qua luôn, không gọi mạng
+- Mỗi ảnh chỉ lưu một lần trong Images/_objects/<2 ký tự đầu sha>/<sha>.jpg, file trong
+  thư mục từng số đơn là hardlink tới object (copy nếu hệ thống file không hỗ trợ hardlink)
+  nên các đơn liên quan dùng chung bản vẽ không tốn thêm dung lượng
+"""
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "images_manifest.sqlite"
+OBJECTS_DIR = "_objects"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_file(source, target):
+    """Hardlink source -> target (thay file cũ nếu có), copy khi không hardlink được"""
+    target = Path(target)
+    tmp_path = target.with_name(target.name + ".link")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+class ImageManifest:
+    def __init__(self, images_root):
+        self.root = Path(images_root)
+        self.objects_dir = self.root / OBJECTS_DIR
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.root / MANIFEST_NAME), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def object_path(self, sha256):
+        return self.objects_dir / sha256[:2] / f"{sha256}.jpg"
+
+    def lookup(self, url):
+        """Object đã lưu của URL, None nếu chưa có trong manifest hoặc object bị mất/hỏng"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT sha256, size FROM images WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        object_path = self.object_path(row[0])
+        try:
+            if object_path.stat().st_size == row[1]:
+                return object_path
+        except FileNotFoundError:
+            pass
+        return None
+
+    def record(self, url, sha256, size):
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO images (url, sha256, size, fetched_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET sha256 = excluded.sha256, size = excluded.size,
+                    fetched_at = excluded.fetched_at
+                """,
+                (url, sha256, size, time.time()),
+            )
+            self.conn.commit()
+
+    def store(self, url, tmp_path, sha256):
+        """Đưa file tạm đã tải (sha256 đã tính) vào kho object, trùng nội dung thì bỏ file tạm"""
+        object_path = self.object_path(sha256)
+        object_path.parent.mkdir(exist_ok=True)
+        if object_path.exists():
+            Path(tmp_path).unlink()
+        else:
+            os.replace(tmp_path, object_path)
+        self.record(url, sha256, object_path.stat().st_size)
+        return object_path
+
+    def adopt(self, url, img_path):
+        """Đưa ảnh tải từ trước khi có manifest vào kho object (không tải lại)"""
+        sha256 = file_sha256(img_path)
+        object_path = self.object_path(sha256)
+        object_path.parent.mkdir(exist_ok=True)
+        if not object_path.exists():
+            link_file(img_path, object_path)
+        self.record(url, sha256, object_path.stat().st_size)
+        return object_path
@@ -0,0 +1,170 @@
+"""
+Cấu hình logging cho các script crawl (thay cho logging.basicConfig trong từng module)
+- Thread crawl chỉ đưa LogRecord vào hàng đợi (QueueHandler, không format); một thread
+  QueueListener format và ghi console / file - lời gọi log không chờ I/O và các dòng
+  của nhiều worker không chen vào nhau
+- Console: dòng chữ như trước, thêm [số đơn] khi log trong record_context()
+- json_path: thêm file JSON-lines, mỗi dòng một object
+  {ts, level, logger, thread, record_id, msg, exc?, ...extra}
+- record_context(số đơn): correlation ID cho mọi dòng log của số đơn trong thread đó
+  và ngân sách log: quá record_budget dòng INFO/DEBUG thì bỏ bớt, cuối record log số
+  dòng đã bỏ; WARNING trở lên luôn được ghi
+Mức mặc định INFO: các bước lặp trong hot path (F5, click, từng ảnh...) log ở DEBUG,
+dùng --log-level DEBUG khi cần xem chi tiết.
+Ví dụ:
+    setup_logging("INFO", json_path="Output_Designs/crawl.log.jsonl", record_budget=20)
+    with record_context("3-2019-01234"):
+        logger.debug("F5 lần %d/%d", attempt, max_attempts)
+"""
+import atexit
+import contextvars
+import json
+import logging
+import queue
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CONSOLE_FORMAT = "%(asctime)s - %(levelname)s - %(record_tag)s%(message)s"
+# Số dòng INFO/DEBUG tối đa mỗi số đơn (0: không giới hạn)
+DEFAULT_RECORD_BUDGET = 20
+# Thư viện log mỗi lệnh WebDriver / request HTTP ở DEBUG - không bao giờ xuống dưới INFO
+NOISY_LOGGERS = ("selenium", "urllib3", "PIL", "WDM")
+# Thuộc tính có sẵn của LogRecord - phần còn lại (extra=...) được ghi vào JSON
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+    "record_id",
+    "record_tag",
+}
+
+_current_record = contextvars.ContextVar("log_record_state", default=None)
+_listener = None
+_record_budget = DEFAULT_RECORD_BUDGET
+
+
+class RecordLogState:
+    """Số đơn đang xử lý trong thread hiện tại + số dòng đã ghi / đã bỏ"""
+
+    def __init__(self, record_id, budget):
+        self.record_id = str(record_id)
+        self.budget = budget
+        self.emitted = 0
+        self.suppressed = 0
+        self.closed = False
+
+
+class RecordContextFilter(logging.Filter):
+    """Gắn record_id vào mọi dòng log và áp ngân sách log theo số đơn (chạy trong thread gọi log)"""
+
+    def filter(self, record):
+        state = _current_record.get()
+        if state is None:
+            record.record_id = None
+            record.record_tag = ""
+            return True
+        record.record_id = state.record_id
+        record.record_tag = f"[{state.record_id}] "
+        if record.levelno >= logging.WARNING or state.closed or not state.budget:
+            return True
+        if state.emitted >= state.budget:
+            state.suppressed += 1
+            return False
+        state.emitted += 1
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler không format trước khi đưa vào hàng đợi: hàng đợi nằm trong cùng process
+    nên LogRecord không cần pickle, msg % args được tính ở thread listener
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "record_id": getattr(record, "record_id", None),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level="INFO", json_path=None, record_budget=DEFAULT_RECORD_BUDGET):
+    """
+    Cấu hình root logger (gọi một lần ở đầu script; gọi lại thì thay cấu hình cũ)
+    Return: QueueListener (đã start, tự stop khi thoát process)
+    """
+    global _listener, _record_budget
+    stop_logging()
+    level = logging.getLevelName(level) if isinstance(level, str) else level
+    _record_budget = record_budget
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    handlers = [console]
+    if json_path:
+        Path(json_path).parent.mkdir(parents=True, exist_ok=True)
+        json_handler = logging.FileHandler(json_path, encoding="utf-8")
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+
+    queue_handler = LazyQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RecordContextFilter())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(max(level, logging.INFO))
+
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Ghi nốt các dòng log còn trong hàng đợi và dừng thread listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+@contextmanager
+def record_context(record_id, budget=None):
+    """Mọi dòng log trong khối (cùng thread) mang record_id và tính vào ngân sách của số đơn"""
+    state = RecordLogState(record_id, _record_budget if budget is None else budget)
+    token = _current_record.set(state)
+    try:
+        yield state
+    finally:
+        state.closed = True
+        if state.suppressed:
+            logger.info(
+                "🔇 Đã bỏ %d dòng log (ngân sách %d dòng/số đơn, --log-budget 0 để xem đủ)",
+                state.suppressed,
+                state.budget,
+            )
+        _current_record.reset(token)
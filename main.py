@@ -1,15 +1,27 @@
 import pandas as pd
 from crawler import Crawler
+from crawl_ledger import CrawlLedger
+from parse_pool import ParsePool
+from html_archive import open_archive
+from image_downloader import close_image_downloader
+from metrics import MetricsExporter, get_metrics
+from webdriver_profiler import log_run_summary
+from status_dashboard import StatusDashboard
+from log_config import setup_logging
+from profiling import HotPathProfiler, install_profiler
+from record_store import open_store
+from worker_pool import ResultCollector, worker_profile_dir
+from cli_common import make_runner, parse_args
 import logging
 from tqdm import tqdm
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 
 def main():
+    args = parse_args("Crawl kiểu dáng công nghiệp - NOIP", "Output_Designs")
+    setup_logging(args.log_level, args.log_json, args.log_budget)
+
     # Banner khởi động
     logger.info("=" * 100)
     logger.info("🚀 KHỞI ĐỘNG CHƯƠNG TRÌNH CRAWL KIỂU DÁNG CÔNG NGHIỆP - NOIP VIETNAM")
@@ -23,11 +35,14 @@ def main():
     logger.info(f"   • ChromeDriver: {driver_path}")
     logger.info(f"   • File input: {excel_path}")
     logger.info(f"   • Restart interval: {restart_interval} lần tìm kiếm")
+    logger.info(f"   • Số worker: {args.workers}")
+    logger.info(f"   • Profile tải trang: {args.page_profile}")
     logger.info(f"   • Loại crawl: DESIGNS (Kiểu dáng công nghiệp)")
     logger.info("")
     logger.info(f"📂 CẤU TRÚC THƯ MỤC OUTPUT:")
     logger.info(f"   Output_Designs/")
-    logger.info(f"   ├── designs_data.xlsx          (File Excel chứa dữ liệu)")
+    logger.info(f"   ├── records.sqlite             (Kho bản ghi, thêm từng record)")
+    logger.info(f"   ├── designs_data.xlsx          (File Excel - xuất bằng export_excel.py)")
     logger.info(f"   ├── Images/                    (Thư mục ảnh kiểu dáng)")
     logger.info(f"   │   ├── [Số đơn 1]/")
     logger.info(f"   │   ├── [Số đơn 2]/")
@@ -38,7 +53,41 @@ def main():
     logger.info(f"       └── phase_3_other/")
     logger.info("")
 
-    crawler = Crawler(driver_path, excel_path, restart_interval)
+    store = open_store("Output_Designs", "Output_Designs/designs_data.xlsx")
+    # Parse HTML trang chi tiết bằng process pool, driver chuyển ngay sang số đơn kế tiếp
+    parse_pool = ParsePool(args.parse_workers) if args.parse_workers > 0 else None
+    # HTML thô của mọi trang chi tiết (chạy lại trích xuất bằng reparse.py)
+    archive = open_archive("Output_Designs")
+    # Histogram thời gian từng pha (điều hướng, captcha, parse, ảnh, ghi) - ghi file định kỳ
+    metrics_exporter = MetricsExporter(
+        get_metrics(), args.metrics_out or "Output_Designs/metrics.json", args.metrics_interval
+    ).start()
+    # Tốc độ / ETA / lỗi theo nhóm - log định kỳ và qua HTTP nếu có --status-port
+    dashboard = StatusDashboard(interval=args.status_interval, port=args.status_port).start()
+    # --profile / --profile-memory: cProfile các section được chọn + tracemalloc mỗi N record
+    profiler = None
+    if args.profile or args.profile_memory:
+        profiler = HotPathProfiler(
+            args.profile_dir or "Output_Designs/profile", args.profile, args.profile_every, args.profile_memory
+        )
+        install_profiler(profiler.start())
+
+    def crawler_factory(worker_id):
+        return Crawler(
+            driver_path,
+            excel_path,
+            restart_interval,
+            profile_dir=worker_profile_dir("selenium_chrome_profile", worker_id),
+            store=store,
+            page_profile=args.page_profile,
+            load_images=args.load_images,
+            parse_pool=parse_pool,
+            archive=archive,
+            network_timing=args.network_timing,
+        )
+
+    ledger = CrawlLedger(store)
+    collector = ResultCollector(store, ledger)
 
     try:
         sheet_name = 0
@@ -50,13 +99,12 @@ def main():
         logger.info(f"   • Cột số đơn: {column_name}")
         logger.info(f"   • Tổng số dòng trong file: {len(data)}")
 
-        start_index = 0
-        if crawler.last_so_don:
-            start_index = data[data[column_name] == crawler.last_so_don].index[0] + 1
-            logger.info(f"   • Tiếp tục từ số đơn: {crawler.last_so_don}")
-            logger.info(f"   • Bắt đầu từ dòng: {start_index + 1}")
+        # Auto-resume: chỉ crawl các số đơn còn pending (hoặc failed còn lượt thử) trong ledger
+        ledger.add_pending(data[column_name].dropna().astype(str).tolist())
+        search_values = ledger.select_pending()
+        logger.info(f"   • Trạng thái ledger: {ledger.summary()}")
 
-        total_searches = len(data) - start_index
+        total_searches = len(search_values)
         logger.info(f"   • Số đơn cần crawl: {total_searches}")
         logger.info("")
         logger.info("=" * 100)
@@ -67,25 +115,35 @@ def main():
         with tqdm(
             total=total_searches, desc="⏳ Tiến trình crawl", unit=" đơn"
         ) as pbar:
-            for index in range(start_index, len(data)):
-                row = data.iloc[index]
-                search_value = row[column_name]
-                logger.info(f"📌 Đơn {index + 1 - start_index}/{total_searches}")
-                crawler.process_search(search_value)
-                pbar.update(1)
+            collector.on_result = lambda search_value, row_data: pbar.update(1)
+            pool = make_runner(args, crawler_factory, "process_search", collector, parse_pool)
+            pool.run(search_values)
 
     finally:
+        # Mỗi worker tự đóng trình duyệt của mình khi hết việc
         logger.info("")
         logger.info("=" * 100)
-        logger.info("🏁 ĐÓNG TRÌNH DUYỆT")
+        logger.info("🏁 ĐÃ ĐÓNG TẤT CẢ TRÌNH DUYỆT")
         logger.info("=" * 100)
-        crawler.close_driver()
+        if parse_pool:
+            parse_pool.close()
+        metrics_exporter.stop()
+        dashboard.stop()
+        if profiler:
+            profiler.close()
+        log_run_summary()
+        # Chờ ảnh đang tải và ghi manifest ảnh trước khi đóng kho
+        close_image_downloader()
+        archive.close()
+        ledger.close()
+        store.close()
 
     logger.info("")
     logger.info("=" * 100)
     logger.info("✅ HOÀN TẤT! Quá trình crawl đã kết thúc.")
     logger.info(f"📁 KIỂM TRA KẾT QUẢ TẠI THỦ MỤC: Output_Designs/")
-    logger.info(f"   • File Excel dữ liệu: Output_Designs/designs_data.xlsx")
+    logger.info(f"   • Kho bản ghi: Output_Designs/records.sqlite")
+    logger.info(f"   • Xuất Excel: python export_excel.py Output_Designs")
     logger.info(f"   • Thư mục ảnh kiểu dáng: Output_Designs/Images/")
     logger.info(f"   • Screenshot lỗi (nếu có): Output_Designs/Errors/")
     logger.info(f"     - phase_1_exception: Lỗi exception chung")
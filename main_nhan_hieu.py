@@ -4,16 +4,27 @@ Main script để crawl Nhãn hiệu từ file Excel
 import pandas as pd
 from pathlib import Path
 from crawler_nhan_hieu import TrademarkCrawler
+from crawl_ledger import CrawlLedger
+from parse_pool import ParsePool
+from html_archive import open_archive
+from image_downloader import close_image_downloader
+from metrics import MetricsExporter, get_metrics
+from webdriver_profiler import log_run_summary
+from status_dashboard import StatusDashboard
+from log_config import setup_logging
+from profiling import HotPathProfiler, install_profiler
+from record_store import open_store
+from worker_pool import ResultCollector, worker_profile_dir
+from cli_common import make_runner, parse_args
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
 def main():
+    args = parse_args("Crawl nhãn hiệu bằng direct URL - NOIP", "Output_Trademarks_Direct")
+    setup_logging(args.log_level, args.log_json, args.log_budget)
+
     # Cấu hình
     driver_path = "chromedriver-win64/chromedriver.exe"
     excel_path = "data_kdcn_bo_sung.xlsx"  # File Excel chứa danh sách số đơn
@@ -25,23 +36,62 @@ def main():
     try:
         # Đọc file Excel
         df = pd.read_excel(excel_path)
-        filing_numbers = df['filing_number'].tolist()
+        input_numbers = df['filing_number'].dropna().astype(str).tolist()
+
+        # Auto-resume: chỉ crawl các số đơn còn pending (hoặc failed còn lượt thử) trong ledger
+        store = open_store("Output_Trademarks_Direct", "Output_Trademarks_Direct/trademarks_data.xlsx")
+        ledger = CrawlLedger(store)
+        ledger.add_pending(input_numbers)
+        filing_numbers = ledger.select_pending()
 
-        logger.info(f"📋 Tổng số đơn cần crawl: {len(filing_numbers)}")
+        logger.info(f"📋 Tổng số đơn trong file: {len(input_numbers)}")
+        logger.info(f"📍 Trạng thái ledger: {ledger.summary()}")
+        logger.info(f"📋 Số đơn cần crawl: {len(filing_numbers)}")
+        logger.info(f"👷 Số worker: {args.workers}")
+        logger.info(f"🪶 Profile tải trang: {args.page_profile}")
         logger.info("")
 
-        # Khởi tạo crawler
-        crawler = TrademarkCrawler(driver_path, excel_path)
+        # Crawl song song, mọi kết quả đi về một collector ghi RecordStore
+        # Parse HTML trang chi tiết bằng process pool, driver chuyển ngay sang số đơn kế tiếp
+        parse_pool = ParsePool(args.parse_workers) if args.parse_workers > 0 else None
+        # HTML thô của mọi trang chi tiết (chạy lại trích xuất bằng reparse.py)
+        archive = open_archive("Output_Trademarks_Direct")
+        # Histogram thời gian từng pha (điều hướng, captcha, parse, ảnh, ghi) - ghi file định kỳ
+        metrics_exporter = MetricsExporter(
+            get_metrics(), args.metrics_out or "Output_Trademarks_Direct/metrics.json", args.metrics_interval
+        ).start()
+        # Tốc độ / ETA / lỗi theo nhóm - log định kỳ và qua HTTP nếu có --status-port
+        dashboard = StatusDashboard(interval=args.status_interval, port=args.status_port).start()
+        # --profile / --profile-memory: cProfile các section được chọn + tracemalloc mỗi N record
+        profiler = None
+        if args.profile or args.profile_memory:
+            profiler = HotPathProfiler(
+                args.profile_dir or "Output_Trademarks_Direct/profile", args.profile, args.profile_every, args.profile_memory
+            )
+            install_profiler(profiler.start())
+
+        def crawler_factory(worker_id):
+            return TrademarkCrawler(
+                driver_path,
+                excel_path,
+                profile_dir=worker_profile_dir("selenium_chrome_profile", worker_id),
+                store=store,
+                page_profile=args.page_profile,
+                load_images=args.load_images,
+                parse_pool=parse_pool,
+                archive=archive,
+                network_timing=args.network_timing,
+            )
 
-        # Crawl từng số đơn (data sẽ tự động save sau mỗi số đơn)
-        for idx, filing_number in enumerate(filing_numbers, start=1):
-            logger.info(f"📌 [{idx}/{len(filing_numbers)}] Đang xử lý: {filing_number}")
-            crawler.process_trademark(filing_number)
+        collector = ResultCollector(store, ledger)
+        pool = make_runner(args, crawler_factory, "process_trademark", collector, parse_pool)
+        pool.run(filing_numbers)
 
         logger.info("")
         logger.info("=" * 80)
         logger.info("✅ HOÀN THÀNH TẤT CẢ!")
-        logger.info(f"💾 File Excel: {crawler.excel_file_path}")
+        logger.info(f"💾 Kho bản ghi: {store.db_path}")
+        logger.info("📤 Xuất Excel: python export_excel.py Output_Trademarks_Direct")
         logger.info("=" * 80)
 
     except Exception as e:
@@ -50,8 +100,23 @@ def main():
         traceback.print_exc()
 
     finally:
-        if 'crawler' in locals():
-            crawler.close_driver()
+        if locals().get('parse_pool'):
+            parse_pool.close()
+        if 'metrics_exporter' in locals():
+            metrics_exporter.stop()
+        if 'dashboard' in locals():
+            dashboard.stop()
+        if locals().get('profiler'):
+            profiler.close()
+        log_run_summary()
+        # Chờ ảnh đang tải và ghi manifest ảnh trước khi đóng kho
+        close_image_downloader()
+        if 'archive' in locals():
+            archive.close()
+        if 'ledger' in locals():
+            ledger.close()
+        if 'store' in locals():
+            store.close()
 
 
 if __name__ == "__main__":
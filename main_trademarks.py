@@ -1,6 +1,18 @@
 import pandas as pd
 from pathlib import Path
 from crawler_trademarks import DesignCrawler
+from crawl_ledger import CrawlLedger
+from parse_pool import ParsePool
+from html_archive import open_archive
+from image_downloader import close_image_downloader
+from metrics import MetricsExporter, get_metrics
+from webdriver_profiler import log_run_summary
+from status_dashboard import StatusDashboard
+from log_config import setup_logging
+from profiling import HotPathProfiler, install_profiler
+from record_store import open_store
+from worker_pool import ResultCollector, worker_profile_dir
+from cli_common import make_runner, parse_args
 
 def print_banner():
     banner = """
@@ -13,6 +25,8 @@ def print_banner():
     print(banner)
 
 def main():
+    args = parse_args("Crawl designs bằng direct URL - NOIP", "Output_Designs_Direct")
+    setup_logging(args.log_level, args.log_json, args.log_budget)
     print_banner()
 
     # Cấu hình
@@ -25,26 +39,16 @@ def main():
     print(f"   - Input Excel: {excel_path}")
     print(f"   - Column: {column_name}")
     print(f"   - Output Folder: Output_Designs_Direct/")
+    print(f"   - Workers: {args.workers}")
+    print(f"   - Page profile: {args.page_profile}")
     print()
 
-    # Khởi tạo crawler
-    crawler = DesignCrawler(driver_path, excel_path)
-
     # Đọc danh sách filing numbers từ Excel
     try:
         if Path(excel_path).exists():
             df = pd.read_excel(excel_path)
-
-            # Lọc ra các filing number chưa crawl (nếu có last_so_don)
-            if crawler.last_so_don:
-                print(f"📍 Tiếp tục từ số công bố cuối: {crawler.last_so_don}")
-                # Tìm index của last_so_don trong df (giả sử có cột filing_number)
-                # Nếu muốn auto-resume, có thể check trong existing_data
-                filing_numbers = df[column_name].tolist()
-            else:
-                filing_numbers = df[column_name].tolist()
-
-            print(f"📋 Đã đọc {len(filing_numbers)} số đơn designs từ file Excel")
+            input_numbers = df[column_name].dropna().astype(str).tolist()
+            print(f"📋 Đã đọc {len(input_numbers)} số đơn designs từ file Excel")
         else:
             print(f"❌ Không tìm thấy file {excel_path}")
             print(f"Vui lòng tạo file Excel với cột '{column_name}' chứa các số đơn cần crawl")
@@ -54,17 +58,73 @@ def main():
         print(f"❌ Lỗi khi đọc file Excel: {e}")
         return
 
+    # Auto-resume: chỉ crawl các số đơn còn pending (hoặc failed còn lượt thử) trong ledger
+    store = open_store("Output_Designs_Direct", "Output_Designs_Direct/designs_data.xlsx")
+    ledger = CrawlLedger(store)
+    ledger.add_pending(input_numbers)
+    filing_numbers = ledger.select_pending()
+    print(f"📍 Trạng thái ledger: {ledger.summary()}")
+    print(f"📋 Số đơn cần crawl: {len(filing_numbers)}")
+
     print()
     print("🚀 BẮT ĐẦU CRAWL...")
     print("=" * 80)
     print()
 
-    # Chạy crawler
-    crawler.run(filing_numbers)
+    # Chạy pool crawler (mỗi worker một Chrome với profile riêng)
+    # Parse HTML trang chi tiết bằng process pool, driver chuyển ngay sang số đơn kế tiếp
+    parse_pool = ParsePool(args.parse_workers) if args.parse_workers > 0 else None
+    # HTML thô của mọi trang chi tiết (chạy lại trích xuất bằng reparse.py)
+    archive = open_archive("Output_Designs_Direct")
+    # Histogram thời gian từng pha (điều hướng, captcha, parse, ảnh, ghi) - ghi file định kỳ
+    metrics_exporter = MetricsExporter(
+        get_metrics(), args.metrics_out or "Output_Designs_Direct/metrics.json", args.metrics_interval
+    ).start()
+    # Tốc độ / ETA / lỗi theo nhóm - log định kỳ và qua HTTP nếu có --status-port
+    dashboard = StatusDashboard(interval=args.status_interval, port=args.status_port).start()
+    # --profile / --profile-memory: cProfile các section được chọn + tracemalloc mỗi N record
+    profiler = None
+    if args.profile or args.profile_memory:
+        profiler = HotPathProfiler(
+            args.profile_dir or "Output_Designs_Direct/profile", args.profile, args.profile_every, args.profile_memory
+        )
+        install_profiler(profiler.start())
+
+    def crawler_factory(worker_id):
+        return DesignCrawler(
+            driver_path,
+            excel_path,
+            profile_dir=worker_profile_dir("selenium_chrome_profile", worker_id),
+            store=store,
+            page_profile=args.page_profile,
+            load_images=args.load_images,
+            parse_pool=parse_pool,
+            archive=archive,
+            network_timing=args.network_timing,
+        )
+
+    collector = ResultCollector(store, ledger)
+    pool = make_runner(args, crawler_factory, "process_design", collector, parse_pool)
+    try:
+        pool.run(filing_numbers)
+    finally:
+        if parse_pool:
+            parse_pool.close()
+        metrics_exporter.stop()
+        dashboard.stop()
+        if profiler:
+            profiler.close()
+        log_run_summary()
+        # Chờ ảnh đang tải và ghi manifest ảnh trước khi đóng kho
+        close_image_downloader()
+        archive.close()
+        ledger.close()
+        store.close()
 
     print()
     print("✅ HOÀN THÀNH!")
-    print(f"📊 Kết quả đã lưu tại: Output_Designs_Direct/designs_data.xlsx")
+    print(f"📊 Kết quả đã lưu tại: Output_Designs_Direct/records.sqlite")
+    print(f"📤 Xuất Excel: python export_excel.py Output_Designs_Direct")
     print(f"🖼️  Ảnh đã lưu tại: Output_Designs_Direct/Images/")
     print(f"❌ Lỗi (nếu có) tại: Output_Designs_Direct/Errors/")
     print()
@@ -0,0 +1,365 @@
+"""
+Đo thời gian từng pha crawl (span) và gom vào histogram
+Mỗi pha - điều hướng driver, vượt trang cảnh báo, vòng F5, chờ captcha, chờ trang chi
+tiết, parse, tải từng ảnh, ghi RecordStore - là một histogram (bucket cố định, giống
+Prometheus). Các span có thể lồng nhau (refresh_loop chứa navigate, record chứa tất cả),
+mỗi pha được cộng riêng, không trừ thời gian của pha con.
+Ngoài histogram còn có counter (số record theo kết quả, số lần restart driver...),
+gauge (số worker đang chạy, tổng số đơn cần crawl) và RateMeter (số sự kiện theo từng
+giây trong một giờ gần nhất - tốc độ record/phút theo cửa sổ trượt) cho status_dashboard.py.
+Xuất ra file Prometheus text (*.prom - dùng được với textfile collector của
+node_exporter) hoặc JSON, ghi định kỳ bằng MetricsExporter.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from profiling import section as profile_section
+
+logger = logging.getLogger(__name__)
+
+# Tên pha (thứ tự khi xuất)
+PHASES = (
+    "record",  # cả một số đơn: fetch -> parse -> ảnh -> ghi
+    "http_fetch",  # GET trang chi tiết bằng requests (không qua Chrome)
+    "navigate",  # driver.get()/refresh() - chờ trình duyệt tải xong trang
+    "interstitial",  # vượt trang cảnh báo bảo mật
+    "search",  # nhập số đơn + click kết quả (Crawler tìm kiếm)
+    "refresh_loop",  # vòng F5 chờ captcha hoặc trang chi tiết
+    "challenge",  # xử lý reCAPTCHA + nút Next
+    "detail_wait",  # chờ detail-container xuất hiện
+    "harvest",  # execute_script lấy HTML + URL ảnh
+    "parse",  # HTML -> row_data (parse pool: tính cả thời gian chờ trong hàng đợi)
+    "image_download",  # tải một ảnh qua mạng (ảnh đã có trong manifest không tính)
+    "persist",  # RecordStore.save
+    # Thời gian mạng (network_timing.py qua CDP, hoặc response.elapsed của requests)
+    "net_document_ttfb",  # trang chi tiết: gửi request -> nhận header (server NOIP)
+    "net_document_total",  # trang chi tiết: tới khi nhận xong dữ liệu
+    "net_image_ttfb",
+    "net_image_total",
+)
+
+# Biên trên các bucket (giây)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+METRIC_NAME = "noip_crawl_phase_seconds"
+ERRORS_METRIC_NAME = "noip_crawl_phase_errors_total"
+# Tiền tố tên counter / gauge khi xuất Prometheus
+METRIC_PREFIX = "noip_crawl"
+# RateMeter giữ số sự kiện từng giây trong bấy nhiêu giây gần nhất
+RATE_HORIZON = 3600
+# Cửa sổ tốc độ khi xuất (nhãn -> giây)
+RATE_WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+
+
+def format_labels(labels):
+    """(("outcome", "success"),) -> 'outcome="success"'"""
+    return ",".join(f'{key}="{value}"' for key, value in labels)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # Số quan sát rơi vào từng bucket (phần tử cuối: > bucket lớn nhất)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Ước lượng phân vị từ bucket (nội suy tuyến tính trong bucket chứa phân vị)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets + (self.max,), self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = bound
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "sum_seconds": self.sum,
+            "mean_seconds": self.sum / self.count if self.count else None,
+            "p50_seconds": self.quantile(0.50),
+            "p95_seconds": self.quantile(0.95),
+            "p99_seconds": self.quantile(0.99),
+            "max_seconds": self.max,
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+        }
+
+
+class RateMeter:
+    """Đếm sự kiện theo từng giây (tối đa horizon giây gần nhất) để tính tốc độ theo cửa sổ trượt"""
+
+    def __init__(self, horizon=RATE_HORIZON):
+        self.horizon = horizon
+        # [giây, số sự kiện] theo thứ tự thời gian
+        self.seconds = deque()
+        self.total = 0
+
+    def mark(self, count=1, now=None):
+        second = int(now if now is not None else time.time())
+        if self.seconds and self.seconds[-1][0] == second:
+            self.seconds[-1][1] += count
+        else:
+            self.seconds.append([second, count])
+        self.total += count
+        while self.seconds and self.seconds[0][0] <= second - self.horizon:
+            self.seconds.popleft()
+
+    def count_since(self, window, now=None):
+        """Số sự kiện trong window giây gần nhất"""
+        cutoff = (now if now is not None else time.time()) - window
+        return sum(count for second, count in self.seconds if second > cutoff)
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms = {}
+        # (tên, ((nhãn, giá trị), ...)) -> số đếm
+        self.counters = {}
+        self.gauges = {}
+        self.meters = {}
+        self.started_at = time.time()
+
+    def _histogram(self, phase):
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = Histogram(self.buckets)
+        return histogram
+
+    def observe(self, phase, seconds, error=False):
+        with self.lock:
+            histogram = self._histogram(phase)
+            histogram.observe(seconds)
+            if error:
+                histogram.errors += 1
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def counter_values(self, name):
+        """{((nhãn, giá trị), ...): số đếm} của một counter"""
+        with self.lock:
+            return {labels: value for (counter_name, labels), value in self.counters.items() if counter_name == name}
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def add_gauge(self, name, delta):
+        with self.lock:
+            self.gauges[name] = self.gauges.get(name, 0) + delta
+
+    def gauge(self, name, default=0):
+        with self.lock:
+            return self.gauges.get(name, default)
+
+    def mark(self, name, count=1):
+        """Ghi sự kiện vào RateMeter (tốc độ theo cửa sổ trượt)"""
+        with self.lock:
+            meter = self.meters.get(name)
+            if meter is None:
+                meter = self.meters[name] = RateMeter()
+            meter.mark(count)
+
+    def rate_per_minute(self, name, window):
+        """Số sự kiện/phút trong window giây gần nhất (chưa chạy đủ window thì chia theo thời gian đã chạy)"""
+        now = time.time()
+        with self.lock:
+            meter = self.meters.get(name)
+            count = meter.count_since(window, now) if meter else 0
+        elapsed = max(1.0, min(window, now - self.started_at))
+        return count * 60 / elapsed
+
+    @contextmanager
+    def span(self, phase):
+        """Đo thời gian khối lệnh vào histogram của pha (exception vẫn được ghi, tính là lỗi)"""
+        start_time = time.perf_counter()
+        error = False
+        try:
+            with profile_section(phase):
+                yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(phase, time.perf_counter() - start_time, error)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+            self.meters.clear()
+            self.started_at = time.time()
+
+    def _ordered(self):
+        order = {phase: i for i, phase in enumerate(PHASES)}
+        return sorted(self.histograms.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))
+
+    def to_dict(self):
+        rates = {
+            name: {label: self.rate_per_minute(name, window) for label, window in RATE_WINDOWS.items()}
+            for name in list(self.meters)
+        }
+        with self.lock:
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, {})[format_labels(labels)] = value
+            return {
+                "started_at": self.started_at,
+                "exported_at": time.time(),
+                "phases": {phase: histogram.snapshot() for phase, histogram in self._ordered()},
+                "counters": counters,
+                "gauges": dict(self.gauges),
+                "rates_per_minute": rates,
+            }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (bucket cộng dồn, le="+Inf")"""
+        lines = [
+            f"# HELP {METRIC_NAME} Thời gian từng pha crawl NOIP",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        extra_lines = [
+            f"# HELP {ERRORS_METRIC_NAME} Số span kết thúc bằng exception",
+            f"# TYPE {ERRORS_METRIC_NAME} counter",
+        ]
+        with self.lock:
+            for phase, histogram in self._ordered():
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{METRIC_NAME}_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{phase="{phase}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{METRIC_NAME}_sum{{phase="{phase}"}} {histogram.sum:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{phase="{phase}"}} {histogram.count}')
+                extra_lines.append(f'{ERRORS_METRIC_NAME}{{phase="{phase}"}} {histogram.errors}')
+            for name in sorted({name for name, _ in self.counters}):
+                extra_lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+                for (counter_name, labels), value in sorted(self.counters.items()):
+                    if counter_name == name:
+                        label_text = f"{{{format_labels(labels)}}}" if labels else ""
+                        extra_lines.append(f"{METRIC_PREFIX}_{name}_total{label_text} {value}")
+            for name, value in sorted(self.gauges.items()):
+                extra_lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+                extra_lines.append(f"{METRIC_PREFIX}_{name} {value}")
+        return "\n".join(lines + extra_lines) + "\n"
+
+    def export(self, path):
+        """Ghi ra file (*.prom: Prometheus text, còn lại: JSON) - ghi file tạm rồi os.replace"""
+        path = Path(path)
+        if path.suffix == ".prom":
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.part")
+        tmp_path.write_text(content, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def summary_lines(self):
+        """Bảng tóm tắt để log: số lần, trung bình, p95, tổng thời gian từng pha"""
+        lines = [f"{'pha':<18} {'số lần':>8} {'lỗi':>5} {'TB (s)':>8} {'p95 (s)':>8} {'tổng (s)':>10}"]
+        for phase, data in self.to_dict()["phases"].items():
+            lines.append(
+                f"{phase:<18} {data['count']:>8} {data['errors']:>5} {data['mean_seconds']:8.3f} "
+                f"{data['p95_seconds']:8.3f} {data['sum_seconds']:10.1f}"
+            )
+        return lines
+
+
+class MetricsExporter:
+    """Thread nền ghi metrics ra file mỗi interval giây (và một lần cuối khi stop)"""
+
+    def __init__(self, metrics, path, interval=30):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name="metrics-exporter", daemon=True)
+
+    def _write(self):
+        try:
+            self.metrics.export(self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Không ghi được metrics ra {self.path}: {e}")
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self._write()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self._write()
+        for line in self.metrics.summary_lines():
+            logger.info(f"⏱️  {line}")
+        logger.info(f"📈 Metrics đã ghi ra {self.path}")
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """Metrics dùng chung cho cả process (mọi crawler/worker ghi vào cùng histogram)"""
+    return _metrics
+
+
+def span(phase):
+    """with span("parse"): ... - đo vào Metrics dùng chung"""
+    return _metrics.span(phase)
+
+
+def observe(phase, seconds, error=False):
+    _metrics.observe(phase, seconds, error)
+
+
+def increment(name, amount=1, **labels):
+    _metrics.increment(name, amount, **labels)
+
+
+def add_gauge(name, delta):
+    _metrics.add_gauge(name, delta)
+
+
+def set_gauge(name, value):
+    _metrics.set_gauge(name, value)
+
+
+def mark(name, count=1):
+    _metrics.mark(name, count)
@@ -0,0 +1,334 @@
+"""
+Server NOIP giả lập trên máy local - benchmark crawler không cần đụng site thật
+Phục vụ trang chi tiết designs / trademarks / patents (HTML detail-container trong
+fixtures/detail_pages), trang tìm kiếm Wicket + trang kết quả cho Crawler, ảnh và
+reCAPTCHA giả. Có thể cấu hình độ trễ và tỉ lệ chèn các trạng thái mà crawler đã xử lý:
+lỗi 500, lỗi template ${appltype}, trang cảnh báo bảo mật, trang challenge
+(iframe reCAPTCHA + nút Next) và trang tải chậm.
+
+Số đơn không có trong fixtures được gán một trang cùng loại (cố định theo số đơn),
+nên benchmark dùng được bao nhiêu số đơn cũng được.
+Ví dụ:
+    python mock_noip_server.py --port 8765 --latency 0.05 --server-500 0.05 --challenge 0.02
+    python main_trademarks.py ...  (crawler tạo với base_url="http://127.0.0.1:8765")
+"""
+import argparse
+import html
+import logging
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from log_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "detail_pages"
+IP_TYPES = ["designs", "trademarks", "patents"]
+SEARCH_INPUT_NAME = "advancedInputWrapper:advancedInputsList:1:advancedInputSearchPanel:input"
+# Tham số URL đánh dấu đã qua challenge / cảnh báo - không chèn lỗi nữa
+PASS_PARAM = "mock_pass"
+
+# Trạng thái chèn được (tên tham số dòng lệnh / khóa của MockNoipServer.faults)
+FAULT_SERVER_500 = "server_500"
+FAULT_TEMPLATE_ERROR = "template_error"
+FAULT_INTERSTITIAL = "interstitial"
+FAULT_CHALLENGE = "challenge"
+FAULT_SLOW = "slow"
+FAULTS = [FAULT_SERVER_500, FAULT_TEMPLATE_ERROR, FAULT_INTERSTITIAL, FAULT_CHALLENGE, FAULT_SLOW]
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body>{body}</body></html>
+"""
+
+SERVER_500_BODY = "<h1>Internal Server Error</h1><p>Unexpected RuntimeException</p>"
+
+TEMPLATE_ERROR_BODY = """<div class="container"><div class="row">
+<div class="product-form-label">(21) Số đơn và Ngày nộp đơn</div>
+<div class="product-form-details">${appltype} ${applno}</div>
+</div></div>"""
+
+INTERSTITIAL_BODY = """<div class="interstitial">
+<h1>Your connection to this site is not secure</h1>
+<p>This site doesn't support a secure connection with HTTPS.</p>
+<button id="proceed-button" onclick="location.href='{continue_url}'">Continue to site</button>
+</div>"""
+
+# Bố cục khớp XPath của DesignCrawler.click_next_button (/html/body/div[1]/div/div/form/div[3]/div/input)
+# và các cách tìm nút Next của TrademarkCrawler.handle_recaptcha
+CHALLENGE_BODY = """<div><div><div><form method="get" action="{action}">
+{hidden_inputs}
+<div><p>Vui lòng xác nhận bạn không phải là robot</p></div>
+<div><iframe src="/mock/google.com/recaptcha/api2/anchor" width="304" height="78"></iframe></div>
+<div><div><input type="submit" value="Next"></div></div>
+<div><button type="submit" class="btn btn-primary">Next</button></div>
+</form></div></div></div>"""
+
+RECAPTCHA_ANCHOR_BODY = """<div class="recaptcha-checkbox" role="checkbox">
+<div class="recaptcha-checkbox-border" style="width:24px;height:24px;border:2px solid #c1c1c1"
+     onclick="var box = this.parentNode; box.className += ' recaptcha-checkbox-checked';
+              var mark = document.createElement('div'); mark.className = 'recaptcha-checkbox-checkmark';
+              box.appendChild(mark);"></div>
+</div>"""
+
+SEARCH_BODY = """<form method="get" action="/wopublish-search/public/{ip_type}/results">
+<input type="text" name="{input_name}">
+</form>"""
+
+RESULTS_BODY = """<table class="table"><tr>
+<td>{filing_number}</td>
+<td><a class="fa fa-file-text fa-lg" href="/wopublish-search/public/detail/{ip_type}?id={processed_id}"></a></td>
+</tr></table>"""
+
+# Ảnh JPEG nhỏ nhất hợp lệ (1x1) - đủ cho ImageDownloader
+TINY_JPEG = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f14"
+    "1d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001000101011100"
+    "ffc4001f0000010501010101010100000000000000000102030405060708090a0bffc400b5100002010303020403050504040000"
+    "017d01020300041105122131410613516107227114328191a1082342b1c11552d1f02433627282090a161718191a25262728292a"
+    "3435363738393a434445464748494a535455565758595a636465666768696a737475767778797a838485868788898a9293949596"
+    "9798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2"
+    "f3f4f5f6f7f8f9faffda0008010100003f00fbd3ffd9"
+)
+
+
+def to_processed_id(filing_number):
+    """Giống crawler: bỏ dấu '-' và thêm 'VN' ở đầu"""
+    processed_id = str(filing_number).replace("-", "")
+    if not processed_id.upper().startswith("VN"):
+        processed_id = "VN" + processed_id
+    return processed_id
+
+
+def load_fixtures(fixtures_dir):
+    """{ip_type: [(processed_id, container_html)]} từ các file <loại>_<số đơn>.html"""
+    fixtures = {ip_type: [] for ip_type in IP_TYPES}
+    for path in sorted(Path(fixtures_dir).glob("*.html")):
+        ip_type, _, filing_number = path.stem.partition("_")
+        if ip_type in fixtures:
+            fixtures[ip_type].append((to_processed_id(filing_number), path.read_text(encoding="utf-8")))
+    return fixtures
+
+
+class MockNoipServer:
+    """
+    ThreadingHTTPServer chạy nền; url = gốc URL truyền vào crawler (base_url)
+    faults: {tên trạng thái: xác suất mỗi request trang chi tiết}
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        fixtures_dir=DEFAULT_FIXTURES_DIR,
+        latency=0.0,
+        jitter=0.0,
+        slow_latency=3.0,
+        faults=None,
+        seed=None,
+    ):
+        self.fixtures = load_fixtures(fixtures_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_latency = slow_latency
+        self.faults = {fault: (faults or {}).get(fault, 0.0) for fault in FAULTS}
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.counts_lock = threading.Lock()
+        self.counts = {}
+        handler = type("BoundMockNoipHandler", (MockNoipHandler,), {"mock": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-noip", daemon=True)
+        self.thread.start()
+        logger.info(f"🧪 Mock NOIP đang chạy tại {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count(self, key):
+        with self.counts_lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def pick_fault(self):
+        """Chọn một trạng thái lỗi theo xác suất (None = trang bình thường)"""
+        with self.random_lock:
+            roll = self.random.random()
+        threshold = 0.0
+        for fault in FAULTS:
+            threshold += self.faults[fault]
+            if roll < threshold:
+                return fault
+        return None
+
+    def delay(self):
+        if self.latency or self.jitter:
+            with self.random_lock:
+                extra = self.random.uniform(0, self.jitter) if self.jitter else 0.0
+            time.sleep(self.latency + extra)
+
+    def detail_html(self, ip_type, processed_id):
+        """HTML detail-container cho số đơn (fixture trùng số đơn, không thì chọn cố định theo crc32)"""
+        pages = self.fixtures.get(ip_type)
+        if not pages:
+            return None
+        for fixture_id, container_html in pages:
+            if fixture_id == processed_id:
+                return container_html
+        return pages[zlib.crc32(processed_id.encode("utf-8")) % len(pages)][1]
+
+
+class MockNoipHandler(BaseHTTPRequestHandler):
+    mock = None
+    protocol_version = "HTTP/1.1"
+    # Keep-alive: header và body được gửi bằng hai lần write - không tắt Nagle thì mỗi
+    # request sau request đầu trên cùng kết nối chờ delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(f"mock {self.address_string()} {format % args}")
+
+    def send_page(self, status, title, body):
+        self.send_bytes(status, PAGE_TEMPLATE.format(title=title, body=body).encode("utf-8"), "text/html; charset=utf-8")
+
+    def send_bytes(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split("/") if part]
+        mock = self.mock
+
+        if parts[:1] == ["mock"] and "recaptcha" in url.path:
+            mock.count("recaptcha")
+            return self.send_page(200, "reCAPTCHA", RECAPTCHA_ANCHOR_BODY)
+
+        if parts[:2] == ["wopublish-search", "service"]:
+            mock.count("image")
+            mock.delay()
+            return self.send_bytes(200, TINY_JPEG, "image/jpeg")
+
+        if len(parts) == 4 and parts[:3] == ["wopublish-search", "public", "detail"]:
+            return self.serve_detail(parts[3], query)
+
+        if len(parts) == 3 and parts[:2] == ["wopublish-search", "public"] and parts[2] in IP_TYPES:
+            mock.count("search")
+            mock.delay()
+            body = SEARCH_BODY.format(ip_type=parts[2], input_name=html.escape(SEARCH_INPUT_NAME))
+            return self.send_page(200, "WIPO Publish - Search", body)
+
+        if len(parts) == 4 and parts[:2] == ["wopublish-search", "public"] and parts[3] == "results":
+            mock.count("results")
+            mock.delay()
+            filing_number = query.get(SEARCH_INPUT_NAME, "")
+            body = RESULTS_BODY.format(
+                ip_type=parts[2],
+                filing_number=html.escape(filing_number),
+                processed_id=to_processed_id(filing_number),
+            )
+            return self.send_page(200, "WIPO Publish - Results", body)
+
+        mock.count("not_found")
+        return self.send_page(404, "Not Found", "<h1>Not Found</h1>")
+
+    def serve_detail(self, ip_type, query):
+        mock = self.mock
+        processed_id = query.get("id", "")
+        container_html = mock.detail_html(ip_type, processed_id)
+        if container_html is None or not processed_id:
+            mock.count("not_found")
+            return self.send_page(404, "Not Found", "<h1>Not Found</h1>")
+
+        mock.delay()
+        fault = None if query.get(PASS_PARAM) else mock.pick_fault()
+        mock.count(fault or "detail")
+        passed_url = f"{urlparse(self.path).path}?{urlencode({'id': processed_id, PASS_PARAM: 1})}"
+
+        if fault == FAULT_SERVER_500:
+            return self.send_page(500, "Error", SERVER_500_BODY)
+        if fault == FAULT_TEMPLATE_ERROR:
+            return self.send_page(200, "WIPO Publish", TEMPLATE_ERROR_BODY)
+        if fault == FAULT_INTERSTITIAL:
+            body = INTERSTITIAL_BODY.format(continue_url=html.escape(passed_url))
+            return self.send_page(200, "Privacy error", body)
+        if fault == FAULT_CHALLENGE:
+            hidden_inputs = "\n".join(
+                f'<input type="hidden" name="{name}" value="{html.escape(str(value))}">'
+                for name, value in [("id", processed_id), (PASS_PARAM, 1)]
+            )
+            body = CHALLENGE_BODY.format(action=urlparse(self.path).path, hidden_inputs=hidden_inputs)
+            return self.send_page(200, "WIPO Publish - Verify", body)
+        if fault == FAULT_SLOW:
+            time.sleep(mock.slow_latency)
+        return self.send_page(200, "WIPO Publish - Detail", f'<div class="container">{container_html}</div>')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server NOIP giả lập cho benchmark crawler")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=str(DEFAULT_FIXTURES_DIR), help="Thư mục HTML trang chi tiết")
+    parser.add_argument("--latency", type=float, default=0.0, help="Độ trễ mỗi request (giây)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Độ trễ ngẫu nhiên thêm tối đa (giây)")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="Độ trễ của trang tải chậm (giây)")
+    for fault in FAULTS:
+        parser.add_argument(
+            f"--{fault.replace('_', '-')}", type=float, default=0.0, help=f"Xác suất chèn trạng thái {fault}"
+        )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    setup_logging()
+    server = MockNoipServer(
+        args.host,
+        args.port,
+        args.fixtures,
+        latency=args.latency,
+        jitter=args.jitter,
+        slow_latency=args.slow_latency,
+        faults={fault: getattr(args, fault) for fault in FAULTS},
+        seed=args.seed,
+    )
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        logger.info(f"Số request: {server.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Thời gian mạng từng request của Chrome, lấy từ Chrome DevTools (CDP Network domain)
+Bật bằng network_timing=True khi tạo crawler: chromedriver ghi các sự kiện Network.*
+vào performance log (goog:loggingPrefs). Sau mỗi số đơn collect_network_timings() đọc
+log, ghép sự kiện theo requestId và tính cho trang chi tiết (Document) và ảnh:
+- TTFB: gửi xong request -> nhận xong header (thời gian server NOIP)
+- total: requestWillBeSent -> loadingFinished (cả truyền dữ liệu)
+- transfer_bytes: số byte thực nhận qua mạng
+Kết quả được cộng vào histogram net_* của metrics.py và gắn vào FetchedPage.network /
+crawler.last_network, ResultCollector ghi vào cột network của ledger (JSON) để tách
+thời gian chờ server khỏi thời gian Chrome render / Selenium xử lý theo từng số đơn.
+Request GET trực tiếp của DetailFetcher (http_timing) được ghi cùng dạng, source "http".
+"""
+import json
+import logging
+
+from selenium.common.exceptions import WebDriverException
+
+from metrics import observe
+
+logger = logging.getLogger(__name__)
+
+# Loại resource CDP được tính (trang chi tiết + ảnh)
+RESOURCE_PHASES = {"Document": "document", "Image": "image"}
+
+
+def enable_network_timing(chrome_options):
+    """Cho chromedriver ghi sự kiện CDP Network.* vào performance log"""
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    chrome_options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+
+class RequestTiming:
+    def __init__(self, url, resource_type, started):
+        self.url = url
+        self.resource_type = resource_type
+        # Mốc thời gian CDP (giây, đồng hồ monotonic của Chrome)
+        self.started = started
+        self.status = None
+        self.ttfb = None
+        self.total = None
+        self.transfer_bytes = 0
+        self.from_cache = False
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "source": "cdp",
+            "url": self.url,
+            "type": self.resource_type,
+            "status": self.status,
+            "ttfb_seconds": self.ttfb,
+            "total_seconds": self.total,
+            "transfer_bytes": self.transfer_bytes,
+            "from_cache": self.from_cache,
+            "error": self.error,
+        }
+
+
+def read_network_events(driver):
+    """Lấy (và xóa) các sự kiện Network.* trong performance log: [(method, params)]"""
+    try:
+        entries = driver.get_log("performance")
+    except WebDriverException as e:
+        logger.debug(f"Không đọc được performance log: {e}")
+        return []
+    events = []
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        if message["method"].startswith("Network."):
+            events.append((message["method"], message["params"]))
+    return events
+
+
+def parse_network_events(events):
+    """Ghép sự kiện theo requestId -> [RequestTiming] của trang chi tiết và ảnh"""
+    requests = {}
+    for method, params in events:
+        request_id = params.get("requestId")
+        if method == "Network.requestWillBeSent":
+            # Redirect dùng lại requestId - tính từ request cuối cùng
+            requests[request_id] = RequestTiming(params["request"]["url"], params.get("type"), params["timestamp"])
+            continue
+        timing = requests.get(request_id)
+        if timing is None:
+            continue
+        if method == "Network.responseReceived":
+            response = params["response"]
+            timing.resource_type = params.get("type") or timing.resource_type
+            timing.status = response.get("status")
+            timing.from_cache = bool(response.get("fromDiskCache") or response.get("fromServiceWorker"))
+            net = response.get("timing")
+            if net and net.get("sendStart", -1) >= 0:
+                # Mốc trong timing tính bằng ms kể từ requestTime
+                timing.ttfb = (net["receiveHeadersEnd"] - net["sendStart"]) / 1000
+        elif method == "Network.loadingFinished":
+            timing.total = params["timestamp"] - timing.started
+            timing.transfer_bytes = int(params.get("encodedDataLength", 0))
+        elif method == "Network.loadingFailed":
+            timing.total = params["timestamp"] - timing.started
+            timing.error = params.get("errorText")
+    return [timing for timing in requests.values() if timing.resource_type in RESOURCE_PHASES]
+
+
+def collect_network_timings(driver, filing_number):
+    """
+    Đọc sự kiện mạng từ lần gọi trước tới giờ, ghi vào histogram và log tóm tắt
+    Return: [dict] mỗi request trang chi tiết / ảnh
+    """
+    timings = parse_network_events(read_network_events(driver))
+    for timing in timings:
+        if timing.from_cache:
+            continue
+        phase = RESOURCE_PHASES[timing.resource_type]
+        if timing.ttfb is not None:
+            observe(f"net_{phase}_ttfb", timing.ttfb)
+        if timing.total is not None:
+            observe(f"net_{phase}_total", timing.total, error=timing.error is not None)
+
+    documents = [timing for timing in timings if timing.resource_type == "Document"]
+    images = [timing for timing in timings if timing.resource_type == "Image"]
+    if documents:
+        slowest = max(documents, key=lambda timing: timing.ttfb or 0)
+        image_ttfbs = [timing.ttfb for timing in images if timing.ttfb is not None]
+        logger.info(
+            f"🌐 Mạng {filing_number}: {len(documents)} lần tải trang, TTFB chậm nhất "
+            f"{slowest.ttfb or 0:.2f}s (tải {slowest.total or 0:.2f}s, "
+            f"{sum(timing.transfer_bytes for timing in documents) / 1024:.0f} KB)"
+            + (
+                f"; {len(images)} ảnh, TTFB max {max(image_ttfbs):.2f}s, "
+                f"{sum(timing.transfer_bytes for timing in images) / 1024:.0f} KB"
+                if image_ttfbs
+                else ""
+            )
+        )
+    return [timing.to_dict() for timing in timings]
+
+
+def http_timing(url, total, response=None, error=None):
+    """Một request GET của requests.Session (DetailFetcher) theo cùng dạng RequestTiming.to_dict"""
+    return {
+        "source": "http",
+        "url": url,
+        "type": "Document",
+        "status": response.status_code if response is not None else None,
+        # response.elapsed: gửi request -> parse xong header
+        "ttfb_seconds": response.elapsed.total_seconds() if response is not None else None,
+        "total_seconds": total,
+        "transfer_bytes": len(response.content) if response is not None else 0,
+        "from_cache": False,
+        "error": error,
+    }
+
+
+def discard_network_events(driver):
+    """Bỏ sự kiện còn tồn trong log (trước khi bắt đầu một số đơn mới)"""
+    read_network_events(driver)
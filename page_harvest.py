@@ -0,0 +1,70 @@
+"""
+Thu hoạch trang chi tiết bằng một lần execute_script duy nhất
+Thay cho chuỗi lệnh WebDriver cũ: get_attribute("outerHTML") của detail-container,
+find_elements cho từng selector ảnh, get_attribute("src") cho từng ảnh và nhiều lần
+đọc driver.page_source để kiểm tra lỗi 500 / lỗi template - mỗi lệnh là một round-trip.
+"""
+import logging
+
+from page_state import CLASSIFY_PAGE_JS, PageState
+
+logger = logging.getLogger(__name__)
+
+DETAIL_CONTAINER_SELECTOR = "div.detail-container.col-md-12"
+
+HARVEST_JS = CLASSIFY_PAGE_JS + """
+var containerSelector = arguments[0];
+var imageSelectors = arguments[1];
+var container = document.querySelector(containerSelector);
+var imageUrls = [];
+for (var i = 0; i < imageSelectors.length && imageUrls.length === 0; i++) {
+    var images = document.querySelectorAll(imageSelectors[i]);
+    for (var j = 0; j < images.length; j++) {
+        imageUrls.push(images[j].getAttribute("src") ? images[j].src : null);
+    }
+}
+return {
+    url: window.location.href,
+    container_html: container ? container.outerHTML : null,
+    image_urls: imageUrls,
+    state: classifyPage()
+};
+"""
+
+
+class PageHarvest:
+    """Kết quả một lần harvest: HTML detail-container, URL ảnh và trạng thái trang (PageState)"""
+
+    def __init__(self, payload):
+        self.url = payload.get("url")
+        self.container_html = payload.get("container_html")
+        self.image_urls = payload.get("image_urls") or []
+        self.state = PageState(payload.get("state") or PageState.LOADING.value)
+
+    @property
+    def is_detail(self):
+        # Trang chi tiết có thể kèm iframe reCAPTCHA ẩn - chỉ loại các trang lỗi
+        return bool(self.container_html) and self.state not in (
+            PageState.SERVER_500,
+            PageState.TEMPLATE_ERROR,
+        )
+
+
+def harvest_page(driver, image_selectors=()):
+    """Một round-trip WebDriver: lấy toàn bộ những gì cần từ trang chi tiết đang mở"""
+    payload = driver.execute_script(HARVEST_JS, DETAIL_CONTAINER_SELECTOR, list(image_selectors))
+    return PageHarvest(payload or {})
+
+
+class FetchedPage:
+    """Trang chi tiết đã tải xong - đơn vị công việc giữa các bước fetch / parse / ảnh / ghi"""
+
+    def __init__(self, filing_number, ip_type, html, image_urls, images_folder):
+        self.filing_number = filing_number
+        # Loại đối tượng (khóa của detail_extractor.EXTRACTORS)
+        self.ip_type = ip_type
+        self.html = html
+        self.image_urls = image_urls
+        self.images_folder = images_folder
+        # Thời gian mạng từng request của Chrome (network_timing.py), None = không đo
+        self.network = None
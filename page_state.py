@@ -0,0 +1,108 @@
+"""
+Phân loại trạng thái trang NOIP bằng một lệnh probe duy nhất
+Thay cho việc đọc driver.page_source nhiều lần mỗi vòng F5 (mỗi lần serialize cả DOM,
+vài trăm KB qua WebDriver) rồi đoán trạng thái qua exception của find_element.
+Probe chạy trong trình duyệt và chỉ trả về một chuỗi ngắn.
+classify_html áp dụng cùng quy tắc cho HTML tải bằng requests (http_fetcher.py).
+"""
+import logging
+import re
+from enum import Enum
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from metrics import increment
+
+logger = logging.getLogger(__name__)
+
+
+class PageState(Enum):
+    DETAIL = "detail"
+    CHALLENGE = "challenge"
+    SERVER_500 = "server_500"
+    TEMPLATE_ERROR = "template_error"
+    SECURITY_INTERSTITIAL = "security_interstitial"
+    LOADING = "loading"
+
+
+# Hàm JS dùng chung cho probe và page_harvest.HARVEST_JS (thứ tự kiểm tra giống classify_html)
+CLASSIFY_PAGE_JS = """
+var RECAPTCHA_WIDGET_SELECTOR = "iframe[src*='recaptcha'], div.g-recaptcha, [data-sitekey]";
+function classifyPage() {
+    var root = document.documentElement;
+    if (!root || !document.body) return "loading";
+    var html = root.outerHTML;
+    if (html.indexOf("Internal Server Error") !== -1) return "server_500";
+    if (html.indexOf("${") !== -1 && html.indexOf("appltype") !== -1) return "template_error";
+    // Trang chi tiết có thể kèm iframe reCAPTCHA ẩn - detail-container được xét trước
+    if (document.querySelector("div.detail-container.col-md-12")) return "detail";
+    if (document.querySelector(RECAPTCHA_WIDGET_SELECTOR)) return "challenge";
+    if (html.indexOf("doesn't support a secure connection") !== -1 ||
+        html.indexOf("Continue to site") !== -1) return "security_interstitial";
+    return "loading";
+}
+"""
+
+PROBE_JS = CLASSIFY_PAGE_JS + "return classifyPage();"
+
+DETAIL_CONTAINER_RE = re.compile(
+    r"""class\s*=\s*["'](?=[^"']*\bdetail-container\b)(?=[^"']*\bcol-md-12\b)[^"']*["']"""
+)
+# Widget reCAPTCHA (iframe, div g-recaptcha, data-sitekey) - không tính thẻ script api.js
+# hay chữ "recaptcha" bất kỳ, trang chi tiết có thể tải script này mà không chặn gì
+RECAPTCHA_WIDGET_RE = re.compile(
+    r"""<iframe\b[^>]*\bsrc\s*=\s*["'][^"']*recaptcha"""
+    r"""|class\s*=\s*["'][^"']*\bg-recaptcha\b"""
+    r"""|\bdata-sitekey\s*="""
+)
+
+
+def classify_html(html):
+    """Trạng thái của một trang HTML thô (không chạy JavaScript)"""
+    if "Internal Server Error" in html:
+        return PageState.SERVER_500
+    if "${" in html and "appltype" in html:
+        return PageState.TEMPLATE_ERROR
+    # detail-container trước: trang chi tiết có thể kèm widget reCAPTCHA ẩn
+    if DETAIL_CONTAINER_RE.search(html):
+        return PageState.DETAIL
+    # HTML thô có thể chưa có iframe (do api.js chèn vào) - div g-recaptcha / data-sitekey
+    if RECAPTCHA_WIDGET_RE.search(html):
+        return PageState.CHALLENGE
+    if "doesn't support a secure connection" in html or "Continue to site" in html:
+        return PageState.SECURITY_INTERSTITIAL
+    return PageState.LOADING
+
+
+def probe_page_state(driver):
+    """Một round-trip WebDriver: trạng thái của trang đang mở"""
+    try:
+        return PageState(driver.execute_script(PROBE_JS))
+    except (WebDriverException, ValueError):
+        # Trang đang chuyển (document bị thay giữa chừng) - coi như đang tải
+        return PageState.LOADING
+
+
+def wait_for_page_state(driver, timeout=2, poll_frequency=0.25):
+    """
+    Probe liên tục đến khi trang thoát trạng thái LOADING (tối đa timeout giây)
+    Return: PageState cuối cùng (LOADING nếu hết thời gian)
+    """
+    try:
+        state = WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(_settled_state)
+    except TimeoutException:
+        state = PageState.LOADING
+    # Số lần gặp từng trạng thái sau mỗi lần tải / F5 (status_dashboard.py)
+    increment("page_states", state=state.value)
+    return state
+
+
+def _settled_state(driver):
+    state = probe_page_state(driver)
+    return state if state is not PageState.LOADING else False
+
+
+def state_is(*states):
+    """Điều kiện cho WebDriverWait: trang ở một trong các trạng thái cho trước"""
+    return lambda driver: probe_page_state(driver) in states
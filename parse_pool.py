@@ -0,0 +1,66 @@
+"""
+Parse HTML trang chi tiết trong các process riêng (ProcessPoolExecutor)
+Thread điều khiển Chrome chỉ đưa HTML detail-container vào pool rồi đi tiếp sang
+bước tải ảnh / số đơn kế tiếp; BeautifulSoup chạy trên mọi core CPU thay vì chiếm
+GIL của thread đang điều khiển trình duyệt.
+Crawler nhận Future thay cho row_data khi dùng pool - resolve_row() lấy kết quả.
+Process con được tạo bằng "spawn": pool khởi động process lười (lần submit đầu), lúc đó
+thread flusher của RecordStore, listener log, worker crawl đã chạy - fork từ process
+nhiều thread có thể kế thừa lock đang bị giữ và treo.
+"""
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from detail_extractor import EXTRACTORS
+from html_archive import read_html
+from metrics import observe
+
+logger = logging.getLogger(__name__)
+
+
+def parse_detail_html(ip_type, html):
+    """Chạy trong process con: HTML detail-container -> row_data"""
+    return EXTRACTORS[ip_type](html)
+
+
+def parse_archived_html(ip_type, object_path):
+    """Chạy trong process con: object HTML nén trong HtmlArchive -> row_data"""
+    return EXTRACTORS[ip_type](read_html(object_path))
+
+
+def resolve_row(row_data):
+    """row_data (dict) hoặc Future từ ParsePool -> dict (chờ parse xong nếu cần)"""
+    if isinstance(row_data, Future):
+        return row_data.result()
+    return row_data
+
+
+class ParsePool:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"🧮 Parse pool: {self.max_workers} process")
+
+    def submit(self, ip_type, html):
+        """Đưa HTML vào hàng đợi parse, trả về Future[row_data]"""
+        # Thời gian từ lúc đưa vào pool đến khi có row_data (gồm cả lúc chờ process rảnh)
+        submitted_at = time.perf_counter()
+        future = self.executor.submit(parse_detail_html, ip_type, html)
+        future.add_done_callback(
+            lambda f: observe(
+                "parse", time.perf_counter() - submitted_at, error=f.cancelled() or f.exception() is not None
+            )
+        )
+        return future
+
+    def submit_archived(self, page):
+        """Parse một ArchivedPage (process con tự đọc file - không chuyển HTML qua pipe)"""
+        return self.executor.submit(parse_archived_html, page.ip_type, str(page.object_path))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
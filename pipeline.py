@@ -0,0 +1,349 @@
+"""
+Pipeline crawl theo từng bước: fetch -> parse -> ảnh -> ghi
+Mỗi bước có số worker riêng và một hàng đợi giới hạn (bounded queue) tới bước sau:
+khi CDN ảnh hoặc ổ đĩa chậm, hàng đợi đầy làm bước trước phải chờ (backpressure)
+thay vì dồn HTML/row_data trong RAM.
+
+- fetch: mỗi worker một crawler (một Chrome), crawler.fetch_page(số đơn) -> FetchedPage
+- parse: HTML -> row_data (parse trong thread), hoặc gửi vào ParsePool và chuyển Future
+  xuống các bước sau - persist ghi khi Future xong (ResultCollector.add_pending)
+- image: tải ảnh bằng ImageDownloader dùng chung
+- persist: ResultCollector ghi RecordStore + CrawlLedger
+
+Độ sâu hàng đợi và mức sử dụng (thời gian bận / thời gian chạy) của từng bước được
+log định kỳ và khi kết thúc (Stage.stats, CrawlPipeline.stats).
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from detail_extractor import EXTRACTORS
+from image_downloader import ImageDownloader
+from log_config import record_context
+from metrics import add_gauge, set_gauge
+from profiling import section as profile_section
+
+logger = logging.getLogger(__name__)
+
+# Báo hiệu worker dừng (đi sau mọi item của bước trước)
+STOP = object()
+
+
+class PipelineItem:
+    """Một số đơn đi qua pipeline; error != None thì các bước sau bỏ qua, chỉ ghi ledger"""
+
+    def __init__(self, filing_number):
+        self.filing_number = filing_number
+        self.start_time = time.time()
+        self.page = None
+        self.row_data = None
+        self.image_paths = []
+        self.error = None
+        # Thời gian mạng của lần fetch (crawler.last_network), ghi vào cột network của ledger
+        self.network = None
+
+
+class Stage:
+    """
+    Một bước của pipeline: workers thread đọc hàng đợi vào (tối đa maxsize item)
+    worker_factory(worker_id) -> handler(item); handler có close() thì được gọi khi worker dừng
+    run_on_error=False: item đã lỗi ở bước trước được chuyển thẳng sang bước sau
+    Worker khởi tạo lỗi thì dừng luôn (không nhận item); cả bước không có worker nào
+    chạy thì CrawlPipeline.run báo lỗi thay vì đánh dấu thất bại mọi số đơn
+    """
+
+    def __init__(self, name, worker_factory, workers=1, maxsize=8, run_on_error=False):
+        self.name = name
+        self.worker_factory = worker_factory
+        self.workers = max(1, workers)
+        self.run_on_error = run_on_error
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.next_stage = None
+        self.threads = []
+        self.lock = threading.Lock()
+        self.busy_seconds = 0.0
+        self.processed = 0
+        self.peak_depth = 0
+        self.started_at = None
+        # Khởi tạo worker: số worker đã xong (thành công hoặc lỗi), số chạy được, lỗi
+        self.initialized = 0
+        self.started_workers = 0
+        self.init_errors = []
+        self.init_done = threading.Condition(self.lock)
+
+    def put(self, item):
+        """Đưa item vào hàng đợi (chặn khi đầy - backpressure lên bước trước)"""
+        self.queue.put(item)
+        depth = self.queue.qsize()
+        with self.lock:
+            if depth > self.peak_depth:
+                self.peak_depth = depth
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.initialized = 0
+        self.started_workers = 0
+        self.init_errors = []
+        self.threads = [
+            threading.Thread(
+                target=self._worker_loop,
+                args=(worker_id,),
+                name=f"{self.name}-{worker_id}",
+                daemon=True,
+            )
+            for worker_id in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def wait_started(self):
+        """Chờ tới khi có một worker chạy được (True) hoặc mọi worker đều khởi tạo lỗi (False)"""
+        with self.init_done:
+            while not self.started_workers and self.initialized < len(self.threads):
+                self.init_done.wait()
+            return self.started_workers > 0
+
+    def stop(self):
+        """Gửi STOP cho mọi worker đang chạy (sau các item đang chờ) và đợi chúng dừng"""
+        # Worker khởi tạo lỗi đã thoát - chỉ gửi STOP cho số worker chạy được
+        with self.init_done:
+            while self.initialized < len(self.threads):
+                self.init_done.wait()
+            started_workers = self.started_workers
+        for _ in range(started_workers):
+            self.queue.put(STOP)
+        for thread in self.threads:
+            thread.join()
+
+    def _worker_loop(self, worker_id):
+        try:
+            handler = self.worker_factory(worker_id)
+        except Exception as e:
+            logger.error(f"❌ {self.name}-{worker_id} không khởi tạo được: {type(e).__name__} - {e}")
+            with self.init_done:
+                self.init_errors.append(e)
+                self.initialized += 1
+                self.init_done.notify_all()
+            return
+        with self.init_done:
+            self.started_workers += 1
+            self.initialized += 1
+            self.init_done.notify_all()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is STOP:
+                    break
+                if item.error is None or self.run_on_error:
+                    started = time.monotonic()
+                    with record_context(item.filing_number), profile_section("record"):
+                        try:
+                            handler(item)
+                        except Exception as e:
+                            logger.error(
+                                f"❌ {self.name}-{worker_id} lỗi khi xử lý {item.filing_number}: "
+                                f"{type(e).__name__} - {e}"
+                            )
+                            item.error = e
+                    elapsed = time.monotonic() - started
+                    with self.lock:
+                        self.busy_seconds += elapsed
+                        self.processed += 1
+                if self.next_stage is not None:
+                    self.next_stage.put(item)
+        finally:
+            close = getattr(handler, "close", None)
+            if close:
+                close()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        with self.lock:
+            busy_seconds = self.busy_seconds
+            processed = self.processed
+            peak_depth = self.peak_depth
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "depth": self.queue.qsize(),
+            "peak_depth": peak_depth,
+            "maxsize": self.queue.maxsize,
+            "processed": processed,
+            "utilization": busy_seconds / (elapsed * self.workers) if elapsed else 0.0,
+        }
+
+
+def format_stats(stats):
+    return " | ".join(
+        f"{s['stage']}: hàng đợi {s['depth']}/{s['maxsize']} (max {s['peak_depth']}), "
+        f"bận {s['utilization']:.0%} x{s['workers']}, {s['processed']} xong"
+        for s in stats
+    )
+
+
+# ---------- Handler của từng bước ----------
+
+
+class FetchWorker:
+    """Mỗi worker fetch sở hữu một crawler (một Chrome với profile riêng)"""
+
+    def __init__(self, crawler, collector):
+        self.crawler = crawler
+        self.collector = collector
+        add_gauge("active_workers", 1)
+
+    def __call__(self, item):
+        # Ledger tính lượt thử và thời gian từ lúc bắt đầu fetch, không phải lúc xếp hàng
+        item.start_time = time.time()
+        self.collector.start(item.filing_number)
+        item.page = self.crawler.fetch_page(item.filing_number)
+        item.network = getattr(self.crawler, "last_network", None)
+        if item.page is None:
+            item.error = self.crawler.last_error or RuntimeError("Không tải được trang chi tiết")
+
+    def close(self):
+        add_gauge("active_workers", -1)
+        self.crawler.close()
+
+
+def parse_worker(parse_pool=None, in_flight=None):
+    """
+    Có parse_pool: gửi HTML vào pool và chuyển Future xuống bước sau (không chờ parse xong);
+    in_flight giới hạn số trang đang chờ parse - pool đầy thì bước parse chặn như hàng đợi đầy
+    """
+
+    def handle(item):
+        if parse_pool is not None:
+            in_flight.acquire()
+            try:
+                future = parse_pool.submit(item.page.ip_type, item.page.html)
+            except BaseException:
+                # Không có Future nào trả chỗ: trả ngay, nếu không bước parse bị khóa vĩnh viễn
+                in_flight.release()
+                raise
+            future.add_done_callback(lambda _: in_flight.release())
+            item.row_data = future
+        else:
+            item.row_data = EXTRACTORS[item.page.ip_type](item.page.html)
+        # HTML không cần nữa - không giữ trong hàng đợi các bước sau
+        item.page.html = None
+
+    return handle
+
+
+def image_worker(downloader):
+    def handle(item):
+        page = item.page
+        if page.image_urls:
+            item.image_paths = downloader.download_all(page.image_urls, page.images_folder, item.filing_number)
+
+    return handle
+
+
+class CrawlPipeline:
+    """
+    Pipeline fetch -> parse -> image -> persist cho một danh sách số đơn
+    crawler_factory(worker_id) -> crawler có fetch_page(số đơn) và close()
+    """
+
+    def __init__(
+        self,
+        crawler_factory,
+        collector,
+        fetch_workers=1,
+        parse_workers=2,
+        image_workers=4,
+        queue_size=8,
+        parse_pool=None,
+        downloader=None,
+        report_interval=30,
+    ):
+        self.collector = collector
+        self.report_interval = report_interval
+        # Không truyền downloader: pipeline tự tạo và đóng khi run() xong (manifest được ghi đủ)
+        self.owns_downloader = downloader is None
+        self.downloader = downloader = downloader or ImageDownloader()
+        # Số trang tối đa đang nằm trong ParsePool (đang parse + chờ process rảnh)
+        in_flight = threading.BoundedSemaphore(parse_pool.max_workers * 2) if parse_pool else None
+        self.stages = [
+            Stage(
+                "fetch",
+                lambda worker_id: FetchWorker(crawler_factory(worker_id), collector),
+                fetch_workers,
+                queue_size,
+            ),
+            Stage("parse", lambda worker_id: parse_worker(parse_pool, in_flight), parse_workers, queue_size),
+            Stage("image", lambda worker_id: image_worker(downloader), image_workers, queue_size),
+            Stage("persist", lambda worker_id: self._persist, 1, queue_size, run_on_error=True),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+
+    def _persist(self, item):
+        # Item lỗi ở bước trước vẫn vào ledger (STATUS_FAILED / STATUS_NOT_FOUND)
+        if isinstance(item.row_data, Future):
+            # Đang parse trong ParsePool - ghi khi xong, finish() chờ các Future còn lại
+            self.collector.add_pending(item.filing_number, item.row_data, item.start_time, item.network)
+            return
+        self.collector.add(item.filing_number, item.row_data, item.error, time.time() - item.start_time, item.network)
+
+    def stats(self):
+        return [stage.stats() for stage in self.stages]
+
+    def run(self, filing_numbers):
+        logger.info(
+            "🚀 Pipeline: " + ", ".join(f"{stage.name} x{stage.workers}" for stage in self.stages)
+            + f" | {len(filing_numbers)} số đơn"
+        )
+        set_gauge("records_planned", len(filing_numbers))
+        try:
+            for stage in reversed(self.stages):
+                stage.start()
+            self._check_started(filing_numbers)
+
+            stop_report = threading.Event()
+            reporter = threading.Thread(target=self._report_loop, args=(stop_report,), name="pipeline-stats", daemon=True)
+            reporter.start()
+            try:
+                fetch = self.stages[0]
+                for filing_number in filing_numbers:
+                    fetch.put(PipelineItem(filing_number))
+                # Dừng lần lượt: mọi item của bước trước đã sang bước sau trước khi bước sau nhận STOP
+                for stage in self.stages:
+                    stage.stop()
+            finally:
+                stop_report.set()
+                reporter.join()
+
+            self.collector.finish()
+        finally:
+            if self.owns_downloader:
+                # Sau khi bước image đã dừng: chờ ảnh đang tải, đóng manifest + session
+                self.downloader.close()
+        logger.info(f"📊 {format_stats(self.stats())}")
+        logger.info(
+            f"✅ Pipeline hoàn tất: {self.collector.success_count} thành công, "
+            f"{self.collector.failure_count} thất bại"
+        )
+        return self.stats()
+
+    def _check_started(self, filing_numbers):
+        """Bước nào không có worker chạy được (vd. mọi Chrome đều lỗi): dừng pipeline và báo lỗi"""
+        if not filing_numbers:
+            return
+        for stage in self.stages:
+            if stage.wait_started():
+                continue
+            for other in self.stages:
+                other.stop()
+            first_error = stage.init_errors[0] if stage.init_errors else None
+            raise RuntimeError(
+                f"Không worker {stage.name} nào khởi tạo được ({stage.workers} worker), "
+                f"{len(filing_numbers)} số đơn chưa được xử lý: {type(first_error).__name__} - {first_error}"
+            ) from first_error
+
+    def _report_loop(self, stop_event):
+        while not stop_event.wait(self.report_interval):
+            logger.info(f"📊 {format_stats(self.stats())}")
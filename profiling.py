@@ -0,0 +1,222 @@
+"""
+Profile hot path theo yêu cầu (--profile) - không bật thì chỉ tốn một lần kiểm tra biến toàn cục
+- cProfile chỉ chạy trong các section được chọn (scope):
+  "record": xử lý trọn một số đơn trong CrawlerPool / một item ở mỗi bước của pipeline
+  tên pha của metrics.span ("parse", "persist", "image_download"...): chỉ khối đó
+- Mỗi thread một cProfile.Profile (cProfile chỉ thấy thread đã bật nó). Sau mỗi `every`
+  record đã xong, mỗi thread ghi profile_<số record>_<thread>.prof khi ra khỏi section
+  rồi đo tiếp từ đầu; close() gộp tất cả vào profile_total.prof + profile_total.txt.
+  Xem bằng: python -m pstats <file> hoặc snakeviz <file>
+- memory=True: tracemalloc snapshot mỗi `every` record, ghi tracemalloc_<số record>.txt
+  (các dòng code tăng bộ nhớ nhiều nhất so với snapshot trước) và log top 3
+Python 3.12+ chỉ cho một cProfile hoạt động một lúc: section trùng thời điểm ở thread
+khác bị bỏ qua (đếm trong log khi close) - dùng --workers 1 để có profile đầy đủ.
+Ví dụ:
+    python main_trademarks.py --profile record --profile-every 50
+    python main_trademarks.py --pipeline --parse-workers 0 --profile parse,persist --profile-memory
+"""
+import cProfile
+import io
+import logging
+import pstats
+import re
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Section có thể profile: record + các pha chạy CPU của Python (pha chờ trình duyệt / mạng
+# như navigate, refresh_loop chủ yếu là sleep trong Selenium nên không có trong danh sách)
+SCOPES = ("record", "parse", "persist", "image_download", "harvest", "http_fetch")
+DEFAULT_EVERY = 100
+# Số dòng code tăng bộ nhớ nhiều nhất ghi vào mỗi file tracemalloc
+MEMORY_TOP = 25
+MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_profiler = None
+_NULL_SECTION = nullcontext()
+
+
+def parse_scopes(text):
+    """'parse,persist' -> ("parse", "persist"); ValueError nếu có scope không hỗ trợ"""
+    scopes = tuple(part.strip() for part in text.split(",") if part.strip())
+    unknown = [scope for scope in scopes if scope not in SCOPES]
+    if unknown or not scopes:
+        raise ValueError(f"Scope profile không hợp lệ: {text!r} (chọn trong: {', '.join(SCOPES)})")
+    return scopes
+
+
+class ThreadProfile:
+    """cProfile của một thread + độ sâu section lồng nhau"""
+
+    def __init__(self, index, thread_name, generation):
+        # Số thứ tự đứng trước: tên thread có thể lặp lại (hai pool chạy nối tiếp)
+        self.thread_name = f"{index:02d}_" + re.sub(r"[^\w.-]+", "_", thread_name)
+        self.generation = generation
+        self.profile = cProfile.Profile()
+        self.depth = 0
+        self.active = False
+        self.has_data = False
+
+
+class HotPathProfiler:
+    def __init__(self, out_dir, scopes=("record",), every=DEFAULT_EVERY, memory=False, memory_frames=1):
+        self.out_dir = Path(out_dir).resolve()
+        self.scopes = frozenset(scopes)
+        self.every = max(1, every)
+        self.memory = memory
+        self.memory_frames = memory_frames
+        self.lock = threading.Lock()
+        self.memory_lock = threading.Lock()
+        self.local = threading.local()
+        self.thread_profiles = []
+        self.dumped = []
+        self.records = 0
+        self.generation = 0
+        self.skipped = 0
+        self.snapshot = None
+
+    def start(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        if self.memory:
+            tracemalloc.start(self.memory_frames)
+            self.snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS)
+        logger.info(
+            f"🔬 Profile {', '.join(sorted(self.scopes))} mỗi {self.every} record"
+            f"{' + tracemalloc' if self.memory else ''} -> {self.out_dir}"
+        )
+        return self
+
+    def _thread_profile(self):
+        state = getattr(self.local, "state", None)
+        if state is None:
+            with self.lock:
+                state = ThreadProfile(len(self.thread_profiles), threading.current_thread().name, self.generation)
+                self.thread_profiles.append(state)
+            self.local.state = state
+        return state
+
+    @contextmanager
+    def section(self, name):
+        state = self._thread_profile()
+        if state.depth == 0:
+            try:
+                state.profile.enable()
+                state.active = True
+            except ValueError:
+                # Python 3.12+: cProfile của thread khác đang chạy
+                state.active = False
+                with self.lock:
+                    self.skipped += 1
+        state.depth += 1
+        try:
+            yield
+        finally:
+            state.depth -= 1
+            if state.depth == 0 and state.active:
+                state.profile.disable()
+                state.active = False
+                state.has_data = True
+                generation = self.generation
+                if state.generation < generation:
+                    self._dump(state, generation, f"profile_{generation * self.every:06d}_{state.thread_name}.prof")
+
+    def _dump(self, state, generation, file_name):
+        """Ghi profile đang có của thread (khi thread đó ở ngoài section) và bắt đầu profile mới"""
+        path = self.out_dir / file_name
+        state.profile.dump_stats(str(path))
+        state.profile = cProfile.Profile()
+        state.generation = generation
+        state.has_data = False
+        with self.lock:
+            self.dumped.append(path)
+
+    def record_finished(self):
+        with self.lock:
+            self.records += 1
+            if self.records % self.every:
+                return
+            self.generation += 1
+            records = self.records
+        if self.memory:
+            self._memory_snapshot(records)
+
+    def _memory_snapshot(self, records):
+        with self.memory_lock:
+            snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS)
+            stats = snapshot.compare_to(self.snapshot, "lineno")[:MEMORY_TOP]
+            self.snapshot = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        path = self.out_dir / f"tracemalloc_{records:06d}.txt"
+        header = f"# Sau {records} record: đang cấp phát {current / 2**20:.1f} MB (đỉnh {peak / 2**20:.1f} MB)"
+        path.write_text("\n".join([header] + [str(stat) for stat in stats]) + "\n", encoding="utf-8")
+        growth = [stat for stat in stats if stat.size_diff > 0][:3]
+        logger.info(
+            "🧠 tracemalloc sau %d record: %.1f MB (đỉnh %.1f MB), tăng nhiều nhất: %s",
+            records,
+            current / 2**20,
+            peak / 2**20,
+            "; ".join(
+                f"{Path(stat.traceback[0].filename).name}:{stat.traceback[0].lineno} {stat.size_diff / 1024:+.0f} KB"
+                for stat in growth
+            )
+            or "-",
+        )
+
+    def close(self):
+        """Gọi khi mọi worker đã dừng: ghi profile còn lại, gộp thành profile_total và tắt tracemalloc"""
+        with self.lock:
+            pending = [state for state in self.thread_profiles if state.has_data and not state.depth]
+        for state in pending:
+            self._dump(state, self.generation, f"profile_{self.records:06d}_{state.thread_name}_end.prof")
+        if self.memory:
+            if self.records % self.every:
+                self._memory_snapshot(self.records)
+            tracemalloc.stop()
+        if self.skipped:
+            logger.warning(f"⚠️ Profile: bỏ qua {self.skipped} section do cProfile khác đang chạy (Python 3.12+)")
+        if not self.dumped:
+            logger.info("🔬 Profile: không có section nào được đo")
+            return None
+        stats = pstats.Stats(*(str(path) for path in self.dumped))
+        total_path = self.out_dir / "profile_total.prof"
+        stats.dump_stats(str(total_path))
+        report = io.StringIO()
+        stats.stream = report
+        stats.sort_stats("tottime").print_stats(40)
+        (self.out_dir / "profile_total.txt").write_text(report.getvalue(), encoding="utf-8")
+        logger.info(f"🔬 Profile {self.records} record: {len(self.dumped)} file, tổng hợp ở {total_path}")
+        return total_path
+
+
+def install_profiler(profiler):
+    """Cài profiler dùng chung cho process (None: gỡ)"""
+    global _profiler
+    _profiler = profiler
+    return profiler
+
+
+def get_profiler():
+    return _profiler
+
+
+def section(name):
+    """with section("record"): ... - profile khối lệnh nếu profiler đã cài và name thuộc scope"""
+    profiler = _profiler
+    if profiler is None or name not in profiler.scopes:
+        return _NULL_SECTION
+    return profiler.section(name)
+
+
+def record_finished():
+    """Một số đơn đã xong (ResultCollector.add) - mốc để ghi profile / snapshot bộ nhớ"""
+    profiler = _profiler
+    if profiler is not None:
+        profiler.record_finished()
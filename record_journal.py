@@ -0,0 +1,86 @@
+"""
+Journal JSONL cho từng bản ghi đã trích xuất
+Mỗi row_data được append một dòng vào file journal; fsync được gom nhóm
+(group commit) bởi RecordStore - cứ N bản ghi hoặc T ms mới fsync một lần.
+Khi khởi động, RecordStore replay journal để không mất bản ghi nào nếu process chết.
+Chỉ một process được ghi journal: file <journal>.lock được khóa độc quyền suốt lúc mở,
+process thứ hai (reparse.py khi crawler đang chạy) nhận JournalLocked thay vì replay
+rồi xóa journal của process đang ghi.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class JournalLocked(Exception):
+    """Journal đang được một process khác ghi (crawler đang chạy)"""
+
+
+def lock_exclusive(file):
+    """Khóa độc quyền, không chờ - OSError nếu process khác đang giữ (mở lại được khi file đóng)"""
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+class RecordJournal:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock_file = open(self.path.with_name(self.path.name + ".lock"), "a+")
+        try:
+            lock_exclusive(self.lock_file)
+        except OSError as e:
+            self.lock_file.close()
+            raise JournalLocked(f"{self.path} đang được process khác ghi (crawler đang chạy?)") from e
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.entry_count = 0
+
+    def append(self, filing_number, row_data, crawled_at):
+        """Ghi một dòng vào buffer của file (chưa fsync)"""
+        entry = {"filing_number": filing_number, "crawled_at": crawled_at, "data": row_data}
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.entry_count += 1
+
+    def sync(self):
+        """Đẩy buffer xuống đĩa - gọi một lần cho cả nhóm bản ghi"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def replay(self):
+        """Đọc lại toàn bộ journal; bỏ qua dòng cuối bị ghi dở khi process chết"""
+        entries = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️ Bỏ qua dòng journal hỏng {self.path}:{line_number}")
+        return entries
+
+    def truncate(self):
+        """Xóa journal sau khi dữ liệu đã nằm an toàn trong SQLite"""
+        self.file.flush()
+        self.file.truncate(0)
+        self.file.seek(0)
+        os.fsync(self.file.fileno())
+        self.entry_count = 0
+
+    def close(self):
+        self.file.close()
+        # Đóng file lock là nhả khóa
+        self.lock_file.close()
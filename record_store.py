@@ -0,0 +1,254 @@
+"""
+Kho bản ghi append-only trên SQLite, khóa theo số đơn
+Mỗi record chỉ tốn một lệnh INSERT nhỏ thay vì ghi lại toàn bộ file Excel.
+File Excel được xuất theo yêu cầu bằng export_excel.py.
+
+Độ bền dữ liệu: mỗi bản ghi được append vào journal JSONL (record_journal.py),
+fsync + commit SQLite được gom nhóm - cứ commit_every bản ghi hoặc
+commit_interval giây một lần. Khi mở kho, journal được replay vào SQLite.
+
+read_only=True (export_excel.py, reparse.py --dry-run): chỉ đọc SQLite, không replay
+hay xóa journal và không giành khóa ghi - dùng được trong lúc crawler đang chạy.
+Bản ghi chỉ có trong journal (process ghi chết trước khi commit) được replay ở lần mở ghi sau.
+"""
+import atexit
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from metrics import span
+from record_journal import RecordJournal
+
+logger = logging.getLogger(__name__)
+
+RECORDS_DB_NAME = "records.sqlite"
+JOURNAL_NAME = "records.journal.jsonl"
+# Checkpoint SQLite và xóa journal khi journal vượt quá số dòng này
+JOURNAL_CHECKPOINT_ENTRIES = 10000
+# Số đơn NOIP: <loại>-<năm>-<5 số>, có thể có tiền tố VN / thiếu dấu - ("VN3201901234")
+FILING_NUMBER_RE = re.compile(r"(?:VN)?(\d)-?(\d{4})-?(\d{5})")
+
+
+def normalize_filing_number(value):
+    """
+    Khóa số đơn dùng chung cho records và ledger: "VN3201901234" / " 3-2019-01234 " -> "3-2019-01234"
+    Giá trị không đúng dạng số đơn được giữ nguyên (chỉ bỏ khoảng trắng hai đầu); rỗng -> ""
+    """
+    text = str(value).strip()
+    match = FILING_NUMBER_RE.fullmatch(re.sub(r"\s+", "", text).upper())
+    if match:
+        return "-".join(match.groups())
+    return text
+
+
+class RecordStore:
+    def __init__(self, db_path, journal_path=None, commit_every=50, commit_interval=0.2, read_only=False):
+        self.db_path = Path(db_path)
+        self.read_only = read_only
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.pending = 0
+        self.last_commit = time.monotonic()
+        self.lock = threading.RLock()
+        if read_only:
+            self.conn = sqlite3.connect(f"{self.db_path.absolute().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+            self.closed = False
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Khóa ghi trước khi đụng vào SQLite: JournalLocked nếu crawler khác đang ghi kho này
+        self.journal = RecordJournal(journal_path or self.db_path.parent / JOURNAL_NAME)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                filing_number TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                crawled_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+        self.replay_journal()
+
+        # Thread nền đảm bảo nhóm bản ghi cuối được commit trong vòng commit_interval giây
+        self.stop_event = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_loop, name="record-store-flusher", daemon=True)
+        self.flusher.start()
+        self.closed = False
+        atexit.register(self.close)
+
+    def replay_journal(self):
+        """Đưa các bản ghi trong journal (có thể chưa vào SQLite khi process chết) vào kho"""
+        entries = self.journal.replay()
+        if not entries:
+            return 0
+        with self.lock:
+            for entry in entries:
+                self._upsert(entry["filing_number"], entry["data"], entry["crawled_at"])
+            self.conn.commit()
+            self._checkpoint()
+        logger.info(f"♻️ Đã replay {len(entries)} bản ghi từ journal {self.journal.path}")
+        return len(entries)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.read_only:
+            self.conn.close()
+            return
+        self.stop_event.set()
+        self.flusher.join()
+        with self.lock:
+            self.commit()
+            self._checkpoint()
+            self.journal.close()
+            self.conn.close()
+
+    def _flush_loop(self):
+        while not self.stop_event.wait(self.commit_interval):
+            with self.lock:
+                if self.pending:
+                    self.commit()
+
+    def _upsert(self, filing_number, row_data, crawled_at):
+        self.conn.execute(
+            """
+            INSERT INTO records (filing_number, data, crawled_at) VALUES (?, ?, ?)
+            ON CONFLICT(filing_number) DO UPDATE SET data = excluded.data, crawled_at = excluded.crawled_at
+            """,
+            (str(filing_number), json.dumps(row_data, ensure_ascii=False), crawled_at),
+        )
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"RecordStore {self.db_path} mở read-only, không ghi được")
+
+    def _checkpoint(self):
+        """Ghi WAL của SQLite xuống file chính rồi xóa journal (gọi trong lock, sau commit)"""
+        self.conn.execute("PRAGMA wal_checkpoint(FULL)")
+        self.journal.truncate()
+
+    def commit(self):
+        """Group commit: một lần fsync journal + một lần commit SQLite cho cả nhóm bản ghi"""
+        self._check_writable()
+        with self.lock:
+            self.journal.sync()
+            self.conn.commit()
+            self.pending = 0
+            self.last_commit = time.monotonic()
+            if self.journal.entry_count >= JOURNAL_CHECKPOINT_ENTRIES:
+                self._checkpoint()
+
+    def save(self, filing_number, row_data, crawled_at=None):
+        """Thêm (hoặc cập nhật) bản ghi của một số đơn - giữ nguyên thứ tự STT ban đầu"""
+        self._check_writable()
+        crawled_at = crawled_at or time.time()
+        with span("persist"), self.lock:
+            self.journal.append(str(filing_number), row_data, crawled_at)
+            self._upsert(filing_number, row_data, crawled_at)
+            self.note_write()
+
+    def note_write(self):
+        """
+        Một thay đổi chưa commit trên self.conn (gọi trong self.lock) - commit theo nhóm
+        như bản ghi (CrawlLedger ghi trạng thái qua cùng connection và transaction)
+        """
+        with self.lock:
+            self.pending += 1
+            if (
+                self.pending >= self.commit_every
+                or time.monotonic() - self.last_commit >= self.commit_interval
+            ):
+                self.commit()
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def has(self, filing_number):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM records WHERE filing_number = ?", (str(filing_number),)
+            ).fetchone()
+        return row is not None
+
+    def get(self, filing_number):
+        """row_data của một số đơn (None nếu chưa có)"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM records WHERE filing_number = ?", (str(filing_number),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def last_record(self):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM records ORDER BY rowid DESC LIMIT 1"
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_records(self):
+        """Duyệt (filing_number, row_data) theo thứ tự crawl"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT filing_number, data FROM records ORDER BY rowid"
+            ).fetchall()
+        for filing_number, data in rows:
+            yield filing_number, json.loads(data)
+
+    def import_excel(self, excel_file_path, key_column="Số đơn"):
+        """
+        Nạp dữ liệu từ file Excel cũ (chỉ dùng một lần khi chuyển sang RecordStore)
+        Khóa là số đơn đã chuẩn hóa như khóa của crawler (ledger đánh dấu done được);
+        dòng không có số đơn bị bỏ qua. Cả file nằm trong một transaction.
+        """
+        df = pd.read_excel(excel_file_path, dtype=str).fillna("")
+        imported = 0
+        skipped = []
+        crawled_at = time.time()
+        with span("persist"), self.lock:
+            for index, row in df.iterrows():
+                row_data = {col: value for col, value in row.items() if col != "STT"}
+                filing_number = normalize_filing_number(row_data.get(key_column, ""))
+                if not filing_number:
+                    # Dòng Excel (tính cả dòng tiêu đề)
+                    skipped.append(index + 2)
+                    continue
+                self._upsert(filing_number, row_data, crawled_at)
+                imported += 1
+            self.commit()
+        if skipped:
+            logger.warning(
+                f"⚠️ Bỏ qua {len(skipped)} dòng không có số đơn (cột '{key_column}') trong {excel_file_path}: "
+                f"dòng {', '.join(map(str, skipped[:20]))}{' ...' if len(skipped) > 20 else ''}"
+            )
+        logger.info(f"📥 Đã nạp {imported} bản ghi từ {excel_file_path} vào {self.db_path}")
+        return imported
+
+    def export_excel(self, excel_file_path):
+        """Xuất toàn bộ bản ghi ra Excel (STT theo thứ tự crawl)"""
+        rows = [row_data for _, row_data in self.iter_records()]
+        df = pd.DataFrame(rows)
+        df.insert(0, "STT", range(1, len(df) + 1))
+        Path(excel_file_path).parent.mkdir(parents=True, exist_ok=True)
+        df.to_excel(excel_file_path, index=False)
+        logger.info(f"📊 Đã xuất {len(df)} bản ghi ra {excel_file_path}")
+        return len(df)
+
+
+def open_store(output_folder, legacy_excel_path=None):
+    """Mở RecordStore trong thư mục output, tự nạp file Excel cũ nếu kho còn trống"""
+    store = RecordStore(Path(output_folder) / RECORDS_DB_NAME)
+    if legacy_excel_path and Path(legacy_excel_path).exists() and store.count() == 0:
+        store.import_excel(legacy_excel_path)
+    return store
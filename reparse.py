@@ -0,0 +1,105 @@
+"""
+Chạy lại trích xuất trên kho HTML đã lưu (html_archive) và cập nhật kho bản ghi
+Dùng sau khi sửa lỗi trong detail_extractor / field_specs - không cần crawl lại NOIP.
+Lấy lần fetch mới nhất của từng số đơn, parse song song trên mọi core CPU,
+chỉ ghi những bản ghi có row_data thay đổi.
+Ví dụ:
+    python reparse.py Output_Designs_Direct
+    python reparse.py Output_Trademarks_Direct --dry-run
+    python reparse.py Output_Designs --filing-number 3-2019-01234 --workers 4
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+from html_archive import ARCHIVE_DIR_NAME, HtmlArchive
+from parse_pool import ParsePool
+from log_config import setup_logging
+from record_journal import JournalLocked
+from record_store import RECORDS_DB_NAME, RecordStore
+
+logger = logging.getLogger(__name__)
+
+
+def reparse(archive, store, parse_pool, filing_numbers=None, dry_run=False):
+    """
+    Parse lại các trang trong kho HTML, cập nhật store nếu row_data khác
+    Return: {"changed": ..., "unchanged": ..., "failed": ...}
+    """
+    pages = archive.latest(filing_numbers=filing_numbers)
+    logger.info(f"📦 {len(pages)} trang trong kho {archive.root}")
+    futures = [(page, parse_pool.submit_archived(page)) for page in pages]
+
+    counts = {"changed": 0, "unchanged": 0, "failed": 0}
+    for page, future in futures:
+        try:
+            row_data = future.result()
+        except Exception as e:
+            counts["failed"] += 1
+            logger.error(f"❌ {page.filing_number}: {type(e).__name__} - {e}")
+            continue
+        old_row = store.get(page.filing_number)
+        if row_data == old_row:
+            counts["unchanged"] += 1
+            continue
+        counts["changed"] += 1
+        if old_row is not None:
+            changed_keys = sorted(
+                key for key in set(old_row) | set(row_data) if old_row.get(key) != row_data.get(key)
+            )
+            logger.info(f"✏️ {page.filing_number}: {', '.join(changed_keys)}")
+        else:
+            logger.info(f"➕ {page.filing_number}: bản ghi mới")
+        if not dry_run:
+            # Giữ thời điểm fetch gốc của trang làm crawled_at
+            store.save(page.filing_number, row_data, crawled_at=page.fetched_at)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trích xuất lại từ kho HTML đã lưu")
+    parser.add_argument("output_folder", help="Thư mục output của crawler (chứa records.sqlite và html_archive/)")
+    parser.add_argument("--workers", type=int, default=None, help="Số process parse (mặc định: số core CPU)")
+    parser.add_argument(
+        "--filing-number", action="append", dest="filing_numbers", help="Chỉ parse lại số đơn này (lặp lại được)"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ báo các bản ghi sẽ thay đổi, không ghi")
+    args = parser.parse_args()
+    setup_logging()
+
+    output_folder = Path(args.output_folder)
+    archive_root = output_folder / ARCHIVE_DIR_NAME
+    if not archive_root.exists():
+        logger.error(f"❌ Không tìm thấy kho HTML {archive_root}")
+        sys.exit(1)
+
+    start_time = time.time()
+    archive = HtmlArchive(archive_root)
+    try:
+        # --dry-run chỉ đọc kho; ghi thì cần khóa journal - không chạy song song với crawler
+        store = RecordStore(output_folder / RECORDS_DB_NAME, read_only=args.dry_run)
+    except JournalLocked as e:
+        logger.error(f"❌ {e} - dừng crawler rồi chạy lại, hoặc dùng --dry-run")
+        archive.close()
+        sys.exit(1)
+    parse_pool = ParsePool(args.workers)
+    try:
+        counts = reparse(archive, store, parse_pool, args.filing_numbers, args.dry_run)
+    finally:
+        parse_pool.close()
+        store.close()
+        archive.close()
+
+    logger.info(
+        f"✅ Xong trong {time.time() - start_time:.1f}s: {counts['changed']} thay đổi"
+        f"{' (dry-run, chưa ghi)' if args.dry_run else ''}, {counts['unchanged']} giữ nguyên, "
+        f"{counts['failed']} lỗi"
+    )
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
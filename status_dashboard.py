@@ -0,0 +1,222 @@
+"""
+Bảng trạng thái crawl trực tiếp - đọc số liệu từ metrics.py, không parse log
+- Trong process crawl: StatusDashboard log bảng trạng thái mỗi interval giây và (nếu
+  có port) phục vụ HTTP: / (bảng chữ), /status.json, /metrics (Prometheus text)
+- Xem từ terminal khác: python status_dashboard.py http://127.0.0.1:8899 (vẽ lại liên tục)
+Nội dung: record/phút theo cửa sổ 1/5/15 phút, ETA, thành công / không tồn tại / thất
+bại theo nhóm lỗi (worker_pool.error_class), worker đang chạy, số lần restart driver,
+trạng thái trang gặp sau mỗi lần tải / F5 và lý do HTTP fetch phải quay về Selenium.
+Ví dụ:
+    python main_trademarks.py --workers 4 --status-port 8899
+    python status_dashboard.py http://127.0.0.1:8899 --interval 2
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import RATE_WINDOWS, get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Kết quả record (counter "records", nhãn outcome) -> tên hiển thị
+OUTCOME_LABELS = {
+    "success": "thành công",
+    "not_found": "không tồn tại",
+    "timeout": "timeout",
+    "server_500": "lỗi 500",
+    "template": "lỗi template",
+    "challenge": "challenge",
+    "other": "lỗi khác",
+}
+
+
+def label_counts(metrics, name, label):
+    """{giá trị nhãn: số đếm} của một counter, nhiều nhất trước"""
+    counts = {}
+    for labels, value in metrics.counter_values(name).items():
+        key = dict(labels).get(label, "")
+        counts[key] = counts.get(key, 0) + value
+    return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+
+def build_status(metrics=None):
+    """Ảnh chụp trạng thái crawl (dict, dùng cho cả bảng chữ lẫn /status.json)"""
+    metrics = metrics or get_metrics()
+    outcomes = label_counts(metrics, "records", "outcome")
+    done = sum(outcomes.values())
+    planned = metrics.gauge("records_planned")
+    remaining = max(0, planned - done)
+    rates = {label: metrics.rate_per_minute("records_finished", window) for label, window in RATE_WINDOWS.items()}
+    # ETA theo tốc độ 5 phút gần nhất (mượt hơn 1 phút, phản ứng nhanh hơn 15 phút)
+    rate = rates["5m"]
+    if not remaining:
+        eta_seconds = 0.0 if planned else None
+    else:
+        eta_seconds = remaining / rate * 60 if rate else None
+    return {
+        "time": time.time(),
+        "elapsed_seconds": time.time() - metrics.started_at,
+        "planned": planned,
+        "done": done,
+        "remaining": remaining,
+        "records_per_minute": rates,
+        "eta_seconds": eta_seconds,
+        "outcomes": outcomes,
+        "active_workers": metrics.gauge("active_workers"),
+        "driver_restarts": sum(metrics.counter_values("driver_restarts").values()),
+        "page_states": label_counts(metrics, "page_states", "state"),
+        "http_fallbacks": label_counts(metrics, "http_fallbacks", "reason"),
+    }
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    clock = f"{hours:d}:{minutes:02d}:{seconds:02d}"
+    return f"{days} ngày {clock}" if days else clock
+
+
+def format_counts(counts, labels=None):
+    return ", ".join(f"{(labels or {}).get(key, key)} {value}" for key, value in counts.items()) or "-"
+
+
+def render_status(status):
+    """Bảng trạng thái dạng chữ (nhiều dòng)"""
+    outcomes = dict(status["outcomes"])
+    success = outcomes.pop("success", 0)
+    not_found = outcomes.pop("not_found", 0)
+    failed = sum(outcomes.values())
+    planned = status["planned"]
+    percent = f" ({status['done'] * 100 / planned:.1f}%)" if planned else ""
+    eta = status["eta_seconds"]
+    finish_at = (
+        f" - xong khoảng {datetime.fromtimestamp(status['time'] + eta):%H:%M %d/%m}" if eta else ""
+    )
+    rates = status["records_per_minute"]
+    return "\n".join(
+        [
+            f"📟 CRAWL NOIP - đã chạy {format_duration(status['elapsed_seconds'])}",
+            f"   Tiến độ   : {status['done']}/{planned}{percent}, còn {status['remaining']}, "
+            f"ETA {format_duration(eta)}{finish_at}",
+            "   Tốc độ    : "
+            + " | ".join(f"{rates[label]:.1f}" for label in RATE_WINDOWS)
+            + f" record/phút ({' | '.join(RATE_WINDOWS)})",
+            f"   Kết quả   : ✅ {success} thành công | ❔ {not_found} không tồn tại | ❌ {failed} thất bại"
+            + (f" ({format_counts(outcomes, OUTCOME_LABELS)})" if failed else ""),
+            f"   Worker    : {status['active_workers']} đang chạy | restart driver: {status['driver_restarts']}",
+            f"   Trang/F5  : {format_counts(status['page_states'])}",
+            f"   HTTP→Chrome: {format_counts(status['http_fallbacks'])}",
+        ]
+    )
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    dashboard = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"status {self.address_string()} {format % args}")
+
+    def send_text(self, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        metrics = self.dashboard.metrics
+        if path == "/status.json":
+            self.send_text(json.dumps(build_status(metrics), ensure_ascii=False), "application/json; charset=utf-8")
+        elif path == "/metrics":
+            self.send_text(metrics.to_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/":
+            self.send_text(render_status(build_status(metrics)) + "\n", "text/plain; charset=utf-8")
+        else:
+            self.send_error(404)
+
+
+class StatusDashboard:
+    """
+    Log bảng trạng thái mỗi interval giây (0: không log) và phục vụ HTTP nếu port khác None
+    (port=0: chọn cổng trống - xem .url)
+    """
+
+    def __init__(self, metrics=None, interval=60, port=None, host="127.0.0.1"):
+        self.metrics = metrics or get_metrics()
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.httpd = None
+        if port is not None:
+            handler = type("BoundStatusHandler", (StatusHandler,), {"dashboard": self})
+            self.httpd = ThreadingHTTPServer((host, port), handler)
+            self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        if self.httpd is None:
+            return None
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            logger.info(render_status(build_status(self.metrics)))
+
+    def start(self):
+        if self.httpd is not None:
+            threading.Thread(target=self.httpd.serve_forever, name="status-http", daemon=True).start()
+            logger.info(f"📟 Trạng thái crawl: {self.url} (JSON: {self.url}/status.json)")
+        if self.interval:
+            self.thread = threading.Thread(target=self._loop, name="status-dashboard", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+        logger.info(render_status(build_status(self.metrics)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xem trạng thái crawl đang chạy (--status-port)")
+    parser.add_argument("url", help="Gốc URL status, ví dụ http://127.0.0.1:8899")
+    parser.add_argument("--interval", type=float, default=5, help="Số giây giữa hai lần cập nhật")
+    args = parser.parse_args()
+
+    status_url = args.url.rstrip("/") + "/status.json"
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(status_url, timeout=10) as response:
+                    screen = render_status(json.loads(response.read().decode("utf-8")))
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                screen = f"⚠️ Không đọc được {status_url}: {e}"
+            # Xóa màn hình rồi vẽ lại từ góc trên
+            sys.stdout.write("\033[2J\033[H" + screen + f"\n\n(cập nhật {datetime.now():%H:%M:%S}, Ctrl+C để thoát)\n")
+            sys.stdout.flush()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
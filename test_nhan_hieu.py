@@ -2,8 +2,11 @@
 Script test crawl 1 số đơn nhãn hiệu để debug
 """
 from crawler_nhan_hieu import TrademarkCrawler
+from log_config import setup_logging
 
 def main():
+    # Script debug: log đủ từng bước, không giới hạn số dòng mỗi số đơn
+    setup_logging("DEBUG", record_budget=0)
     print("=" * 80)
     print("TEST CRAWL 1 SỐ ĐƠN NHÃN HIỆU")
     print("=" * 80)
@@ -30,6 +33,7 @@ def main():
 
         print()
         print("✅ Test hoàn thành!")
+        crawler.save_data_to_excel()
         print(f"💾 File Excel: {crawler.excel_file_path}")
 
     except Exception as e:
@@ -38,7 +42,7 @@ def main():
         traceback.print_exc()
     finally:
         if 'crawler' in locals():
-            crawler.close_driver()
+            crawler.close()
 
 if __name__ == "__main__":
     main()
@@ -4,8 +4,11 @@ Script test crawl 1 số đơn để debug
 import pandas as pd
 from pathlib import Path
 from crawler_trademarks import DesignCrawler
+from log_config import setup_logging
 
 def main():
+    # Script debug: log đủ từng bước, không giới hạn số dòng mỗi số đơn
+    setup_logging("DEBUG", record_budget=0)
     print("=" * 80)
     print("TEST CRAWL 1 SỐ ĐƠN")
     print("=" * 80)
@@ -38,7 +41,7 @@ def main():
         traceback.print_exc()
     finally:
         if 'crawler' in locals():
-            crawler.close_driver()
+            crawler.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,215 @@
+"""
+Đếm lệnh WebDriver - mỗi lệnh là một HTTP round-trip tới chromedriver
+instrument_driver() bọc driver.execute của một driver: mọi lệnh, kể cả lệnh của
+WebElement (find_element, click, get_attribute...) và execute_cdp_cmd, đều đi qua đây.
+DriverProfiler ghi số lần + thời gian theo loại lệnh cho từng số đơn, log tóm tắt
+sau mỗi record (cảnh báo record vượt max_record_commands lệnh) và cộng dồn vào
+RunProfile dùng chung cho cả lần chạy.
+"""
+import heapq
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Cảnh báo khi một số đơn tốn nhiều lệnh WebDriver hơn mức này
+MAX_RECORD_COMMANDS = 40
+# Số record tốn nhiều lệnh nhất giữ lại trong RunProfile
+WORST_RECORDS = 10
+
+
+class CommandProfile:
+    """Số lần + tổng thời gian theo loại lệnh WebDriver (tên lệnh Selenium: get, findElement...)"""
+
+    def __init__(self):
+        self.counts = {}
+        self.seconds = {}
+
+    def add(self, command, seconds, count=1):
+        self.counts[command] = self.counts.get(command, 0) + count
+        self.seconds[command] = self.seconds.get(command, 0.0) + seconds
+
+    def merge(self, other):
+        for command, count in other.counts.items():
+            self.add(command, other.seconds[command], count)
+
+    @property
+    def total_commands(self):
+        return sum(self.counts.values())
+
+    @property
+    def total_seconds(self):
+        return sum(self.seconds.values())
+
+    def top(self, n=5):
+        """[(lệnh, số lần, giây)] tốn thời gian nhất trước"""
+        ranked = sorted(self.counts, key=lambda command: (-self.seconds[command], -self.counts[command]))
+        return [(command, self.counts[command], self.seconds[command]) for command in ranked[:n]]
+
+    def format(self, n=5):
+        return ", ".join(f"{command}×{count} {seconds:.2f}s" for command, count, seconds in self.top(n))
+
+    def to_dict(self):
+        return {
+            command: {"count": count, "seconds": seconds} for command, count, seconds in self.top(len(self.counts))
+        }
+
+
+class RunProfile:
+    """Thống kê lệnh WebDriver của cả lần chạy (mọi crawler/worker)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.commands = CommandProfile()
+        # Lệnh ngoài mọi record: khởi tạo driver, quit...
+        self.unattributed = CommandProfile()
+        self.records = 0
+        self.flagged = 0
+        # Min-heap (số lệnh, giây, số đơn, top lệnh, bị cảnh báo) - giữ WORST_RECORDS record tốn nhất
+        self.worst = []
+
+    def reset(self):
+        with self.lock:
+            self._clear()
+
+    def add_record(self, filing_number, profile, flagged=False):
+        with self.lock:
+            self.commands.merge(profile)
+            self.records += 1
+            self.flagged += flagged
+            entry = (profile.total_commands, profile.total_seconds, str(filing_number), profile.format(3), flagged)
+            if len(self.worst) < WORST_RECORDS:
+                heapq.heappush(self.worst, entry)
+            else:
+                heapq.heappushpop(self.worst, entry)
+
+    def add_unattributed(self, command, seconds):
+        with self.lock:
+            self.unattributed.add(command, seconds)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "records": self.records,
+                "flagged_records": self.flagged,
+                "commands": self.commands.total_commands,
+                "seconds": self.commands.total_seconds,
+                "commands_per_record": self.commands.total_commands / self.records if self.records else 0.0,
+                "by_command": self.commands.to_dict(),
+                "unattributed": self.unattributed.to_dict(),
+                "worst_records": [
+                    {
+                        "filing_number": filing_number,
+                        "commands": commands,
+                        "seconds": seconds,
+                        "top": top,
+                        "flagged": flagged,
+                    }
+                    for commands, seconds, filing_number, top, flagged in sorted(self.worst, reverse=True)
+                ],
+            }
+
+    def summary_lines(self):
+        data = self.to_dict()
+        if not data["commands"] and not data["unattributed"]:
+            return ["Không có lệnh WebDriver nào"]
+        lines = [
+            f"Lệnh WebDriver: {data['commands']} lệnh / {data['records']} số đơn "
+            f"({data['commands_per_record']:.1f} lệnh/số đơn, {data['seconds']:.1f}s), "
+            f"{data['flagged_records']} số đơn vượt ngưỡng cảnh báo"
+        ]
+        for command, stats in list(data["by_command"].items())[:8]:
+            lines.append(f"   {command:<24} ×{stats['count']:<7} {stats['seconds']:8.2f}s")
+        for record in data["worst_records"][:5]:
+            if not record["commands"]:
+                break
+            flag = "⚠️" if record["flagged"] else "•"
+            lines.append(
+                f"   {flag} {record['filing_number']}: {record['commands']} lệnh, "
+                f"{record['seconds']:.2f}s - {record['top']}"
+            )
+        return lines
+
+
+_run_profile = RunProfile()
+
+
+def get_run_profile():
+    """RunProfile dùng chung cho cả process"""
+    return _run_profile
+
+
+class DriverProfiler:
+    """Một cho mỗi crawler - mỗi crawler chỉ xử lý một số đơn tại một thời điểm"""
+
+    def __init__(self, run_profile=None, max_record_commands=MAX_RECORD_COMMANDS):
+        self.run_profile = run_profile or get_run_profile()
+        self.max_record_commands = max_record_commands
+        # CommandProfile của số đơn đang xử lý (None: ngoài record)
+        self.current = None
+
+    def observe(self, command, seconds):
+        if self.current is None:
+            self.run_profile.add_unattributed(command, seconds)
+        else:
+            self.current.add(command, seconds)
+
+    @contextmanager
+    def record(self, filing_number):
+        """Mọi lệnh WebDriver trong khối được tính cho filing_number"""
+        self.current = CommandProfile()
+        try:
+            yield self.current
+        finally:
+            profile, self.current = self.current, None
+            self.finish(filing_number, profile)
+
+    def finish(self, filing_number, profile):
+        flagged = profile.total_commands > self.max_record_commands
+        self.run_profile.add_record(filing_number, profile, flagged)
+        if not profile.total_commands:
+            # Fetch bằng HTTP - không đụng tới driver
+            return
+        if flagged:
+            logger.warning(
+                "⚠️ 🔌 WebDriver %s: %d lệnh, %.2fs - %s (vượt %d lệnh/số đơn)",
+                filing_number,
+                profile.total_commands,
+                profile.total_seconds,
+                profile.format(),
+                self.max_record_commands,
+            )
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "🔌 WebDriver %s: %d lệnh, %.2fs - %s",
+                filing_number,
+                profile.total_commands,
+                profile.total_seconds,
+                profile.format(),
+            )
+
+
+def instrument_driver(driver, profiler):
+    """Bọc driver.execute để profiler đếm từng lệnh (driver vẫn là WebDriver gốc)"""
+    execute = driver.execute
+
+    def timed_execute(driver_command, params=None):
+        start_time = time.perf_counter()
+        try:
+            return execute(driver_command, params)
+        finally:
+            profiler.observe(driver_command, time.perf_counter() - start_time)
+
+    driver.execute = timed_execute
+    return driver
+
+
+def log_run_summary():
+    """Log thống kê lệnh WebDriver của cả lần chạy (gọi khi crawl xong)"""
+    for line in get_run_profile().summary_lines():
+        logger.info(f"🔌 {line}")
@@ -0,0 +1,243 @@
+"""
+Pool nhiều Chrome driver cùng lấy số đơn từ một hàng đợi chung
+Mỗi worker sở hữu một crawler (một webdriver.Chrome với user-data-dir riêng),
+kết quả của mọi worker được gom về một ResultCollector duy nhất.
+Khi crawler dùng ParsePool, process trả về Future: worker đi tiếp sang số đơn kế
+tiếp ngay, row_data được ghi khi parse xong (ResultCollector.add_pending).
+Ctrl+C: bỏ các số đơn chưa lấy khỏi hàng đợi (vẫn pending trong ledger), chờ worker
+xong số đơn đang xử lý rồi commit kho trước khi KeyboardInterrupt đi tiếp.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+from selenium.common.exceptions import TimeoutException
+
+from crawl_ledger import STATUS_DONE, STATUS_FAILED, STATUS_NOT_FOUND
+from http_fetcher import RecordNotFound
+from log_config import record_context
+from metrics import add_gauge, increment, mark, set_gauge
+from profiling import record_finished, section as profile_section
+
+logger = logging.getLogger(__name__)
+
+
+def worker_profile_dir(base_dir, worker_id):
+    """Thư mục profile Chrome riêng cho từng worker (Chrome không cho 2 process dùng chung profile)"""
+    return Path(f"{base_dir}_worker_{worker_id}")
+
+
+def error_class(error):
+    """Nhóm lỗi của một record thất bại: not_found / timeout / server_500 / template / challenge / other"""
+    if isinstance(error, RecordNotFound):
+        return "not_found"
+    if isinstance(error, TimeoutException):
+        return "timeout"
+    text = str(error).lower()
+    if "timeout" in text:
+        return "timeout"
+    if "500" in text or "internal error" in text:
+        return "server_500"
+    if "template" in text:
+        return "template"
+    if "captcha" in text or "challenge" in text:
+        return "challenge"
+    return "other"
+
+
+class ResultCollector:
+    """Nhận row_data từ mọi worker, ghi vào một RecordStore duy nhất và cập nhật CrawlLedger"""
+
+    def __init__(self, store, ledger=None, on_result=None):
+        self.store = store
+        self.ledger = ledger
+        self.on_result = on_result
+        self.lock = threading.Lock()
+        self.success_count = 0
+        self.failure_count = 0
+        # Future của các record đang parse trong ParsePool (finish() chờ tới khi ghi xong hết)
+        self.pending = set()
+        self.pending_done = threading.Condition(self.lock)
+
+    def start(self, filing_number):
+        if self.ledger:
+            self.ledger.mark_started(filing_number)
+
+    def add(self, filing_number, row_data, error=None, duration=None, network=None):
+        with self.lock:
+            if row_data:
+                self.store.save(filing_number, row_data)
+                self.success_count += 1
+                status = STATUS_DONE
+                outcome = "success"
+            else:
+                self.failure_count += 1
+                status = STATUS_NOT_FOUND if isinstance(error, RecordNotFound) else STATUS_FAILED
+                outcome = error_class(error)
+            # status_dashboard.py đọc các số liệu này
+            increment("records", outcome=outcome)
+            mark("records_finished")
+            if self.ledger:
+                error_text = f"{type(error).__name__}: {error}" if error else None
+                self.ledger.mark_finished(filing_number, status, duration, error_text, network)
+            if self.on_result:
+                self.on_result(filing_number, row_data)
+        # --profile: mốc ghi profile / snapshot bộ nhớ (ngoài lock - snapshot có thể lâu)
+        record_finished()
+
+    def add_pending(self, filing_number, future, start_time, network=None):
+        """Ghi kết quả khi Future từ ParsePool xong (lỗi parse -> STATUS_FAILED)"""
+        with self.lock:
+            self.pending.add(future)
+
+        def on_done(done_future):
+            try:
+                row_data, error = done_future.result(), None
+            except Exception as e:
+                logger.error(f"❌ Lỗi parse {filing_number}: {type(e).__name__} - {e}")
+                row_data, error = None, e
+            try:
+                self.add(filing_number, row_data, error, time.time() - start_time, network)
+            finally:
+                with self.lock:
+                    self.pending.discard(future)
+                    self.pending_done.notify_all()
+
+        future.add_done_callback(on_done)
+
+    def flush(self):
+        """Commit ngay các bản ghi / trạng thái ledger đã ghi nhưng chưa tới lượt group commit"""
+        with self.lock:
+            self.store.commit()
+
+    def finish(self):
+        with self.lock:
+            if self.pending:
+                logger.info(f"⏳ Chờ parse xong {len(self.pending)} record...")
+            while self.pending:
+                self.pending_done.wait()
+        logger.info(f"💾 Kho bản ghi {self.store.db_path}: {self.store.count()} bản ghi")
+
+
+class CrawlerPool:
+    """
+    Chạy N crawler song song trên một hàng đợi số đơn
+    crawler_factory(worker_id) -> crawler; process_name là tên method xử lý một số đơn
+    (process_search / process_design / process_trademark), được gọi với save=False.
+    """
+
+    def __init__(self, crawler_factory, process_name, num_workers, collector):
+        self.crawler_factory = crawler_factory
+        self.process_name = process_name
+        self.num_workers = max(1, num_workers)
+        self.collector = collector
+        self.lock = threading.Lock()
+        self.started_workers = 0
+        self.init_errors = []
+
+    def run(self, filing_numbers):
+        self.started_workers = 0
+        self.init_errors = []
+        work_queue = queue.Queue()
+        for filing_number in filing_numbers:
+            work_queue.put(filing_number)
+
+        set_gauge("records_planned", len(filing_numbers))
+        num_workers = min(self.num_workers, len(filing_numbers)) or 1
+        logger.info(f"🚀 Khởi động {num_workers} worker cho {len(filing_numbers)} số đơn")
+        threads = [
+            threading.Thread(
+                target=self._worker_loop,
+                args=(worker_id, work_queue),
+                name=f"worker-{worker_id}",
+                daemon=True,
+            )
+            for worker_id in range(num_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            self._stop_on_interrupt(work_queue, threads)
+            raise
+
+        if filing_numbers and not self.started_workers:
+            # Không worker nào chạy: hàng đợi bị bỏ nguyên, không được báo là thành công
+            first_error = self.init_errors[0] if self.init_errors else None
+            raise RuntimeError(
+                f"Không worker nào khởi tạo được driver ({num_workers} worker), "
+                f"{len(filing_numbers)} số đơn chưa được xử lý: {type(first_error).__name__} - {first_error}"
+            ) from first_error
+        self.collector.finish()
+        logger.info(
+            f"✅ Pool hoàn tất: {self.collector.success_count} thành công, "
+            f"{self.collector.failure_count} thất bại"
+        )
+
+    def _stop_on_interrupt(self, work_queue, threads):
+        """Ctrl+C: dừng lấy số đơn mới, chờ worker xong số đơn đang làm, commit kho"""
+        dropped = 0
+        while True:
+            try:
+                work_queue.get_nowait()
+            except queue.Empty:
+                break
+            dropped += 1
+        logger.warning(
+            f"⛔ Ctrl+C: bỏ {dropped} số đơn chưa xử lý (vẫn pending trong ledger), "
+            "chờ các worker xong số đơn đang làm... (Ctrl+C lần nữa: thoát ngay)"
+        )
+        try:
+            for thread in threads:
+                thread.join()
+            self.collector.finish()
+        except KeyboardInterrupt:
+            logger.warning("⛔ Ctrl+C lần hai: không chờ worker nữa")
+        finally:
+            # Bản ghi đã save() nhưng chưa tới lượt group commit
+            self.collector.flush()
+            logger.info("💾 Đã commit các bản ghi đã xử lý trước khi dừng")
+
+    def _worker_loop(self, worker_id, work_queue):
+        try:
+            crawler = self.crawler_factory(worker_id)
+        except Exception as e:
+            logger.error(f"❌ Worker {worker_id} không khởi tạo được driver: {type(e).__name__} - {e}")
+            with self.lock:
+                self.init_errors.append(e)
+            return
+        with self.lock:
+            self.started_workers += 1
+
+        process = getattr(crawler, self.process_name)
+        add_gauge("active_workers", 1)
+        try:
+            while True:
+                try:
+                    filing_number = work_queue.get_nowait()
+                except queue.Empty:
+                    break
+                with record_context(filing_number), profile_section("record"):
+                    self.collector.start(filing_number)
+                    start_time = time.time()
+                    try:
+                        row_data = process(filing_number, save=False)
+                        error = getattr(crawler, "last_error", None)
+                    except Exception as e:
+                        logger.error(f"❌ Worker {worker_id} lỗi khi xử lý {filing_number}: {type(e).__name__} - {e}")
+                        row_data = None
+                        error = e
+                    network = getattr(crawler, "last_network", None)
+                    if isinstance(row_data, Future):
+                        self.collector.add_pending(filing_number, row_data, start_time, network)
+                    else:
+                        self.collector.add(filing_number, row_data, error, time.time() - start_time, network)
+        finally:
+            add_gauge("active_workers", -1)
+            crawler.close()
+            logger.info(f"Worker {worker_id} đã dừng")